@@ -33,6 +33,11 @@ target_metadata = SQLModel.metadata
 def get_url():
     return settings.database_url
 
+def include_name(name, type_, parent_names):
+    # SQLite's FTS5 table for user search (and its shadow tables) is created
+    # alongside user_search_documents rather than modelled
+    return not (type_ == "table" and name.startswith("user_search_fts"))
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -49,6 +54,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -74,7 +80,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_name=include_name
         )
 
         with context.begin_transaction():
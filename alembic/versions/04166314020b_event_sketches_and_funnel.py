@@ -0,0 +1,92 @@
+"""event sketches and funnel
+
+Revision ID: 04166314020b
+Revises: e204c63f060e
+Create Date: 2026-10-19 14:05:32.346628
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+from app.services.event_sketches import build_event_sketch_rows, funnel_stages_query
+
+
+# revision identifiers, used by Alembic.
+revision = '04166314020b'
+down_revision = 'e204c63f060e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('event_sketches',
+    sa.Column('day', sa.Date(), nullable=False),
+    # Explicit lengths: SQL Server can't index nvarchar(max)
+    sa.Column('event_type', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('sessions', sa.LargeBinary(), nullable=False),
+    sa.Column('users', sa.LargeBinary(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'event_type')
+    )
+    op.create_table('funnel_counts',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('stages', sa.Integer(), nullable=False),
+    sa.Column('sessions', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'stages')
+    )
+    op.create_table('funnel_sessions',
+    sa.Column('session_id', sqlmodel.sql.sqltypes.AutoString(length=200), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('stages', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('session_id')
+    )
+    op.create_index(op.f('ix_funnel_sessions_day'), 'funnel_sessions', ['day'], unique=False)
+
+    # Backfill from the analytics events still retained, built in Python
+    conn = op.get_bind()
+    events = sa.table(
+        'analytics_events', sa.column('created_at', sa.DateTime()), sa.column('event_type'),
+        sa.column('session_id'), sa.column('user_id', sqlmodel.sql.sqltypes.GUID())
+    )
+    rows = build_event_sketch_rows(conn.execute(sa.select(
+        events.c.created_at, events.c.event_type, events.c.session_id, events.c.user_id
+    )))
+    sketches = sa.table(
+        'event_sketches', sa.column('day', sa.Date()), sa.column('event_type'), sa.column('count'),
+        sa.column('sessions', sa.LargeBinary()), sa.column('users', sa.LargeBinary()),
+        sa.column('version'), sa.column('updated_at', sa.DateTime())
+    )
+    if rows:
+        op.bulk_insert(sketches, rows)
+
+    now = datetime.utcnow()
+    sessions = [
+        {'session_id': row.session_id, 'day': row.first_at.date(), 'stages': row.stages, 'updated_at': now}
+        for row in conn.execute(funnel_stages_query())
+    ]
+    funnel_sessions = sa.table(
+        'funnel_sessions', sa.column('session_id'), sa.column('day', sa.Date()), sa.column('stages'),
+        sa.column('updated_at', sa.DateTime())
+    )
+    if sessions:
+        op.bulk_insert(funnel_sessions, sessions)
+    funnel_counts = sa.table('funnel_counts', sa.column('day'), sa.column('stages'), sa.column('sessions'))
+    conn.execute(funnel_counts.insert().from_select(
+        ['day', 'stages', 'sessions'],
+        sa.select(funnel_sessions.c.day, funnel_sessions.c.stages, sa.func.count())
+        .group_by(funnel_sessions.c.day, funnel_sessions.c.stages)
+    ))
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_funnel_sessions_day'), table_name='funnel_sessions')
+    op.drop_table('funnel_sessions')
+    op.drop_table('funnel_counts')
+    op.drop_table('event_sketches')
+    # ### end Alembic commands ###
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""user search documents
+
+Revision ID: 52dec9d6ca74
+Revises: 5ea24552e989
+Create Date: 2026-10-19 13:52:11.402817
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+from app.models import USER_SEARCH_FTS5_DDL
+from app.services.user_search import search_document
+
+
+# revision identifiers, used by Alembic.
+revision = '52dec9d6ca74'
+down_revision = '5ea24552e989'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    op.create_table('user_search_documents',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sqlmodel.sql.sqltypes.GUID(), nullable=False),
+    sa.Column('document', sqlmodel.sql.sqltypes.AutoString(length=1000), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    # Named: the SQL Server full-text index refers to it as its key
+    sa.PrimaryKeyConstraint('id', name='pk_user_search_documents'),
+    sa.UniqueConstraint('user_id')
+    )
+    if bind.dialect.name == "sqlite":
+        for statement in USER_SEARCH_FTS5_DDL:
+            op.execute(statement)
+    elif bind.dialect.name == "mssql":
+        # Full-text DDL can't run inside a transaction
+        with op.get_context().autocommit_block():
+            op.execute("CREATE FULLTEXT CATALOG user_search_catalog")
+            op.execute(
+                "CREATE FULLTEXT INDEX ON user_search_documents (document LANGUAGE 0) "
+                "KEY INDEX pk_user_search_documents ON user_search_catalog WITH CHANGE_TRACKING AUTO"
+            )
+
+    # Backfill: documents are normalized in Python, so read and write in batches
+    documents = sa.table('user_search_documents', sa.column('user_id'), sa.column('document'), sa.column('updated_at'))
+    rows = bind.execute(sa.text(
+        "SELECT u.id, u.email, p.full_name FROM users u LEFT JOIN patient_profiles p ON p.user_id = u.id"
+    )).all()
+    now = datetime.utcnow()
+    for start in range(0, len(rows), 1000):
+        op.bulk_insert(documents, [
+            {"user_id": row[0], "document": search_document(row[1], row[2])[:1000], "updated_at": now}
+            for row in rows[start:start + 1000]
+        ])
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS user_search_fts")
+    elif bind.dialect.name == "mssql":
+        with op.get_context().autocommit_block():
+            op.execute("DROP FULLTEXT INDEX ON user_search_documents")
+            op.execute("DROP FULLTEXT CATALOG user_search_catalog")
+    op.drop_table('user_search_documents')
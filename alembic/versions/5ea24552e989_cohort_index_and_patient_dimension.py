@@ -0,0 +1,47 @@
+"""cohort index and patient dimension
+
+Revision ID: 5ea24552e989
+Revises: e9d827ebd6b9
+Create Date: 2026-10-19 13:39:49.492316
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '5ea24552e989'
+down_revision = 'e9d827ebd6b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('patient_dimension',
+    sa.Column('user_id', sqlmodel.sql.sqltypes.GUID(), nullable=False),
+    sa.Column('email', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+    sa.Column('full_name', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True),
+    sa.Column('sex', sqlmodel.sql.sqltypes.AutoString(length=1), nullable=True),
+    sa.Column('birth_date', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.Enum('ACTIVE', 'SUSPENDED', 'DELETED', name='userstatus'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_latest_risks_cohort', 'latest_risks', ['disease', 'risk_bucket', 'predicted_at', 'user_id'], unique=False, mssql_include=['risk_score', 'risk_id'])
+    # Backfill: every patient with a profile
+    op.execute(sa.text("""
+        INSERT INTO patient_dimension (user_id, email, full_name, sex, birth_date, status, updated_at)
+        SELECT u.id, u.email, p.full_name, p.sex, p.birth_date, u.status, :now
+        FROM users u
+        JOIN patient_profiles p ON p.user_id = u.id
+        WHERE u.role = 'PATIENT'
+    """).bindparams(now=datetime.utcnow()))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_latest_risks_cohort', table_name='latest_risks', mssql_include=['risk_score', 'risk_id'])
+    op.drop_table('patient_dimension')
@@ -0,0 +1,69 @@
+"""risk assessments per model version
+
+Revision ID: 957854caa06a
+Revises: c678ac1716b7
+Create Date: 2026-10-19 13:01:09.720485
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '957854caa06a'
+down_revision = 'c678ac1716b7'
+branch_labels = None
+depends_on = None
+
+
+# The baseline created survey_id's unique constraint without a name, so SQL
+# Server generated one (UQ__risk_ass__...) and SQLite has none at all. It is
+# looked up by reflection; on SQLite the batch copy names it through this
+# convention so it can be dropped.
+NAMING_CONVENTION = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+
+
+def _survey_id_unique_constraints(bind):
+    inspector = sa.inspect(bind)
+    constraints = [
+        uq["name"] or "uq_risk_assessments_survey_id"
+        for uq in inspector.get_unique_constraints("risk_assessments")
+        if uq["column_names"] == ["survey_id"]
+    ]
+    indexes = [
+        ix["name"]
+        for ix in inspector.get_indexes("risk_assessments")
+        if ix.get("unique") and ix["column_names"] == ["survey_id"]
+    ]
+    return constraints, indexes
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    constraints, indexes = _survey_id_unique_constraints(bind)
+
+    with op.batch_alter_table("risk_assessments", naming_convention=NAMING_CONVENTION) as batch_op:
+        for name in constraints:
+            batch_op.drop_constraint(name, type_="unique")
+        for name in indexes:
+            batch_op.drop_index(name)
+        if bind.dialect.name == "mssql":
+            # nvarchar(max) cannot be part of an index key
+            batch_op.alter_column(
+                "model_version",
+                existing_type=sqlmodel.sql.sqltypes.AutoString(),
+                type_=sa.String(length=100),
+                existing_nullable=False
+            )
+        batch_op.create_index(batch_op.f("ix_risk_assessments_survey_id"), ["survey_id"], unique=False)
+        batch_op.create_unique_constraint("uq_risk_assessments_survey_model", ["survey_id", "model_version"])
+
+
+def downgrade() -> None:
+    # Fails if any survey has been scored by more than one model version;
+    # delete the extra versions first.
+    with op.batch_alter_table("risk_assessments", naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint("uq_risk_assessments_survey_model", type_="unique")
+        batch_op.drop_index(batch_op.f("ix_risk_assessments_survey_id"))
+        batch_op.create_unique_constraint("uq_risk_assessments_survey_id", ["survey_id"])
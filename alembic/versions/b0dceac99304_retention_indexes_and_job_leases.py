@@ -0,0 +1,36 @@
+"""retention indexes and job leases
+
+Revision ID: b0dceac99304
+Revises: 0a07dd668b92
+Create Date: 2026-10-19 13:24:20.684089
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = 'b0dceac99304'
+down_revision = '0a07dd668b92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Explicit length: SQL Server can't index nvarchar(max)
+    op.create_table('job_leases',
+    sa.Column('name', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False),
+    sa.Column('owner', sqlmodel.sql.sqltypes.AutoString(length=200), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # Retention scans and deletes these tables in created_at order
+    op.create_index(op.f('ix_analytics_events_created_at'), 'analytics_events', ['created_at'], unique=False)
+    op.create_index(op.f('ix_audit_logs_created_at'), 'audit_logs', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_audit_logs_created_at'), table_name='audit_logs')
+    op.drop_index(op.f('ix_analytics_events_created_at'), table_name='analytics_events')
+    op.drop_table('job_leases')
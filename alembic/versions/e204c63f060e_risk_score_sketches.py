@@ -0,0 +1,55 @@
+"""risk score sketches
+
+Revision ID: e204c63f060e
+Revises: 52dec9d6ca74
+Create Date: 2026-10-19 13:58:25.280710
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+from app.services.risk_sketches import build_sketch_rows
+
+
+# revision identifiers, used by Alembic.
+revision = 'e204c63f060e'
+down_revision = '52dec9d6ca74'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('risk_score_sketches',
+    # Explicit lengths: SQL Server can't index nvarchar(max)
+    sa.Column('disease', sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('risk_bucket', sa.Enum('LOW', 'MEDIUM', 'HIGH', name='riskbucket'), nullable=False),
+    sa.Column('model_version', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Float(), nullable=False),
+    sa.Column('digest', sa.LargeBinary(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('disease', 'day', 'risk_bucket', 'model_version')
+    )
+    # Backfill: sketches are built in Python from every existing assessment
+    assessments = sa.table(
+        'risk_assessments', sa.column('disease'), sa.column('predicted_at', sa.DateTime()),
+        sa.column('risk_bucket'), sa.column('model_version'), sa.column('risk_score')
+    )
+    rows = build_sketch_rows(op.get_bind().execute(sa.select(
+        assessments.c.disease, assessments.c.predicted_at, assessments.c.risk_bucket,
+        assessments.c.model_version, assessments.c.risk_score
+    )))
+    sketches = sa.table(
+        'risk_score_sketches', sa.column('disease'), sa.column('day', sa.Date()), sa.column('risk_bucket'),
+        sa.column('model_version'), sa.column('count'), sa.column('score_sum'),
+        sa.column('digest', sa.LargeBinary()), sa.column('version'), sa.column('updated_at', sa.DateTime())
+    )
+    if rows:
+        op.bulk_insert(sketches, rows)
+
+
+def downgrade() -> None:
+    op.drop_table('risk_score_sketches')
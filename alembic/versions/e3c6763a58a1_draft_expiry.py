@@ -0,0 +1,49 @@
+"""draft expiry
+
+Revision ID: e3c6763a58a1
+Revises: b0dceac99304
+Create Date: 2026-10-19 13:27:36.992836
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3c6763a58a1'
+down_revision = 'b0dceac99304'
+branch_labels = None
+depends_on = None
+
+
+def _expires_at(hours: int) -> str:
+    hours = int(hours)
+    if op.get_bind().dialect.name == "mssql":
+        return f"DATEADD(hour, {hours}, last_saved_at)"
+    return f"datetime(last_saved_at, '+{hours} hours')"
+
+
+def upgrade() -> None:
+    # Existing drafts expire relative to their last save, like new ones
+    op.add_column('assessment_drafts', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.execute(
+        f"UPDATE assessment_drafts SET expires_at = CASE WHEN user_id IS NULL "
+        f"THEN {_expires_at(settings.DRAFT_TTL_ANONYMOUS_HOURS)} "
+        f"ELSE {_expires_at(settings.DRAFT_TTL_AUTHENTICATED_HOURS)} END"
+    )
+    with op.batch_alter_table('assessment_drafts') as batch_op:
+        batch_op.alter_column('expires_at', existing_type=sa.DateTime(), nullable=False)
+    op.create_index(op.f('ix_assessment_drafts_expires_at'), 'assessment_drafts', ['expires_at'], unique=False)
+    op.create_index('ix_assessment_drafts_session_type', 'assessment_drafts', ['session_id', 'assessment_type_id'], unique=False)
+    op.create_index('ix_assessment_drafts_user_type', 'assessment_drafts', ['user_id', 'assessment_type_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_assessment_drafts_user_type', table_name='assessment_drafts')
+    op.drop_index('ix_assessment_drafts_session_type', table_name='assessment_drafts')
+    op.drop_index(op.f('ix_assessment_drafts_expires_at'), table_name='assessment_drafts')
+    with op.batch_alter_table('assessment_drafts') as batch_op:
+        batch_op.drop_column('expires_at')
\ No newline at end of file
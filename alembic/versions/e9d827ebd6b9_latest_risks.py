@@ -0,0 +1,62 @@
+"""latest risks
+
+Revision ID: e9d827ebd6b9
+Revises: f2a823abc5d6
+Create Date: 2026-10-19 13:36:05.312295
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9d827ebd6b9'
+down_revision = 'f2a823abc5d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('latest_risks',
+    sa.Column('user_id', sqlmodel.sql.sqltypes.GUID(), nullable=False),
+    # Explicit lengths: SQL Server can't index nvarchar(max)
+    sa.Column('disease', sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False),
+    sa.Column('risk_id', sqlmodel.sql.sqltypes.GUID(), nullable=False),
+    sa.Column('survey_id', sqlmodel.sql.sqltypes.GUID(), nullable=False),
+    sa.Column('risk_score', sa.Float(), nullable=False),
+    sa.Column('risk_bucket', sa.Enum('LOW', 'MEDIUM', 'HIGH', name='riskbucket'), nullable=False),
+    sa.Column('model_version', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False),
+    sa.Column('submitted_at', sa.DateTime(), nullable=False),
+    sa.Column('predicted_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['risk_id'], ['risk_assessments.id'], ),
+    sa.ForeignKeyConstraint(['survey_id'], ['survey_submissions.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'disease')
+    )
+    op.create_index('ix_survey_submissions_user_submitted', 'survey_submissions', ['user_id', 'submitted_at'], unique=False)
+    # Backfill: each patient's most recent submission per disease
+    op.execute(sa.text("""
+        INSERT INTO latest_risks (user_id, disease, risk_id, survey_id, risk_score, risk_bucket,
+                                  model_version, submitted_at, predicted_at, updated_at)
+        SELECT user_id, disease, risk_id, survey_id, risk_score, risk_bucket,
+               model_version, submitted_at, predicted_at, :now
+        FROM (
+            SELECT s.user_id, r.disease, r.id AS risk_id, r.survey_id, r.risk_score, r.risk_bucket,
+                   r.model_version, s.submitted_at, r.predicted_at,
+                   ROW_NUMBER() OVER (PARTITION BY s.user_id, r.disease
+                                      ORDER BY s.submitted_at DESC, r.predicted_at DESC) AS position
+            FROM risk_assessments r
+            JOIN survey_submissions s ON s.id = r.survey_id
+            WHERE s.user_id IS NOT NULL AND s.submitted_at IS NOT NULL
+        ) ranked
+        WHERE position = 1
+    """).bindparams(now=datetime.utcnow()))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_survey_submissions_user_submitted', table_name='survey_submissions')
+    op.drop_table('latest_risks')
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""outbox tasks
+
+Revision ID: f2a823abc5d6
+Revises: e3c6763a58a1
+Create Date: 2026-10-19 13:30:51.434968
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a823abc5d6'
+down_revision = 'e3c6763a58a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('outbox_tasks',
+    sa.Column('id', sqlmodel.sql.sqltypes.GUID(), nullable=False),
+    sa.Column('kind', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False),
+    sa.Column('payload', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    # Explicit length: SQL Server can't index nvarchar(max)
+    sa.Column('status', sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outbox_tasks_status_available', 'outbox_tasks', ['status', 'available_at'], unique=False)
+    # Existing assessments were written with their details
+    op.add_column('risk_assessments', sa.Column('details_status', sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False, server_default='ready'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('risk_assessments') as batch_op:
+        batch_op.drop_column('details_status')
+    op.drop_index('ix_outbox_tasks_status_available', table_name='outbox_tasks')
+    op.drop_table('outbox_tasks')
\ No newline at end of file
@@ -9,6 +9,7 @@ import structlog
 
 logger = structlog.get_logger()
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -76,8 +77,8 @@ async def get_provider_or_admin_user(current_user: User = Depends(get_current_us
         )
     return current_user
 
-def get_current_user_optional(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+async def get_current_user_optional(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
     session: Session = Depends(get_session)
 ) -> Optional[User]:
     """Get current user if authenticated, otherwise None"""
@@ -85,6 +86,6 @@ def get_current_user_optional(
         return None
     
     try:
-        return get_current_user(credentials, session)
+        return await get_current_user(credentials, session)
     except HTTPException:
         return None
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict, List
 
 class Settings(BaseSettings):
     # Database
@@ -9,6 +9,17 @@ class Settings(BaseSettings):
     DB_USER: str = "sa"
     DB_PASSWORD: str = "YourStrong!Pass"
     DB_DRIVER: str = "ODBC Driver 17 for SQL Server"
+    DB_CREATE_ALL_ON_STARTUP: bool = True
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Total connections the database allows this deployment; split evenly
+    # across WEB_CONCURRENCY worker processes when set
+    DB_MAX_CONNECTIONS: Optional[int] = None
+    WEB_CONCURRENCY: int = 1
+    # Read replica for read-only endpoints (unset: all reads use the primary)
+    DB_READ_REPLICA_URL: Optional[str] = None
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    REPLICA_FAILURE_COOLDOWN_SECONDS: float = 30.0
     
     # JWT
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -20,10 +31,117 @@ class Settings(BaseSettings):
     
     # Logging
     LOG_LEVEL: str = "INFO"
+    LOG_ASYNC: bool = True
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATES: Dict[str, float] = {
+        "Draft saved": 0.01,
+        "Analytics event tracked": 0.01
+    }
     
     # Environment
     ENVIRONMENT: str = "development"
     
+    # Metrics
+    METRICS_ENABLED: bool = True
+    METRICS_MULTIPROC_DIR: Optional[str] = None
+    METRICS_FLUSH_INTERVAL: float = 5.0
+    
+    # Risk models (unset: rule-based scoring only)
+    MODEL_DIR: Optional[str] = None
+    # How often each worker loads a newly selected version (0 disables)
+    MODEL_SYNC_INTERVAL_SECONDS: float = 10.0
+    
+    # Scoring micro-batches
+    SCORING_BATCH_ENABLED: bool = True
+    SCORING_BATCH_MAX_SIZE: int = 32
+    SCORING_BATCH_MAX_WAIT_MS: float = 2.0
+    SCORING_BATCH_WORKERS: int = 1
+    
+    # Exports
+    EXPORT_CHUNK_SIZE: int = 1000
+    EXPORT_ISOLATION_LEVEL: Optional[str] = None  # e.g. SNAPSHOT on SQL Server
+    
+    # Bulk user import
+    USER_IMPORT_BATCH_SIZE: int = 500
+    USER_IMPORT_HASH_WORKERS: Optional[int] = None  # None: one per core, 0: hash on the request thread
+    USER_IMPORT_MAX_REPORTED_LINES: int = 10000
+    
+    # Idempotency keys for POST /submissions/
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0  # how long a duplicate waits for the original
+    IDEMPOTENCY_LOCK_SECONDS: float = 60.0  # after this an unfinished original counts as abandoned
+    IDEMPOTENCY_POLL_INTERVAL: float = 0.1
+    IDEMPOTENCY_PURGE_INTERVAL: float = 300.0
+    
+    # Patient timelines: longer histories are downsampled to this many points per disease
+    TIMELINE_MAX_POINTS: int = 200
+    
+    # Cohort queries: page size, and how far the first page counts before reporting a lower bound
+    COHORT_PAGE_SIZE: int = 50
+    COHORT_COUNT_LIMIT: int = 10000
+    
+    # Admin user search: matches counted and paged through, best first
+    USER_SEARCH_MAX_RESULTS: int = 1000
+    
+    # Reference data cache (assessment types); another worker's changes show up within the TTL
+    REFERENCE_DATA_TTL_SECONDS: float = 300.0
+    
+    # Background jobs (retention etc.) run inside each API process
+    BACKGROUND_JOBS_ENABLED: bool = True
+    
+    # Outbox for work deferred from requests (recommendations, disease details)
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 5.0
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_BASE_SECONDS: float = 2.0  # doubles after each failed attempt
+    OUTBOX_LOCK_SECONDS: float = 60.0  # a claimed task is retried elsewhere after this
+    
+    # Risk score distribution sketches (t-digest): flush interval and accuracy/size trade-off
+    RISK_SKETCH_FLUSH_SECONDS: float = 10.0
+    RISK_SKETCH_COMPRESSION: float = 100.0
+    
+    # Analytics event sketches (HyperLogLog) and funnel: flush interval, and 2**precision registers per sketch
+    EVENT_SKETCH_FLUSH_SECONDS: float = 10.0
+    EVENT_SKETCH_PRECISION: int = 14  # 4-16; standard error about 1.04 / sqrt(2**precision)
+    
+    # Drafts expire this long after their last save and are then swept
+    DRAFT_TTL_ANONYMOUS_HOURS: int = 72
+    DRAFT_TTL_AUTHENTICATED_HOURS: int = 2160  # 90 days
+    DRAFT_SWEEP_INTERVAL_SECONDS: float = 600.0
+    DRAFT_SWEEP_BATCH_SIZE: int = 1000
+    
+    # Retention of analytics_events and audit_logs (0 days: keep forever)
+    RETENTION_ENABLED: bool = False
+    RETENTION_INTERVAL_SECONDS: float = 3600.0
+    RETENTION_ANALYTICS_EVENTS_DAYS: int = 180
+    RETENTION_AUDIT_LOGS_DAYS: int = 2190
+    RETENTION_ARCHIVE_DIR: Optional[str] = "./archive"  # unset: delete without archiving
+    RETENTION_BATCH_SIZE: int = 1000
+    RETENTION_BATCH_PAUSE_SECONDS: float = 0.5
+    RETENTION_MAX_RUN_SECONDS: float = 300.0  # must stay below the job lease (600s)
+    
+    # Rate limiting and load shedding (per worker process)
+    RATE_LIMIT_ENABLED: bool = True
+    # "METHOD path" -> token bucket refilled at `rate` per second, holding up to `burst`
+    RATE_LIMITS: Dict[str, Dict[str, float]] = {
+        "POST /drafts/": {"rate": 1.0, "burst": 20},
+        "POST /analytics/events": {"rate": 5.0, "burst": 50},
+        "POST /auth/login": {"rate": 0.2, "burst": 10}
+    }
+    # Failed logins per account and client address, on top of the route's limit
+    ACCOUNT_FAILURE_LIMIT: Dict[str, float] = {"rate": 0.02, "burst": 5}
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # Proxies (addresses or CIDRs) whose X-Forwarded-For names the client; unset: key on the peer address
+    TRUSTED_PROXIES: List[str] = []
+    MAX_CONCURRENT_REQUESTS: int = 64  # 0 disables the concurrency limit
+    MAX_QUEUED_REQUESTS: int = 128
+    QUEUE_TIMEOUT_SECONDS: float = 2.0
+    SHED_RETRY_AFTER_SECONDS: float = 1.0
+    
+    # Startup
+    STARTUP_WARMUP: bool = True
+    STARTUP_WARM_CONNECTIONS: int = 5
+    
     @property
     def database_url(self) -> str:
         if self.ENVIRONMENT == "test":
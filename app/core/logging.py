@@ -0,0 +1,181 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from collections import Counter
+from typing import Dict, Any, Optional
+
+import structlog
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+# Log records are handed to a bounded queue on the calling thread and are
+# rendered to JSON and written to stdout by a QueueListener thread, so a
+# slow stdout never stalls the event loop. High-volume info events can be
+# sampled down per event name via settings.LOG_SAMPLE_RATES.
+
+SAMPLED_LEVELS = {"debug", "info"}
+
+
+def _json_dumps(obj: Any, default=None, **kwargs) -> str:
+    """JSONRenderer serializer backed by orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode()
+    import json
+    return json.dumps(obj, default=default, ensure_ascii=False)
+
+
+class EventSampler:
+    """structlog processor keeping a fraction of selected debug/info events"""
+
+    def __init__(self, rates: Dict[str, float], rng: Optional[random.Random] = None):
+        self.rates = dict(rates)
+        self.dropped: Counter = Counter()
+        self._random = (rng or random.Random()).random
+        self._lock = threading.Lock()
+
+    def __call__(self, logger, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+        event = event_dict.get("event")
+        rate = self.rates.get(event)
+        if rate is None or method_name not in SAMPLED_LEVELS:
+            return event_dict
+        if self._random() >= rate:
+            with self._lock:
+                self.dropped[event] += 1
+            raise structlog.DropEvent
+        event_dict["sample_rate"] = rate
+        return event_dict
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that defers formatting to the listener and drops when full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        # enqueue runs on every logging thread; += alone loses increments
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener thread formats; the record is never pickled, so it
+        # can be passed through untouched.
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+_sampler: Optional[EventSampler] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(stream=None):
+    """Configure structlog and the root logger; safe to call more than once"""
+    global _sampler, _queue_handler, _listener
+
+    stop_logging()
+
+    timestamper = structlog.processors.TimeStamper(fmt="iso")
+    _sampler = EventSampler(settings.LOG_SAMPLE_RATES)
+
+    structlog.configure(
+        processors=[
+            structlog.stdlib.filter_by_level,
+            _sampler,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            timestamper,
+            structlog.processors.StackInfoRenderer(),
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+        ],
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
+    formatter = structlog.stdlib.ProcessorFormatter(
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            structlog.processors.JSONRenderer(serializer=_json_dumps),
+        ],
+        foreign_pre_chain=[
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            timestamper,
+        ],
+    )
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    if settings.LOG_ASYNC:
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        root.addHandler(_queue_handler)
+    else:
+        root.addHandler(output)
+
+
+def _restart_after_fork():
+    """Give a forked child its own queue and writer thread; the parent's thread is not copied"""
+    global _listener
+    if _listener is None or _queue_handler is None:
+        return
+    handlers = _listener.handlers
+    _queue_handler.queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logging_stats() -> Dict[str, Any]:
+    """Counters for sampled-out events and records dropped on a full queue"""
+    return {
+        "sampled_out": dict(_sampler.dropped) if _sampler else {},
+        "queue_dropped": _queue_handler.dropped if _queue_handler else 0,
+        "queue_depth": _queue_handler.queue.qsize() if _queue_handler else 0
+    }
+
+
+registry.callback_counter(
+    "log_events_sampled_out_total", "Log events dropped by sampling", ["event"],
+    lambda: {(event,): count for event, count in get_logging_stats()["sampled_out"].items()}
+)
+registry.callback_counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full", [],
+    lambda: {(): get_logging_stats()["queue_dropped"]}
+)
+
+atexit.register(stop_logging)
+os.register_at_fork(after_in_child=_restart_after_fork)
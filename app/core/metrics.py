@@ -0,0 +1,556 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - multiprocess mode runs under gunicorn on POSIX
+    fcntl = None
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Dependency-free metrics in Prometheus text format.
+#
+# Counters and histograms are sharded per thread: each thread writes only
+# to its own dict, so the hot path takes no lock, and a scrape sums the
+# shards. When a thread exits (the threadpool retires them all the time),
+# its shard is folded into one retired total, so shards don't pile up.
+# Gauges are written rarely and use a plain lock. When
+# METRICS_MULTIPROC_DIR is set, every worker process periodically dumps a
+# snapshot there and /metrics merges the snapshots of all workers; those of
+# exited workers are folded into one totals file.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Dict[LabelValues, object]:
+        raise NotImplementedError
+
+
+class _ThreadToken:
+    """Kept in a thread's local storage, so it is collected when the thread exits"""
+    __slots__ = ("__weakref__",)
+
+
+class _Sharded(_Metric):
+    """Per-thread value storage merged at collection time"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reset()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            token = _ThreadToken()
+            with self._shards_lock:
+                self._shards[id(shard)] = shard
+            weakref.finalize(token, self._retire, self._shards, shard)
+            self._local.shard = shard
+            self._local.token = token
+            return shard
+
+    def _retire(self, shards: Dict[int, dict], shard: dict):
+        """Fold an exited thread's shard into the retired totals"""
+        with self._shards_lock:
+            if shards is not self._shards:
+                return  # A shard from before a fork; the child starts from zero
+            del shards[id(shard)]
+            self._retired = self._fold(dict(self._retired), shard)
+
+    def _fold(self, totals: dict, shard: dict) -> dict:
+        raise NotImplementedError
+
+    def _snapshot_shards(self) -> List[dict]:
+        with self._shards_lock:
+            shards = list(self._shards.values())
+            retired = self._retired
+        # dict.copy() is atomic under the GIL, so a writer thread can't
+        # change the dict mid-copy. Retired totals are replaced, never
+        # changed in place.
+        return [retired] + [shard.copy() for shard in shards]
+
+    def _reset(self):
+        self._local = threading.local()
+        self._shards: Dict[int, dict] = {}
+        self._retired: dict = {}
+        self._shards_lock = threading.Lock()
+
+
+class Counter(_Sharded):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        shard = self._shard()
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def _fold(self, totals: dict, shard: dict) -> dict:
+        for key, value in shard.items():
+            totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def samples(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for shard in self._snapshot_shards():
+            self._fold(totals, shard)
+        return totals
+
+
+class Histogram(_Sharded):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        shard = self._shard()
+        values = shard.get(key)
+        if values is None:
+            # One slot per bucket plus +Inf, then sum and count
+            values = shard[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        values[bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def time(self, **labels) -> "_Timer":
+        """Context manager observing the elapsed wall time"""
+        return _Timer(self, labels)
+
+    def _fold(self, totals: dict, shard: dict) -> dict:
+        for key, values in shard.items():
+            merged = totals.get(key)
+            totals[key] = list(values) if merged is None else [a + b for a, b in zip(merged, values)]
+        return totals
+
+    def samples(self) -> Dict[LabelValues, List[float]]:
+        totals: Dict[LabelValues, List[float]] = {}
+        for shard in self._snapshot_shards():
+            self._fold(totals, shard)
+        return totals
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, object]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 multiprocess_mode: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode  # "sum" or "max" across workers
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        self._function: Optional[Callable[[], Dict[LabelValues, float]]] = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def _reset(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set_function(self, function: Callable[[], Dict[LabelValues, float]]):
+        """Compute the gauge at collection time; returns {label values: value}"""
+        self._function = function
+
+    def samples(self) -> Dict[LabelValues, float]:
+        if self._function is not None:
+            try:
+                return dict(self._function())
+            except Exception as e:
+                logger.warning("Metric callback failed", metric=self.name, error=str(e))
+                return {}
+        with self._lock:
+            return dict(self._values)
+
+
+class CallbackCounter(_Metric):
+    """Counter whose totals are read from another component at collection time"""
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 function: Callable[[], Dict[LabelValues, float]]):
+        super().__init__(name, documentation, labelnames)
+        self._function = function
+
+    def samples(self) -> Dict[LabelValues, float]:
+        try:
+            return dict(self._function())
+        except Exception as e:
+            logger.warning("Metric callback failed", metric=self.name, error=str(e))
+            return {}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered with a different shape")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              multiprocess_mode: str = "sum") -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, multiprocess_mode))
+
+    def callback_counter(self, name: str, documentation: str, labelnames: Sequence[str],
+                         function: Callable[[], Dict[LabelValues, float]]) -> CallbackCounter:
+        return self._register(CallbackCounter(name, documentation, labelnames, function))
+
+    def reset_after_fork(self):
+        """Drop values and locks inherited from the parent so a forked worker counts only its own work"""
+        self._lock = threading.Lock()
+        for metric in self._metrics.values():
+            reset = getattr(metric, "_reset", None)
+            if reset is not None:
+                reset()
+
+    def snapshot(self) -> dict:
+        """JSON-serialisable view of every metric in this process"""
+        metrics = {}
+        with self._lock:
+            registered = list(self._metrics.values())
+        for metric in registered:
+            entry = {
+                "type": metric.type,
+                "help": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "samples": [[list(key), value] for key, value in metric.samples().items()]
+            }
+            if isinstance(metric, Histogram):
+                entry["buckets"] = list(metric.buckets)
+            if isinstance(metric, Gauge):
+                entry["mode"] = metric.multiprocess_mode
+            metrics[metric.name] = entry
+        return {"pid": os.getpid(), "written_at": time.time(), "metrics": metrics}
+
+
+def merge_snapshots(snapshots: Iterable[dict]) -> Dict[str, dict]:
+    """Combine per-process snapshots: counters and histograms add up, gauges follow their mode"""
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, entry in snapshot["metrics"].items():
+            target = merged.setdefault(name, {**entry, "samples": {}})
+            samples = target["samples"]
+            for labels, value in entry["samples"]:
+                key = tuple(labels)
+                if key not in samples:
+                    samples[key] = list(value) if isinstance(value, list) else value
+                elif entry["type"] == "histogram":
+                    samples[key] = [a + b for a, b in zip(samples[key], value)]
+                elif entry["type"] == "gauge" and entry.get("mode") == "max":
+                    samples[key] = max(samples[key], value)
+                else:
+                    samples[key] += value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_prometheus(merged: Dict[str, dict]) -> str:
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name in sorted(merged):
+        entry = merged[name]
+        lines.append(f"# HELP {name} {entry['help']}")
+        lines.append(f"# TYPE {name} {entry['type']}")
+        labelnames = entry["labelnames"]
+        for key in sorted(entry["samples"]):
+            value = entry["samples"][key]
+            if entry["type"] == "histogram":
+                cumulative = 0
+                for bound, count in zip(list(entry["buckets"]) + [float("inf")], value[:-2]):
+                    cumulative += count
+                    labels = _format_labels(labelnames, key, (("le", _format_value(bound)),))
+                    lines.append(f"{name}_bucket{labels} {_format_value(cumulative)}")
+                labels = _format_labels(labelnames, key)
+                lines.append(f"{name}_sum{labels} {_format_value(value[-2])}")
+                lines.append(f"{name}_count{labels} {_format_value(value[-1])}")
+            else:
+                lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _as_snapshot(merged: Dict[str, dict], pid: int = 0) -> dict:
+    """A merge_snapshots result back in snapshot form"""
+    metrics = {
+        name: {**entry, "samples": [[list(key), value] for key, value in entry["samples"].items()]}
+        for name, entry in merged.items()
+    }
+    return {"pid": pid, "written_at": time.time(), "metrics": metrics}
+
+
+class MultiprocessStore:
+    """File-backed snapshots shared by the worker processes of one deployment"""
+
+    EXITED_FILE = "exited.json"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, pid: int) -> str:
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def _write_json(self, path: str, snapshot: dict):
+        # Write-then-rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".metrics-", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    def write(self, snapshot: dict):
+        self._write_json(self.path_for(snapshot["pid"]), snapshot)
+
+    @contextmanager
+    def _locked(self):
+        """Serialise folding exited workers into the totals with reading them"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self, path: str) -> Optional[dict]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _retire(self, exited: List[Tuple[str, dict]]) -> Optional[dict]:
+        """Fold exited workers' counters and histograms into the totals file and delete their files"""
+        totals = self._load(os.path.join(self.directory, self.EXITED_FILE))
+        snapshots = [totals] if totals else []
+        for _, snapshot in exited:
+            # Their counters still count; their gauges don't
+            snapshots.append({**snapshot, "metrics": {
+                name: entry for name, entry in snapshot["metrics"].items() if entry["type"] != "gauge"
+            }})
+        if exited:
+            totals = _as_snapshot(merge_snapshots(snapshots))
+            self._write_json(os.path.join(self.directory, self.EXITED_FILE), totals)
+            for path, _ in exited:
+                os.remove(path)
+        return totals
+
+    def retire(self, pid: int):
+        """Fold a worker that has exited into the totals (gunicorn's child_exit hook)"""
+        with self._locked():
+            snapshot = self._load(self.path_for(pid))
+            if snapshot is not None:
+                self._retire([(self.path_for(pid), snapshot)])
+
+    def read_all(self) -> List[dict]:
+        with self._locked():
+            snapshots, exited = [], []
+            for filename in os.listdir(self.directory):
+                if not (filename.startswith("metrics-") and filename.endswith(".json")):
+                    continue
+                path = os.path.join(self.directory, filename)
+                snapshot = self._load(path)
+                if snapshot is None:
+                    continue
+                if _pid_alive(snapshot["pid"]):
+                    snapshots.append(snapshot)
+                else:
+                    exited.append((path, snapshot))
+            totals = self._retire(exited)
+        return snapshots + ([totals] if totals else [])
+
+
+registry = MetricsRegistry()
+
+_store: Optional[MultiprocessStore] = None
+_flusher: Optional[threading.Thread] = None
+
+
+def get_store() -> Optional[MultiprocessStore]:
+    global _store
+    if _store is None and settings.METRICS_MULTIPROC_DIR:
+        _store = MultiprocessStore(settings.METRICS_MULTIPROC_DIR)
+    return _store
+
+
+def flush_snapshot():
+    """Publish this process's metrics for the other workers' scrapes"""
+    store = get_store()
+    if store is not None:
+        store.write(registry.snapshot())
+
+
+def start_flusher():
+    """Start the background thread that periodically publishes this worker's snapshot"""
+    global _flusher
+    if get_store() is None or (_flusher is not None and _flusher.is_alive()):
+        return
+
+    def run():
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                flush_snapshot()
+            except Exception as e:
+                logger.warning("Failed to write metrics snapshot", error=str(e))
+
+    _flusher = threading.Thread(target=run, name="metrics-flusher", daemon=True)
+    _flusher.start()
+
+
+def _after_fork_in_child():
+    global _flusher
+    registry.reset_after_fork()
+    # The parent's flusher thread does not exist in the child
+    _flusher = None
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def generate_latest() -> str:
+    """Metrics of this process, or of every worker in multiprocess mode"""
+    store = get_store()
+    if store is None:
+        return render_prometheus(merge_snapshots([registry.snapshot()]))
+    flush_snapshot()
+    return render_prometheus(merge_snapshots(store.read_all()))
+
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status code", ["method", "route", "status"]
+)
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route"]
+)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and status codes"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope; using its
+            # template keeps ids out of the label values.
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status_code)
@@ -0,0 +1,327 @@
+import asyncio
+import ipaddress
+import json
+import math
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Deque, List, Optional, Tuple, Union
+from urllib.parse import parse_qs
+
+import structlog
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.metrics import registry, LATENCY_BUCKETS
+from app.core import security
+
+logger = structlog.get_logger()
+
+# Admission control in front of the routers, per worker process.
+#
+# Routes listed in settings.RATE_LIMITS get token buckets per caller. A
+# verified bearer token is keyed on its user. Anyone else is keyed on their
+# client address (from X-Forwarded-For only when the peer is one of
+# TRUSTED_PROXIES), and a request must also find a token in the bucket of
+# its session_id (header, query string or JSON body). Session ids are chosen
+# by the caller, so they only ever add limits; a fresh one never escapes
+# the address's bucket. Logins that fail also take a token from a bucket
+# per account and client address (ACCOUNT_FAILURE_LIMIT), refused once it
+# is empty: a password can't be guessed faster than that from one address,
+# and failures from other addresses never lock the account's owner out.
+# Everything else only passes through the global concurrency limiter: at
+# most MAX_CONCURRENT_REQUESTS run at once, up to MAX_QUEUED_REQUESTS wait
+# for a slot for QUEUE_TIMEOUT_SECONDS, and the rest are shed with a 503
+# before they can queue on the database pool.
+
+EXEMPT_PATHS = {"/health", "/health/startup", "/metrics"}
+MAX_PEEK_BODY_BYTES = 64 * 1024
+# Routes whose failures are limited per account: "METHOD path" -> JSON body field naming it
+ACCOUNT_FIELDS = {"POST /auth/login": "email"}
+FAILED_STATUSES = {401}
+
+REQUESTS_REJECTED = registry.counter(
+    "requests_rejected_total", "Requests refused by rate limiting or load shedding", ["reason", "route"]
+)
+ADMISSION_WAIT = registry.histogram(
+    "admission_queue_wait_seconds", "Time requests waited for a concurrency slot", buckets=LATENCY_BUCKETS
+)
+ADMISSION_QUEUED = registry.gauge("admission_queued_requests", "Requests waiting for a concurrency slot")
+
+
+class TokenBucketLimiter:
+    """Token buckets per key, bounded to the most recently used max_keys"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, rate: float, burst: float, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until a token is available)"""
+        return self.take_all([key], rate, burst, now)
+
+    def take_all(self, keys: List[str], rate: float, burst: float,
+                 now: Optional[float] = None) -> Tuple[bool, float]:
+        """Take one token from every bucket, or from none unless all have one"""
+        now = time.monotonic() if now is None else now
+        levels = []
+        for key in keys:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            levels.append(min(burst, tokens + (now - updated) * rate))
+        allowed = all(tokens >= 1.0 for tokens in levels)
+        for key, tokens in zip(keys, levels):
+            self._buckets[key] = (tokens - 1.0 if allowed else tokens, now)
+            self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            # An evicted caller starts again with a full bucket, which only
+            # ever errs on the side of letting a request through
+            self._buckets.popitem(last=False)
+        if allowed:
+            return True, 0.0
+        return False, max((1.0 - tokens) / rate if rate > 0 else float("inf") for tokens in levels if tokens < 1.0)
+
+    def available(self, key: str, rate: float, burst: float,
+                  now: Optional[float] = None) -> Tuple[bool, float]:
+        """Whether a bucket has a token, without taking it"""
+        now = time.monotonic() if now is None else now
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= 1.0:
+            return True, 0.0
+        return False, (1.0 - tokens) / rate if rate > 0 else float("inf")
+
+    def reset(self):
+        self._buckets.clear()
+
+
+class ConcurrencyLimiter:
+    """Caps in-flight requests, with a bounded FIFO queue of waiters"""
+
+    def __init__(self, limit: int, max_queued: int):
+        self.limit = limit
+        self.max_queued = max_queued
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self, timeout: float) -> Optional[str]:
+        """Take a slot; returns None on success or the reason it was refused"""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return None
+        if len(self._waiters) >= self.max_queued:
+            return "overloaded"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        ADMISSION_QUEUED.set(len(self._waiters))
+        started = time.perf_counter()
+        try:
+            # release() hands its slot straight to the waiter, so in_flight
+            # is already counted when the future resolves
+            await asyncio.wait_for(waiter, timeout)
+            return None
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            # Client went away; pass on a slot that was already handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            ADMISSION_QUEUED.set(len(self._waiters))
+            ADMISSION_WAIT.observe(time.perf_counter() - started)
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+rate_limiter = TokenBucketLimiter(settings.RATE_LIMIT_MAX_KEYS)
+concurrency_limiter = ConcurrencyLimiter(settings.MAX_CONCURRENT_REQUESTS, settings.MAX_QUEUED_REQUESTS)
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _query_param(scope, name: str) -> Optional[str]:
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get(name)
+    return values[0] if values else None
+
+
+async def _read_body(receive) -> Tuple[bytes, list]:
+    """Read the whole request body, keeping the messages to replay downstream"""
+    messages, chunks = [], []
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks), messages
+
+
+def _replay(messages: list, receive):
+    pending = list(messages)
+
+    async def replay_receive():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay_receive
+
+
+@lru_cache(maxsize=8)
+def _networks(proxies: Tuple[str, ...]) -> Tuple[Union[ipaddress.IPv4Network, ipaddress.IPv6Network], ...]:
+    return tuple(ipaddress.ip_network(proxy, strict=False) for proxy in proxies)
+
+
+def _trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _networks(tuple(settings.TRUSTED_PROXIES)))
+
+
+def client_address(scope) -> str:
+    """The caller's address: the peer's, or the one a trusted proxy forwarded for"""
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    forwarded = _header(scope, b"x-forwarded-for")
+    if not forwarded or not _trusted(address):
+        return address
+    # Each proxy appends the address it was called from, so walk back from
+    # the right past our own proxies; anything further left is the caller's
+    # to write
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        address = hop
+        if not _trusted(hop):
+            break
+    return address
+
+
+async def _peek_json(scope, receive) -> Tuple[Optional[dict], object]:
+    """A small JSON body, read ahead of the route; also returns the receive callable to use downstream"""
+    content_type = _header(scope, b"content-type") or ""
+    length = _header(scope, b"content-length")
+    if not (content_type.startswith("application/json")
+            and length is not None and length.isdigit() and int(length) <= MAX_PEEK_BODY_BYTES):
+        return None, receive
+    body, messages = await _read_body(receive)
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        payload = None
+    return payload if isinstance(payload, dict) else None, _replay(messages, receive)
+
+
+async def caller_keys(scope, receive, route: str) -> Tuple[List[str], Optional[str], object]:
+    """
+    Buckets a request must find a token in, and the bucket its failure is
+    charged to (if any); also returns the receive callable to use downstream
+    """
+    authorization = _header(scope, b"authorization") or ""
+    if authorization.lower().startswith("bearer "):
+        try:
+            return [f"user:{security.verify_token(authorization[7:].strip())['sub']}"], None, receive
+        except HTTPException:
+            pass  # Invalid token: the route will reject it, key on the client instead
+
+    address = client_address(scope)
+    keys = [f"client:{address}"]
+    session_id = _header(scope, b"x-session-id") or _query_param(scope, "session_id")
+    account_field = ACCOUNT_FIELDS.get(route)
+    payload = None
+    if not session_id or account_field:
+        payload, receive = await _peek_json(scope, receive)
+    if not session_id and payload and isinstance(payload.get("session_id"), str):
+        session_id = payload["session_id"]
+    if session_id:
+        keys.append(f"session:{session_id}")
+    failure_key = None
+    if account_field and payload and isinstance(payload.get(account_field), str):
+        failure_key = f"account:{payload[account_field].strip().casefold()}|{address}"
+    return keys, failure_key, receive
+
+
+def _charge_failures(send, key: str):
+    """Wrap send to take a token from key when the response is a failure"""
+    async def charging_send(message):
+        if message["type"] == "http.response.start" and message["status"] in FAILED_STATUSES:
+            policy = settings.ACCOUNT_FAILURE_LIMIT
+            rate_limiter.take(key, policy["rate"], policy["burst"])
+        await send(message)
+
+    return charging_send
+
+
+def _reject(status_code: int, reason: str, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail, "code": reason, "status": status_code},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying per-route rate limits and the global concurrency limit"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        route = f"{scope['method']} {scope['path']}"
+        policy = settings.RATE_LIMITS.get(route)
+        if policy is not None:
+            keys, failure_key, receive = await caller_keys(scope, receive, route)
+            allowed, retry_after = True, 0.0
+            if failure_key is not None:
+                failure_key = f"{route}|{failure_key}"
+                failures = settings.ACCOUNT_FAILURE_LIMIT
+                allowed, retry_after = rate_limiter.available(failure_key, failures["rate"], failures["burst"])
+                send = _charge_failures(send, failure_key)
+            if allowed:
+                allowed, retry_after = rate_limiter.take_all(
+                    [f"{route}|{key}" for key in keys], policy["rate"], policy["burst"]
+                )
+            if not allowed:
+                REQUESTS_REJECTED.inc(reason="rate_limited", route=route)
+                logger.warning("Request rate limited", route=route, caller=keys[0].split(":", 1)[0])
+                await _reject(429, "rate_limited", "Too many requests", retry_after)(scope, receive, send)
+                return
+        else:
+            route = "other"
+
+        if settings.MAX_CONCURRENT_REQUESTS <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        refused = await concurrency_limiter.acquire(settings.QUEUE_TIMEOUT_SECONDS)
+        if refused is not None:
+            REQUESTS_REJECTED.inc(reason=refused, route=route)
+            await _reject(
+                503, refused, "Server is busy, please retry", settings.SHED_RETRY_AFTER_SECONDS
+            )(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            concurrency_limiter.release()
@@ -1,22 +1,43 @@
 from datetime import datetime, timedelta
-from typing import Optional, Union
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from functools import lru_cache
+from typing import List, Optional, Union
 from fastapi import HTTPException, status
 from app.core.config import settings
+from app.core.metrics import registry
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD_HASH_DURATION = registry.histogram(
+    "password_hash_duration_seconds", "bcrypt hash/verify duration", ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+)
+
+# passlib/bcrypt and jose are imported on first use rather than at module
+# import, so they stay off the application's cold-start path.
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    """Password hashing context, created on first use"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    with PASSWORD_HASH_DURATION.time(operation="verify"):
+        return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    with PASSWORD_HASH_DURATION.time(operation="hash"):
+        return get_pwd_context().hash(password)
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash a batch of passwords; runs in the bulk-import process pool"""
+    context = get_pwd_context()
+    return [context.hash(password) for password in passwords]
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -29,6 +50,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def verify_token(token: str) -> dict:
     """Verify and decode JWT token"""
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
@@ -44,4 +67,9 @@ def verify_token(token: str) -> dict:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
+
+def warm_up():
+    """Import the hashing and JWT backends ahead of the first request"""
+    import jose.jwt  # noqa: F401
+    get_pwd_context().handler().get_backend()
@@ -0,0 +1,55 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+# Set when this module is first imported, which app.main does before any
+# router or third-party import, so "import" below covers the app's own
+# import cost rather than interpreter start-up.
+IMPORT_STARTED = time.perf_counter()
+
+
+class StartupReport:
+    """Wall-clock durations of the import and startup phases"""
+
+    def __init__(self):
+        self.import_seconds: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self.started_at: Optional[datetime] = None
+        self.ready_at: Optional[datetime] = None
+        self.schema_action: Optional[str] = None
+        self._startup_started: Optional[float] = None
+
+    def mark_imported(self):
+        """Record how long importing the application took"""
+        self.import_seconds = time.perf_counter() - IMPORT_STARTED
+
+    def begin(self):
+        self.started_at = datetime.utcnow()
+        self._startup_started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time one named startup step"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def finish(self):
+        self.ready_at = datetime.utcnow()
+        if self._startup_started is not None:
+            self.phases["total"] = time.perf_counter() - self._startup_started
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "import_ms": round(self.import_seconds * 1000, 1) if self.import_seconds is not None else None,
+            "startup_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "schema_action": self.schema_action,
+            "started_at": self.started_at.isoformat() + "Z" if self.started_at else None,
+            "ready_at": self.ready_at.isoformat() + "Z" if self.ready_at else None
+        }
+
+
+startup_report = StartupReport()
@@ -1,8 +1,8 @@
 from sqlmodel import Session, select
 from typing import Optional, List, Dict, Any
-from uuid import UUID
+from uuid import UUID, uuid4
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 import structlog
 
 from app.models import (
@@ -11,7 +11,13 @@ from app.models import (
     HypertensionAssessment, HeartAssessment, AnalyticsEvent,
     DiabetesRecommendation, HypertensionRecommendation, HeartRecommendation
 )
+from app.core.config import settings
 from app.core.security import get_password_hash
+from app.services.cohorts import sync_patient_dimension
+from app.services.event_sketches import event_sketches
+from app.services.reference_data import AssessmentTypeRef, reference_data
+from app.services.risk_sketches import risk_sketches
+from app.services.user_search import sync_user_search
 
 logger = structlog.get_logger()
 
@@ -25,14 +31,15 @@ def create_user(session: Session, email: str, password: str, role: str = "patien
         role=role
     )
     session.add(user)
-    session.commit()
-    session.refresh(user)
     
-    # Create patient profile if role is patient
+    # Create patient profile if role is patient, in the same transaction
     if role == "patient":
-        profile = PatientProfile(user_id=user.id)
-        session.add(profile)
-        session.commit()
+        session.flush()
+        session.add(PatientProfile(user_id=user.id))
+        sync_patient_dimension(session, [user.id])
+    sync_user_search(session, [user.id])
+    session.commit()
+    session.refresh(user)
     
     logger.info("User created", user_id=str(user.id), email=email, role=role)
     return user
@@ -56,15 +63,20 @@ def update_patient_profile(session: Session, user_id: UUID, profile_data: Dict[s
             setattr(profile, key, value)
     
     profile.updated_at = datetime.utcnow()
+    sync_patient_dimension(session, [user_id])
+    sync_user_search(session, [user_id])
     session.commit()
     session.refresh(profile)
     return profile
 
 # Assessment Type CRUD
-def get_assessment_type_by_slug(session: Session, slug: str) -> Optional[AssessmentType]:
-    """Get assessment type by slug"""
-    statement = select(AssessmentType).where(AssessmentType.slug == slug)
-    return session.exec(statement).first()
+def get_assessment_type_by_slug(session: Session, slug: str) -> Optional[AssessmentTypeRef]:
+    """Get assessment type by slug, from the reference data cache"""
+    return reference_data.get(session).assessment_types_by_slug.get(slug)
+
+def list_assessment_types(session: Session) -> List[AssessmentTypeRef]:
+    """Get all assessment types, from the reference data cache"""
+    return list(reference_data.get(session).assessment_types_by_slug.values())
 
 def create_assessment_types(session: Session):
     """Create default assessment types"""
@@ -74,15 +86,21 @@ def create_assessment_types(session: Session):
         {"slug": "heart", "title": "تقييم خطر أمراض القلب", "description": "تقييم خطر الإصابة بأمراض القلب والشرايين"}
     ]
     
+    existing = set(session.exec(select(AssessmentType.slug)).all())
     for type_data in types:
-        existing = get_assessment_type_by_slug(session, type_data["slug"])
-        if not existing:
+        if type_data["slug"] not in existing:
             assessment_type = AssessmentType(**type_data)
             session.add(assessment_type)
     
     session.commit()
+    reference_data.invalidate()
 
 # Draft CRUD
+def draft_expiry(user_id: Optional[UUID], saved_at: datetime) -> datetime:
+    """When a draft saved at saved_at expires; anonymous drafts get the shorter TTL"""
+    hours = settings.DRAFT_TTL_AUTHENTICATED_HOURS if user_id else settings.DRAFT_TTL_ANONYMOUS_HOURS
+    return saved_at + timedelta(hours=hours)
+
 def upsert_draft(session: Session, assessment_type_id: UUID, user_id: Optional[UUID], 
                 session_id: Optional[str], data: Dict[str, Any]) -> AssessmentDraft:
     """Create or update draft"""
@@ -97,19 +115,25 @@ def upsert_draft(session: Session, assessment_type_id: UUID, user_id: Optional[U
         statement = statement.where(AssessmentDraft.session_id == session_id)
     
     draft = session.exec(statement).first()
+    now = datetime.utcnow()
     
     if draft:
-        # Update existing
+        # Update existing; an expired draft not yet swept is reused as a new one
+        if draft.expires_at <= now:
+            draft.created_at = now
         draft.data = json.dumps(data)
-        draft.last_saved_at = datetime.utcnow()
-        draft.updated_at = datetime.utcnow()
+        draft.last_saved_at = now
+        draft.updated_at = now
+        draft.expires_at = draft_expiry(user_id, now)
     else:
         # Create new
         draft = AssessmentDraft(
             assessment_type_id=assessment_type_id,
             user_id=user_id,
             session_id=session_id,
-            data=json.dumps(data)
+            data=json.dumps(data),
+            last_saved_at=now,
+            expires_at=draft_expiry(user_id, now)
         )
         session.add(draft)
     
@@ -119,9 +143,10 @@ def upsert_draft(session: Session, assessment_type_id: UUID, user_id: Optional[U
 
 def get_draft(session: Session, assessment_type_id: UUID, user_id: Optional[UUID], 
              session_id: Optional[str]) -> Optional[AssessmentDraft]:
-    """Get draft by user or session"""
+    """Get draft by user or session; expired drafts count as absent"""
     statement = select(AssessmentDraft).where(
-        AssessmentDraft.assessment_type_id == assessment_type_id
+        AssessmentDraft.assessment_type_id == assessment_type_id,
+        AssessmentDraft.expires_at > datetime.utcnow()
     )
     
     if user_id:
@@ -165,18 +190,24 @@ def get_user_submissions(session: Session, user_id: UUID, page: int = 1, per_pag
 
 # Risk Assessment CRUD
 def create_risk_assessment(session: Session, survey_id: UUID, disease: str, 
-                          risk_score: float, risk_bucket: str, model_version: str = "v1.0") -> RiskAssessment:
-    """Create risk assessment"""
+                          risk_score: float, risk_bucket: str, model_version: str = "v1.0",
+                          auc_at_train: Optional[float] = None, risk_id: Optional[UUID] = None,
+                          details_status: str = "ready") -> RiskAssessment:
+    """Create risk assessment (and commit anything else pending on the session)"""
     risk = RiskAssessment(
+        id=risk_id or uuid4(),
+        details_status=details_status,
         survey_id=survey_id,
         disease=disease,
         model_version=model_version,
+        auc_at_train=auc_at_train,
         risk_score=risk_score,
         risk_bucket=risk_bucket
     )
     session.add(risk)
     session.commit()
     session.refresh(risk)
+    risk_sketches.record(disease, risk.risk_bucket, model_version, risk.predicted_at, risk_score)
     return risk
 
 def get_risk_assessment(session: Session, risk_id: UUID) -> Optional[RiskAssessment]:
@@ -185,35 +216,29 @@ def get_risk_assessment(session: Session, risk_id: UUID) -> Optional[RiskAssessm
     return session.exec(statement).first()
 
 # Disease-specific CRUD
-def create_diabetes_assessment(session: Session, risk_id: UUID, clinical_data: Dict[str, Any]) -> DiabetesAssessment:
-    """Create diabetes-specific assessment"""
-    diabetes = DiabetesAssessment(
+def build_diabetes_assessment(risk_id: UUID, clinical_data: Dict[str, Any]) -> DiabetesAssessment:
+    """Build (without saving) a diabetes-specific assessment"""
+    return DiabetesAssessment(
         risk_id=risk_id,
         pred_class=clinical_data.get("pred_class"),
         decision_threshold=clinical_data.get("decision_threshold"),
         calibration_method=clinical_data.get("calibration_method", "none"),
         pre_diabetes_flag=clinical_data.get("pre_diabetes_flag", False)
     )
-    session.add(diabetes)
-    session.commit()
-    return diabetes
 
-def create_hypertension_assessment(session: Session, risk_id: UUID, clinical_data: Dict[str, Any]) -> HypertensionAssessment:
-    """Create hypertension-specific assessment"""
-    hypertension = HypertensionAssessment(
+def build_hypertension_assessment(risk_id: UUID, clinical_data: Dict[str, Any]) -> HypertensionAssessment:
+    """Build (without saving) a hypertension-specific assessment"""
+    return HypertensionAssessment(
         risk_id=risk_id,
         systolic_mmhg=clinical_data.get("systolic_mmhg"),
         diastolic_mmhg=clinical_data.get("diastolic_mmhg"),
         heart_rate_bpm=clinical_data.get("heart_rate_bpm"),
         antihypertensive_medications=clinical_data.get("medications")
     )
-    session.add(hypertension)
-    session.commit()
-    return hypertension
 
-def create_heart_assessment(session: Session, risk_id: UUID, clinical_data: Dict[str, Any]) -> HeartAssessment:
-    """Create heart-specific assessment"""
-    heart = HeartAssessment(
+def build_heart_assessment(risk_id: UUID, clinical_data: Dict[str, Any]) -> HeartAssessment:
+    """Build (without saving) a heart-specific assessment"""
+    return HeartAssessment(
         risk_id=risk_id,
         cholesterol_mgdl=clinical_data.get("cholesterol_mgdl"),
         triglycerides_mgdl=clinical_data.get("triglycerides_mgdl"),
@@ -223,31 +248,53 @@ def create_heart_assessment(session: Session, risk_id: UUID, clinical_data: Dict
         smoking=clinical_data.get("smoking", False),
         obesity=clinical_data.get("obesity", False)
     )
+
+DISEASE_ASSESSMENT_BUILDERS = {
+    "diabetes": build_diabetes_assessment,
+    "hypertension": build_hypertension_assessment,
+    "heart": build_heart_assessment
+}
+
+def create_diabetes_assessment(session: Session, risk_id: UUID, clinical_data: Dict[str, Any]) -> DiabetesAssessment:
+    """Create diabetes-specific assessment"""
+    diabetes = build_diabetes_assessment(risk_id, clinical_data)
+    session.add(diabetes)
+    session.commit()
+    return diabetes
+
+def create_hypertension_assessment(session: Session, risk_id: UUID, clinical_data: Dict[str, Any]) -> HypertensionAssessment:
+    """Create hypertension-specific assessment"""
+    hypertension = build_hypertension_assessment(risk_id, clinical_data)
+    session.add(hypertension)
+    session.commit()
+    return hypertension
+
+def create_heart_assessment(session: Session, risk_id: UUID, clinical_data: Dict[str, Any]) -> HeartAssessment:
+    """Create heart-specific assessment"""
+    heart = build_heart_assessment(risk_id, clinical_data)
     session.add(heart)
     session.commit()
     return heart
 
 # Recommendations CRUD
+RECOMMENDATION_MODELS = {
+    "diabetes": DiabetesRecommendation,
+    "hypertension": HypertensionRecommendation,
+    "heart": HeartRecommendation
+}
+
+def build_recommendation(disease: str, user_id: Optional[UUID], risk_id: UUID, title: str,
+                         details: Optional[str], priority: str, **fields: Any) -> Any:
+    """Build (without saving) a disease-specific recommendation; fields may preset id, created_at"""
+    model = RECOMMENDATION_MODELS.get(disease)
+    if model is None:
+        raise ValueError(f"Unknown disease: {disease}")
+    return model(user_id=user_id, risk_id=risk_id, title=title, details=details, priority=priority, **fields)
+
 def create_recommendation(session: Session, disease: str, user_id: Optional[UUID], 
                          risk_id: UUID, title: str, details: Optional[str], priority: str) -> Any:
     """Create disease-specific recommendation"""
-    recommendation_data = {
-        "user_id": user_id,
-        "risk_id": risk_id,
-        "title": title,
-        "details": details,
-        "priority": priority
-    }
-    
-    if disease == "diabetes":
-        recommendation = DiabetesRecommendation(**recommendation_data)
-    elif disease == "hypertension":
-        recommendation = HypertensionRecommendation(**recommendation_data)
-    elif disease == "heart":
-        recommendation = HeartRecommendation(**recommendation_data)
-    else:
-        raise ValueError(f"Unknown disease: {disease}")
-    
+    recommendation = build_recommendation(disease, user_id, risk_id, title, details, priority)
     session.add(recommendation)
     session.commit()
     session.refresh(recommendation)
@@ -284,4 +331,5 @@ def create_analytics_event(session: Session, user_id: Optional[UUID], session_id
     )
     session.add(event)
     session.commit()
+    event_sketches.record(event_type, session_id, user_id, event.created_at)
     return event
\ No newline at end of file
@@ -1,30 +1,369 @@
+import hashlib
+import hmac
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
 from sqlmodel import SQLModel, create_engine, Session
 from app.core.config import settings
+from app.core.metrics import registry
 import structlog
 
 logger = structlog.get_logger()
 
-# Create engine
-if settings.ENVIRONMENT == "test":
-    engine = create_engine("sqlite:///./test.db", echo=False)
-else:
-    engine = create_engine(
-        settings.database_url,
-        echo=settings.LOG_LEVEL == "DEBUG",
-        pool_pre_ping=True,
-        pool_recycle=300
-    )
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The engine is created lazily, per process. Under gunicorn --preload the
+# app is imported in the master and then forked; pooled sockets inherited
+# across a fork would be shared by several workers, so a child discards the
+# inherited pool (without closing the parent's sockets) and builds its own
+# engine on first use. `engine` stays importable as a module attribute.
+_engine = None
+_engine_pid: Optional[int] = None
+_engine_lock = threading.Lock()
+
+def pool_settings() -> Dict[str, int]:
+    """Per-worker pool size, splitting DB_MAX_CONNECTIONS across WEB_CONCURRENCY workers"""
+    workers = max(1, settings.WEB_CONCURRENCY)
+    if settings.DB_MAX_CONNECTIONS:
+        per_worker = max(1, settings.DB_MAX_CONNECTIONS // workers)
+        overflow = min(settings.DB_MAX_OVERFLOW, per_worker // 2)
+        return {"pool_size": max(1, per_worker - overflow), "max_overflow": overflow}
+    return {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW}
+
+def create_app_engine():
+    """Build the primary engine for this process"""
+    if settings.ENVIRONMENT == "test":
+        bind = create_engine("sqlite:///./test.db", echo=False)
+    else:
+        bind = create_engine(
+            settings.database_url,
+            echo=settings.LOG_LEVEL == "DEBUG",
+            pool_pre_ping=True,
+            pool_recycle=300,
+            **pool_settings()
+        )
+    instrument_engine(bind, "primary")
+    return bind
+
+def get_engine():
+    """The primary engine for the current process, created on first use"""
+    global _engine, _engine_pid
+    pid = os.getpid()
+    if _engine is None or _engine_pid != pid:
+        with _engine_lock:
+            if _engine is None or _engine_pid != pid:
+                if _engine is not None:
+                    _engine.dispose(close=False)
+                _engine = create_app_engine()
+                _engine_pid = pid
+    return _engine
+
+_read_engine = None
+_read_engine_pid: Optional[int] = None
+
+def get_read_engine():
+    """The read replica engine for the current process, or None without DB_READ_REPLICA_URL"""
+    global _read_engine, _read_engine_pid
+    if not settings.DB_READ_REPLICA_URL:
+        return None
+    pid = os.getpid()
+    if _read_engine is None or _read_engine_pid != pid:
+        with _engine_lock:
+            if _read_engine is None or _read_engine_pid != pid:
+                if _read_engine is not None:
+                    _read_engine.dispose(close=False)
+                _read_engine = create_engine(
+                    settings.DB_READ_REPLICA_URL,
+                    echo=settings.LOG_LEVEL == "DEBUG",
+                    pool_pre_ping=True,
+                    pool_recycle=300,
+                    **({} if settings.DB_READ_REPLICA_URL.startswith("sqlite") else pool_settings())
+                )
+                instrument_engine(_read_engine, "replica")
+                _read_engine_pid = pid
+    return _read_engine
+
+def _reset_engine_after_fork():
+    global _engine, _engine_pid, _read_engine, _read_engine_pid, _engine_lock
+    _engine_lock = threading.Lock()
+    for bind in (_engine, _read_engine):
+        if bind is not None:
+            bind.dispose(close=False)
+    _engine = None
+    _engine_pid = None
+    _read_engine = None
+    _read_engine_pid = None
+
+os.register_at_fork(after_in_child=_reset_engine_after_fork)
+
+def __getattr__(name):
+    # `from app.database import engine` keeps working and resolves to this
+    # process's engine
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+DB_QUERY_DURATION = registry.histogram(
+    "db_query_duration_seconds", "Time spent executing SQL statements", ["engine", "operation"]
+)
+DB_POOL_SIZE = registry.gauge("db_pool_size", "Configured connection pool size", ["engine"])
+DB_POOL_CHECKED_OUT = registry.gauge("db_pool_checked_out", "Connections currently checked out", ["engine"])
+DB_POOL_OVERFLOW = registry.gauge("db_pool_overflow", "Connections open beyond the pool size", ["engine"])
+
+_instrumented_engines = {}
+
+def instrument_engine(bind, name: str):
+    """Record statement timings and expose pool usage for an engine"""
+    @event.listens_for(bind, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
 
-def create_db_and_tables():
-    """Create database tables"""
+    @event.listens_for(bind, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("query_started", None)
+        if started is not None:
+            operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            DB_QUERY_DURATION.observe(time.perf_counter() - started, engine=name, operation=operation)
+
+    _instrumented_engines[name] = bind
+
+def _pool_stat(method: str):
+    def collect():
+        values = {}
+        for name, bind in _instrumented_engines.items():
+            stat = getattr(bind.pool, method, None)
+            if callable(stat):
+                values[(name,)] = stat()
+        return values
+    return collect
+
+DB_POOL_SIZE.set_function(_pool_stat("size"))
+DB_POOL_CHECKED_OUT.set_function(_pool_stat("checkedout"))
+DB_POOL_OVERFLOW.set_function(_pool_stat("overflow"))
+
+def get_head_revision() -> Optional[str]:
+    """Latest Alembic revision shipped with the code"""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(os.path.join(PROJECT_ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(PROJECT_ROOT, "alembic"))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+def get_database_revision(bind=None) -> Optional[str]:
+    """Alembic revision stamped in the database, or None if it was never migrated"""
+    from alembic.runtime.migration import MigrationContext
+
+    with (bind or get_engine()).connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+def schema_is_current(bind=None) -> bool:
+    """True when the database is already migrated to the code's head revision"""
+    head = get_head_revision()
+    return head is not None and get_database_revision(bind) == head
+
+def create_db_and_tables(bind=None) -> str:
+    """Create database tables unless migrations already brought the schema to head"""
+    bind = bind or get_engine()
+    if not settings.DB_CREATE_ALL_ON_STARTUP:
+        logger.info("Schema creation on startup disabled")
+        return "disabled"
     try:
-        SQLModel.metadata.create_all(engine)
+        if schema_is_current(bind):
+            logger.info("Database schema at migration head, skipping create_all")
+            return "skipped"
+        SQLModel.metadata.create_all(bind)
         logger.info("Database tables created successfully")
+        return "created"
     except Exception as e:
         logger.error("Failed to create database tables", error=str(e))
         raise
 
+def warm_pool(connections: int, bind=None) -> int:
+    """Open pooled connections concurrently so early requests skip the connect cost"""
+    bind = bind or get_engine()
+    pool_size = getattr(bind.pool, "size", None)
+    if callable(pool_size):
+        connections = min(connections, pool_size())
+    if connections <= 0:
+        return 0
+
+    def connect(_):
+        connection = bind.connect()
+        connection.exec_driver_sql("SELECT 1")
+        return connection
+
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        opened = list(executor.map(connect, range(connections)))
+    for connection in opened:
+        connection.close()
+    return len(opened)
+
+DB_READ_ROUTING = registry.counter(
+    "db_read_routing_total", "Read-only sessions by target engine and reason", ["target", "reason"]
+)
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# A successful write also hands the caller a signed marker holding when its
+# read-your-writes window ends, as a cookie and a response header. The
+# caller sends it back (the cookie automatically, or the header), so the
+# next read is routed to the primary whichever worker or host serves it.
+WRITE_MARKER_COOKIE = "read_your_writes"
+WRITE_MARKER_HEADER = "x-read-your-writes"
+
+def request_principals(request: Request) -> List[str]:
+    """Keys identifying who made a request: bearer token and session id"""
+    principals = []
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+        principals.append("token:" + hashlib.sha256(token.encode()).hexdigest()[:32])
+    session_id = request.headers.get("x-session-id") or request.query_params.get("session_id")
+    if session_id:
+        principals.append(f"session:{session_id}")
+    return principals
+
+def _marker_signature(expires: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), f"read-your-writes:{expires}".encode(), hashlib.sha256).hexdigest()[:32]
+
+def write_marker(now: Optional[float] = None) -> str:
+    """A marker for a write made now: the window's end (epoch ms) and its signature"""
+    now = time.time() if now is None else now
+    expires = str(int((now + settings.READ_YOUR_WRITES_SECONDS) * 1000))
+    return f"{expires}.{_marker_signature(expires)}"
+
+def marker_is_fresh(marker: Optional[str], now: Optional[float] = None) -> bool:
+    """True for a genuine marker whose window hasn't ended"""
+    if not marker or "." not in marker:
+        return False
+    expires, signature = marker.split(".", 1)
+    if not expires.isdigit() or not hmac.compare_digest(signature, _marker_signature(expires)):
+        return False
+    now_ms = (time.time() if now is None else now) * 1000
+    # A window can't reach further ahead than one write's, whatever the caller kept
+    return now_ms < int(expires) <= now_ms + settings.READ_YOUR_WRITES_SECONDS * 1000 + 1000
+
+def request_wrote_recently(request: Request) -> bool:
+    return marker_is_fresh(request.cookies.get(WRITE_MARKER_COOKIE) or request.headers.get(WRITE_MARKER_HEADER))
+
+class ReadRouter:
+    """
+    Routes read-only sessions to the replica unless the caller wrote
+    recently (read-your-writes) or the replica recently failed to connect
+    (circuit breaker), in which case the primary serves the read. Recent
+    writers are remembered in this process by principal and, across
+    processes, by the write marker the caller sends back.
+    """
+
+    def __init__(self, read_your_writes_seconds: float, failure_cooldown_seconds: float,
+                 max_principals: int = 100000):
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.failure_cooldown_seconds = failure_cooldown_seconds
+        self.max_principals = max_principals
+        self._recent_writes: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._replica_down_until = 0.0
+
+    def mark_write(self, principals: List[str]):
+        expires = time.monotonic() + self.read_your_writes_seconds
+        with self._lock:
+            for principal in principals:
+                self._recent_writes[principal] = expires
+                self._recent_writes.move_to_end(principal)
+            while len(self._recent_writes) > self.max_principals:
+                self._recent_writes.popitem(last=False)
+
+    def recently_wrote(self, principals: List[str]) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            for principal in principals:
+                expires = self._recent_writes.get(principal)
+                if expires is None:
+                    continue
+                if expires > now:
+                    return True
+                del self._recent_writes[principal]
+        return False
+
+    def replica_available(self) -> bool:
+        return time.monotonic() >= self._replica_down_until
+
+    def record_replica_failure(self, error: Exception):
+        self._replica_down_until = time.monotonic() + self.failure_cooldown_seconds
+        logger.warning(
+            "Read replica unavailable, reading from primary",
+            error=str(error),
+            retry_in_s=self.failure_cooldown_seconds
+        )
+
+    def read_bind(self, primary, replica, principals: List[str], marked: bool = False):
+        """Engine or connection a read-only session should use, and the reason"""
+        if replica is None:
+            return primary, "no_replica"
+        if marked or self.recently_wrote(principals):
+            return primary, "read_your_writes"
+        if not self.replica_available():
+            return primary, "replica_down"
+        try:
+            return replica.connect(), "replica"
+        except DBAPIError as e:
+            self.record_replica_failure(e)
+            return primary, "replica_failed"
+
+read_router = ReadRouter(settings.READ_YOUR_WRITES_SECONDS, settings.REPLICA_FAILURE_COOLDOWN_SECONDS)
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI middleware marking callers of successful write requests in the read router"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                # Mark before the response leaves, so the caller's next read
+                # can't beat it. Reads go to the primary until the replica has
+                # had time to catch up with whatever this request wrote.
+                read_router.mark_write(request_principals(Request(scope)))
+                if settings.DB_READ_REPLICA_URL and settings.READ_YOUR_WRITES_SECONDS > 0:
+                    marker = write_marker()
+                    headers = MutableHeaders(scope=message)
+                    headers.append(WRITE_MARKER_HEADER, marker)
+                    headers.append("set-cookie", (
+                        f"{WRITE_MARKER_COOKIE}={marker}; Max-Age={math.ceil(settings.READ_YOUR_WRITES_SECONDS)}; "
+                        "Path=/; HttpOnly; SameSite=Lax"
+                    ))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
 def get_session():
     """Get database session"""
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+    with Session(get_engine()) as session:
+        yield session
+
+def get_read_session(request: Request):
+    """Get a session for read-only endpoints, on the replica when it is safe to use"""
+    bind, reason = read_router.read_bind(
+        get_engine(), get_read_engine(), request_principals(request), request_wrote_recently(request)
+    )
+    DB_READ_ROUTING.inc(target="replica" if reason == "replica" else "primary", reason=reason)
+    try:
+        with Session(bind) as session:
+            yield session
+    finally:
+        if reason == "replica":
+            bind.close()
@@ -1,31 +1,31 @@
-from fastapi import FastAPI, HTTPException
+from app.core.startup import startup_report
+
+import asyncio
+from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from sqlmodel import Session
 import structlog
-import uvicorn
 
 from app.core.config import settings
-from app.database import create_db_and_tables
-from app.routers import auth, drafts, submissions, risks, recommendations, admin, analytics
+from app.core.logging import configure_logging
+from app.core.metrics import MetricsMiddleware, generate_latest, start_flusher
+from app.core.rate_limit import AdmissionMiddleware
+from app.core import security
+from app.database import get_engine, get_read_session, create_db_and_tables, warm_pool, ReadYourWritesMiddleware
+from app.services.background import background_runner
+from app.services.draft_expiry import sweep_expired_drafts
+from app.services.event_sketches import EVENT_SKETCH_JOB, event_sketches, flush_event_sketches
+from app.services.model_registry import MODEL_SYNC_JOB, model_registry
+from app.services.outbox import OUTBOX_JOB, run_outbox
+from app.services.reference_data import reference_data
+from app.services.retention import run_retention
+from app.services.risk_sketches import RISK_SKETCH_JOB, flush_risk_sketches, risk_sketches
+from app.routers import auth, drafts, submissions, risks, recommendations, admin, analytics, patients, cohorts
 
 # Configure structured logging
-structlog.configure(
-    processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
-    ],
-    context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    wrapper_class=structlog.stdlib.BoundLogger,
-    cache_logger_on_first_use=True,
-)
+configure_logging()
 
 logger = structlog.get_logger()
 
@@ -37,6 +37,9 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Added first so it sits inside CORS: rejected requests still get CORS headers
+app.add_middleware(AdmissionMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -44,8 +47,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Read-Your-Writes"],
 )
 
+app.add_middleware(ReadYourWritesMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(drafts.router, prefix="/drafts", tags=["Drafts"])
@@ -54,6 +62,8 @@ app.include_router(risks.router, prefix="/risks", tags=["Risk Assessments"])
 app.include_router(recommendations.router, prefix="/recommendations", tags=["Recommendations"])
 app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+app.include_router(patients.router, prefix="/patients", tags=["Patients"])
+app.include_router(cohorts.router, prefix="/cohorts", tags=["Cohorts"])
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -66,11 +76,68 @@ async def http_exception_handler(request, exc):
         }
     )
 
+startup_report.mark_imported()
+
+def warm_reference_data() -> int:
+    """Load the reference data cache so the first draft/submission doesn't pay for it"""
+    with Session(get_engine()) as session:
+        return len(reference_data.load(session).assessment_types_by_slug)
+
+async def warm_up():
+    """Run the independent warm-up steps concurrently on worker threads"""
+    steps = {
+        "engine_pool": lambda: warm_pool(settings.STARTUP_WARM_CONNECTIONS),
+        "reference_data": warm_reference_data,
+        "security_backends": security.warm_up
+    }
+
+    async def run_step(name, func):
+        with startup_report.phase(f"warmup.{name}"):
+            try:
+                await run_in_threadpool(func)
+            except Exception as e:
+                logger.warning("Startup warm-up step failed", step=name, error=str(e))
+
+    await asyncio.gather(*(run_step(name, func) for name, func in steps.items()))
+
+def register_background_jobs():
+    background_runner.register(OUTBOX_JOB, run_outbox, settings.OUTBOX_POLL_INTERVAL_SECONDS)
+    background_runner.register(RISK_SKETCH_JOB, flush_risk_sketches, settings.RISK_SKETCH_FLUSH_SECONDS)
+    background_runner.register(EVENT_SKETCH_JOB, flush_event_sketches, settings.EVENT_SKETCH_FLUSH_SECONDS)
+    if settings.MODEL_DIR and settings.MODEL_SYNC_INTERVAL_SECONDS > 0:
+        background_runner.register(MODEL_SYNC_JOB, model_registry.sync, settings.MODEL_SYNC_INTERVAL_SECONDS)
+    background_runner.register("draft_expiry", sweep_expired_drafts, settings.DRAFT_SWEEP_INTERVAL_SECONDS, exclusive=True)
+    if settings.RETENTION_ENABLED:
+        background_runner.register("retention", run_retention, settings.RETENTION_INTERVAL_SECONDS, exclusive=True)
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting HealthBeat API", version="1.0.0")
-    create_db_and_tables()
-    logger.info("Database tables created/verified")
+    startup_report.begin()
+    with startup_report.phase("schema"):
+        startup_report.schema_action = await run_in_threadpool(create_db_and_tables)
+    if settings.MODEL_DIR:
+        with startup_report.phase("models"):
+            loaded = await run_in_threadpool(model_registry.load_all)
+            logger.info("Risk models loaded", models=loaded)
+    if settings.STARTUP_WARMUP:
+        with startup_report.phase("warmup"):
+            await warm_up()
+    if settings.METRICS_ENABLED:
+        start_flusher()
+    if settings.BACKGROUND_JOBS_ENABLED:
+        register_background_jobs()
+        background_runner.start()
+    startup_report.finish()
+    logger.info("Startup complete", **startup_report.as_dict())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await run_in_threadpool(background_runner.stop)
+    if settings.BACKGROUND_JOBS_ENABLED:
+        # Don't lose the sketch samples and funnel stages buffered since the last flush
+        await run_in_threadpool(risk_sketches.flush)
+        await run_in_threadpool(event_sketches.flush)
 
 @app.get("/")
 async def root():
@@ -85,31 +152,29 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": "2024-01-01T00:00:00Z"}
 
+@app.get("/health/startup")
+async def startup_timings():
+    """Import and startup timings of this process"""
+    return startup_report.as_dict()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this process, or all workers in multiprocess mode"""
+    body = await run_in_threadpool(generate_latest)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/assessments")
-async def get_assessment_types():
+async def get_assessment_types(request: Request, session: Session = Depends(get_read_session)):
     """Get available assessment types"""
-    return [
-        {
-            "id": "diabetes",
-            "slug": "diabetes", 
-            "title": "تقييم خطر السكري",
-            "description": "تقييم خطر الإصابة بداء السكري من النوع الثاني"
-        },
-        {
-            "id": "hypertension",
-            "slug": "hypertension",
-            "title": "تقييم خطر ارتفاع ضغط الدم", 
-            "description": "تقييم خطر الإصابة بارتفاع ضغط الدم"
-        },
-        {
-            "id": "heart",
-            "slug": "heart",
-            "title": "تقييم خطر أمراض القلب",
-            "description": "تقييم خطر الإصابة بأمراض القلب والشرايين"
-        }
-    ]
+    snapshot = reference_data.get(session)
+    headers = {"ETag": snapshot.assessments_etag}
+    if request.headers.get("if-none-match") == snapshot.assessments_etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.assessments_json, media_type="application/json", headers=headers)
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
@@ -1,6 +1,7 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import DDL, Index, UniqueConstraint, event
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 from uuid import UUID, uuid4
 from enum import Enum
 
@@ -67,6 +68,11 @@ class AssessmentType(SQLModel, table=True):
 
 class AssessmentDraft(SQLModel, table=True):
     __tablename__ = "assessment_drafts"
+    # Drafts are looked up by owner and type on every save/load
+    __table_args__ = (
+        Index("ix_assessment_drafts_user_type", "user_id", "assessment_type_id"),
+        Index("ix_assessment_drafts_session_type", "session_id", "assessment_type_id"),
+    )
     
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     assessment_type_id: UUID = Field(foreign_key="assessment_types.id")
@@ -74,6 +80,8 @@ class AssessmentDraft(SQLModel, table=True):
     session_id: Optional[str] = Field(max_length=200, default=None)
     data: str = Field()  # JSON string
     last_saved_at: datetime = Field(default_factory=datetime.utcnow)
+    # last_saved_at plus the anonymous or authenticated draft TTL
+    expires_at: datetime = Field(index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -83,6 +91,10 @@ class AssessmentDraft(SQLModel, table=True):
 
 class SurveySubmission(SQLModel, table=True):
     __tablename__ = "survey_submissions"
+    # A patient's submissions in order (history lists, timelines)
+    __table_args__ = (
+        Index("ix_survey_submissions_user_submitted", "user_id", "submitted_at"),
+    )
     
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     assessment_type_id: UUID = Field(foreign_key="assessment_types.id")
@@ -95,24 +107,32 @@ class SurveySubmission(SQLModel, table=True):
     # Relationships
     assessment_type: AssessmentType = Relationship(back_populates="submissions")
     user: Optional[User] = Relationship(back_populates="submissions")
-    risk_assessment: Optional["RiskAssessment"] = Relationship(back_populates="survey")
+    risk_assessments: List["RiskAssessment"] = Relationship(back_populates="survey")
 
 class RiskAssessment(SQLModel, table=True):
     __tablename__ = "risk_assessments"
+    # One assessment per survey per model version, so rescoring with a new
+    # model keeps the earlier results side by side.
+    __table_args__ = (
+        UniqueConstraint("survey_id", "model_version", name="uq_risk_assessments_survey_model"),
+    )
     
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    survey_id: UUID = Field(foreign_key="survey_submissions.id", unique=True)
+    survey_id: UUID = Field(foreign_key="survey_submissions.id", index=True)
     disease: str = Field(max_length=20)  # diabetes/hypertension/heart
     model_version: str = Field(max_length=100)
     risk_score: float = Field(ge=0.0, le=1.0)
     risk_bucket: RiskBucket
     auc_at_train: Optional[float] = Field(ge=0.0, le=1.0, default=None)
     predicted_at: datetime = Field(default_factory=datetime.utcnow)
+    # pending while the outbox is still writing the disease details and
+    # recommendations; failed if it gave up
+    details_status: str = Field(default="ready", max_length=20)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     # Relationships
-    survey: SurveySubmission = Relationship(back_populates="risk_assessment")
+    survey: SurveySubmission = Relationship(back_populates="risk_assessments")
     diabetes_assessment: Optional["DiabetesAssessment"] = Relationship(back_populates="risk")
     hypertension_assessment: Optional["HypertensionAssessment"] = Relationship(back_populates="risk")
     heart_assessment: Optional["HeartAssessment"] = Relationship(back_populates="risk")
@@ -215,7 +235,7 @@ class AnalyticsEvent(SQLModel, table=True):
     session_id: Optional[str] = Field(max_length=200, default=None)
     event_type: str = Field(max_length=100)
     payload: Optional[str] = None  # JSON
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
 class AuditLog(SQLModel, table=True):
     __tablename__ = "audit_logs"
@@ -226,4 +246,159 @@ class AuditLog(SQLModel, table=True):
     resource_type: Optional[str] = Field(max_length=100)
     resource_id: Optional[UUID] = None
     details: Optional[str] = None  # JSON
-    created_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class IdempotencyKey(SQLModel, table=True):
+    __tablename__ = "idempotency_keys"
+    
+    # sha256 of the caller (user or session) and their Idempotency-Key header
+    key: str = Field(primary_key=True, max_length=64)
+    request_hash: str = Field(max_length=64)
+    status: str = Field(default="in_progress", max_length=20)  # in_progress/completed
+    status_code: Optional[int] = None
+    response: Optional[str] = None  # JSON
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
+
+class JobLease(SQLModel, table=True):
+    __tablename__ = "job_leases"
+    
+    # Held by the one worker allowed to run an exclusive background job
+    name: str = Field(primary_key=True, max_length=100)
+    owner: str = Field(max_length=200)
+    expires_at: datetime
+
+class OutboxTask(SQLModel, table=True):
+    __tablename__ = "outbox_tasks"
+    # Workers poll for pending tasks that are due
+    __table_args__ = (
+        Index("ix_outbox_tasks_status_available", "status", "available_at"),
+    )
+    
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    kind: str = Field(max_length=100)
+    payload: str  # JSON
+    status: str = Field(default="pending", max_length=20)  # pending/failed; done tasks are deleted
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = None
+    # Next attempt after a failure, or when a claimed task's lock runs out
+    available_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class LatestRisk(SQLModel, table=True):
+    __tablename__ = "latest_risks"
+    # Cohort queries filter on disease and bucket and page by predicted_at;
+    # on SQL Server the score and risk id are carried in the index too
+    __table_args__ = (
+        Index("ix_latest_risks_cohort", "disease", "risk_bucket", "predicted_at", "user_id",
+              mssql_include=["risk_score", "risk_id"]),
+    )
+    
+    # Most recent assessment per patient and disease, kept up to date on
+    # submit so summaries are a primary key lookup
+    user_id: UUID = Field(foreign_key="users.id", primary_key=True)
+    disease: str = Field(primary_key=True, max_length=20)
+    risk_id: UUID = Field(foreign_key="risk_assessments.id")
+    survey_id: UUID = Field(foreign_key="survey_submissions.id")
+    risk_score: float
+    risk_bucket: RiskBucket
+    model_version: str = Field(max_length=100)
+    submitted_at: datetime
+    predicted_at: datetime
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class PatientDimension(SQLModel, table=True):
+    __tablename__ = "patient_dimension"
+    
+    # One flat row per patient (users + patient_profiles) for cohort queries,
+    # rewritten whenever either source row changes
+    user_id: UUID = Field(foreign_key="users.id", primary_key=True)
+    email: str = Field(max_length=255)
+    full_name: Optional[str] = Field(default=None, max_length=255)
+    sex: Optional[str] = Field(default=None, max_length=1)
+    birth_date: Optional[datetime] = None
+    status: UserStatus
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class RiskScoreSketch(SQLModel, table=True):
+    __tablename__ = "risk_score_sketches"
+    
+    # t-digest of risk_score per disease, day (of predicted_at), bucket and
+    # model version; merged at query time for any date range
+    disease: str = Field(primary_key=True, max_length=20)
+    day: date = Field(primary_key=True)
+    risk_bucket: RiskBucket = Field(primary_key=True)
+    model_version: str = Field(primary_key=True, max_length=100)
+    count: int
+    score_sum: float
+    digest: bytes
+    # Bumped on every merge; flushes update only the version they read
+    version: int = Field(default=1)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class EventSketch(SQLModel, table=True):
+    __tablename__ = "event_sketches"
+    
+    # Analytics events per day (of created_at) and event type, with
+    # HyperLogLog sketches of their distinct sessions and users
+    day: date = Field(primary_key=True)
+    event_type: str = Field(primary_key=True, max_length=100)
+    count: int
+    sessions: bytes
+    users: bytes
+    # Bumped on every merge; flushes update only the version they read
+    version: int = Field(default=1)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class FunnelSession(SQLModel, table=True):
+    __tablename__ = "funnel_sessions"
+    
+    # Funnel stages each analytics session has reached (a bitmask), dated by
+    # its first funnel event
+    session_id: str = Field(primary_key=True, max_length=200)
+    day: date = Field(index=True)
+    stages: int
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class FunnelCount(SQLModel, table=True):
+    __tablename__ = "funnel_counts"
+    
+    # Sessions per day and stage bitmask, kept in step with funnel_sessions
+    day: date = Field(primary_key=True)
+    stages: int = Field(primary_key=True)
+    sessions: int
+
+class UserSearchDocument(SQLModel, table=True):
+    __tablename__ = "user_search_documents"
+    
+    # Normalized email and name tokens per user, the text the admin user
+    # search indexes (FTS5 on SQLite, full-text on SQL Server). The integer
+    # id is the full-text key.
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: UUID = Field(foreign_key="users.id", unique=True)
+    document: str = Field(max_length=1000)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+# SQLite: an external-content FTS5 table over user_search_documents, kept in
+# step by triggers. On SQL Server the full-text index is created by its
+# migration, since it can't be created inside create_all's transaction.
+USER_SEARCH_FTS5_DDL = [
+    """CREATE VIRTUAL TABLE user_search_fts USING fts5(
+        document, content='user_search_documents', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 0', prefix='2 3 4'
+    )""",
+    """CREATE TRIGGER user_search_documents_ai AFTER INSERT ON user_search_documents BEGIN
+        INSERT INTO user_search_fts(rowid, document) VALUES (new.id, new.document);
+    END""",
+    """CREATE TRIGGER user_search_documents_ad AFTER DELETE ON user_search_documents BEGIN
+        INSERT INTO user_search_fts(user_search_fts, rowid, document) VALUES ('delete', old.id, old.document);
+    END""",
+    """CREATE TRIGGER user_search_documents_au AFTER UPDATE ON user_search_documents BEGIN
+        INSERT INTO user_search_fts(user_search_fts, rowid, document) VALUES ('delete', old.id, old.document);
+        INSERT INTO user_search_fts(rowid, document) VALUES (new.id, new.document);
+    END"""
+]
+for statement in USER_SEARCH_FTS5_DDL:
+    event.listen(UserSearchDocument.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(UserSearchDocument.__table__, "before_drop",
+             DDL("DROP TABLE IF EXISTS user_search_fts").execute_if(dialect="sqlite"))
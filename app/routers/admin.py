@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select, func
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from datetime import date, datetime, timedelta
 from uuid import UUID
 import structlog
 
-from app.database import get_session
-from app.schemas import UserResponse, PaginatedResponse
-from app.models import User, RiskAssessment, SurveySubmission, AnalyticsEvent
+from app.database import get_session, get_read_session
+from app.schemas import UserResponse, UserSearchResult, PaginatedResponse
+from app.models import User, RiskAssessment, RiskBucket, SurveySubmission, AnalyticsEvent
 from app.auth import get_admin_user
+from app.crud import get_assessment_type_by_slug
+from app.services.model_registry import model_registry, ModelArtifactError
+from app.services.risk_sketches import INTERVALS, score_distribution
+from app.services.cohorts import sync_patient_dimension
+from app.services.event_sketches import funnel_report
+from app.services.export import stream_assessments, EXPORT_FORMATS
+from app.services.user_import import UserImporter, import_chunks, get_hash_executor
+from app.services.user_search import search_users
 
 logger = structlog.get_logger()
 router = APIRouter()
@@ -18,7 +29,7 @@ async def list_users(
     per_page: int = Query(10, ge=1, le=100),
     role: str = Query(None, description="Filter by role"),
     status: str = Query(None, description="Filter by status"),
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_admin_user)
 ):
     """List users with filters (admin only)"""
@@ -48,70 +59,222 @@ async def list_users(
         for user in users
     ]
 
+@router.get("/users/search", response_model=PaginatedResponse)
+async def search_users_endpoint(
+    q: str = Query(..., min_length=1, max_length=200, description="Email or name prefixes"),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=100),
+    role: str = Query(None, description="Filter by role"),
+    status: str = Query(None, description="Filter by status"),
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_admin_user)
+):
+    """Search users by email or name, best matches first (admin only)"""
+    rows, total = search_users(session, q, role, status, page, per_page)
+    
+    return PaginatedResponse(
+        items=[UserSearchResult(**row) for row in rows],
+        total=total,
+        page=page,
+        per_page=per_page,
+        pages=(total + per_page - 1) // per_page
+    )
+
+@router.post("/users/import", response_model=Dict[str, Any])
+async def import_users(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_admin_user)
+):
+    """Create patient/provider accounts from a streamed CSV or NDJSON body (admin only)"""
+    logger.info("User import started", admin_id=str(current_user.id), format=format)
+    importer = UserImporter(session, format, executor=get_hash_executor())
+    return await import_chunks(importer, request.stream())
+
 @router.get("/assessments", response_model=Dict[str, Any])
 async def get_assessment_metrics(
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_admin_user)
 ):
     """Get assessment metrics and model performance (admin only)"""
+    diseases = ("diabetes", "hypertension", "heart")
     
-    # Count submissions by disease
-    diabetes_count = session.exec(
-        select(func.count(RiskAssessment.id)).where(RiskAssessment.disease == "diabetes")
-    ).first()
-    
-    hypertension_count = session.exec(
-        select(func.count(RiskAssessment.id)).where(RiskAssessment.disease == "hypertension")
-    ).first()
-    
-    heart_count = session.exec(
-        select(func.count(RiskAssessment.id)).where(RiskAssessment.disease == "heart")
-    ).first()
-    
-    # Average risk scores by disease
-    avg_diabetes_risk = session.exec(
-        select(func.avg(RiskAssessment.risk_score)).where(RiskAssessment.disease == "diabetes")
-    ).first()
-    
-    avg_hypertension_risk = session.exec(
-        select(func.avg(RiskAssessment.risk_score)).where(RiskAssessment.disease == "hypertension")
-    ).first()
+    # Rescoring keeps each model version's result side by side, so only each
+    # survey's most recent assessment counts
+    newest = func.row_number().over(
+        partition_by=RiskAssessment.survey_id,
+        order_by=(RiskAssessment.predicted_at.desc(), RiskAssessment.id.desc())
+    )
+    ranked = select(
+        RiskAssessment.disease, RiskAssessment.risk_score, RiskAssessment.risk_bucket, newest.label("newest")
+    ).subquery()
+    current = select(ranked.c.disease, ranked.c.risk_score, ranked.c.risk_bucket).where(ranked.c.newest == 1).subquery()
     
-    avg_heart_risk = session.exec(
-        select(func.avg(RiskAssessment.risk_score)).where(RiskAssessment.disease == "heart")
-    ).first()
+    # Count and average risk score by disease
+    totals = {
+        row.disease: row for row in session.exec(
+            select(current.c.disease, func.count().label("count"), func.avg(current.c.risk_score).label("average"))
+            .group_by(current.c.disease)
+        )
+    }
     
     # Risk bucket distribution
-    risk_distribution = {}
-    for disease in ["diabetes", "hypertension", "heart"]:
-        for bucket in ["low", "medium", "high"]:
-            count = session.exec(
-                select(func.count(RiskAssessment.id)).where(
-                    RiskAssessment.disease == disease,
-                    RiskAssessment.risk_bucket == bucket
-                )
-            ).first()
-            risk_distribution[f"{disease}_{bucket}"] = count or 0
+    risk_distribution = {f"{disease}_{bucket.value}": 0 for disease in diseases for bucket in RiskBucket}
+    for row in session.exec(
+        select(current.c.disease, current.c.risk_bucket, func.count().label("count"))
+        .group_by(current.c.disease, current.c.risk_bucket)
+    ):
+        if row.disease in diseases:
+            risk_distribution[f"{row.disease}_{RiskBucket(row.risk_bucket).value}"] = row.count
     
     return {
         "total_assessments": {
-            "diabetes": diabetes_count or 0,
-            "hypertension": hypertension_count or 0,
-            "heart": heart_count or 0
+            disease: totals[disease].count if disease in totals else 0
+            for disease in diseases
         },
         "average_risk_scores": {
-            "diabetes": round(avg_diabetes_risk or 0, 4),
-            "hypertension": round(avg_hypertension_risk or 0, 4),
-            "heart": round(avg_heart_risk or 0, 4)
+            disease: round(totals[disease].average or 0, 4) if disease in totals else 0
+            for disease in diseases
         },
         "risk_distribution": risk_distribution,
         "model_versions": {
-            "diabetes": "v1.0",
-            "hypertension": "v1.0", 
-            "heart": "v1.0"
+            disease: active_model_version(disease)
+            for disease in diseases
         }
     }
 
+def active_model_version(disease: str) -> str:
+    model = model_registry.get(disease)
+    return model.version if model else "rule_based_v1.0"
+
+@router.get("/distributions/risk-scores", response_model=Dict[str, Any])
+async def get_risk_score_distribution(
+    disease: str = Query(..., description="Assessment type slug"),
+    from_: Optional[date] = Query(None, alias="from", description="First day (default: 30 days ago)"),
+    to: Optional[date] = Query(None, description="Day after the last (default: tomorrow)"),
+    bucket: Optional[RiskBucket] = Query(None),
+    model_version: Optional[str] = Query(None, description="Default: the serving version; 'all' merges every version"),
+    quantiles: str = Query("0.25,0.5,0.75,0.9,0.99", description="Comma-separated, each between 0 and 1"),
+    bins: int = Query(10, ge=1, le=100, description="Histogram bins over [0, 1]"),
+    interval: Optional[str] = Query(None, description="Also summarize per day, week or month"),
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_admin_user)
+):
+    """Risk score quantiles and histogram for a disease, estimated from daily sketches (admin only)"""
+    if not get_assessment_type_by_slug(session, disease):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assessment type not found"
+        )
+    
+    try:
+        points = [float(q) for q in quantiles.split(",") if q.strip()]
+    except ValueError:
+        points = None
+    if not points or any(not 0 <= q <= 1 for q in points):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="quantiles must be comma-separated numbers between 0 and 1"
+        )
+    
+    if interval is not None and interval not in INTERVALS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"interval must be one of: {', '.join(INTERVALS)}"
+        )
+    
+    # Rescored surveys have a row per model version, so by default only the
+    # serving version counts, as each survey's newest score does in the metrics
+    if model_version is None:
+        model_version = active_model_version(disease)
+    elif model_version == "all":
+        model_version = None
+    
+    to = to or datetime.utcnow().date() + timedelta(days=1)
+    from_ = from_ or to - timedelta(days=31)
+    return score_distribution(session, disease, from_, to, bucket, model_version, points, bins, interval)
+
+@router.get("/funnel", response_model=Dict[str, Any])
+async def get_funnel(
+    from_: Optional[date] = Query(None, alias="from", description="First day (default: 30 days ago)"),
+    to: Optional[date] = Query(None, description="Day after the last (default: tomorrow)"),
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_admin_user)
+):
+    """Assessment funnel conversion and estimated distinct sessions and users (admin only)"""
+    to = to or datetime.utcnow().date() + timedelta(days=1)
+    from_ = from_ or to - timedelta(days=31)
+    if from_ >= to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="from must be before to"
+        )
+    
+    return funnel_report(session, from_, to)
+
+@router.get("/models")
+async def list_models(current_user: User = Depends(get_admin_user)):
+    """List the models currently serving each disease (admin only)"""
+    return model_registry.active()
+
+@router.post("/models/reload")
+async def reload_models(
+    disease: str = Query(None, description="Reload a single disease"),
+    version: str = Query(None, description="Version to activate; defaults to CURRENT or latest"),
+    current_user: User = Depends(get_admin_user)
+):
+    """Load models from MODEL_DIR and hot-swap them in (admin only)"""
+    try:
+        if disease and version:
+            # Named in CURRENT so every worker's model_sync job loads it too
+            model = await run_in_threadpool(model_registry.activate, disease, version)
+            loaded = {disease: model.version}
+        elif disease:
+            model = await run_in_threadpool(model_registry.load, disease)
+            loaded = {disease: model.version}
+        else:
+            loaded = await run_in_threadpool(model_registry.load_all)
+    except ModelArtifactError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    logger.info("Models reloaded", admin_id=str(current_user.id), loaded=loaded)
+    return {"loaded": loaded, "active": model_registry.active()}
+
+@router.get("/export/assessments")
+async def export_assessments(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    from_: Optional[datetime] = Query(None, alias="from", description="Predicted at or after"),
+    to: Optional[datetime] = Query(None, description="Predicted before"),
+    disease: Optional[str] = Query(None, pattern="^(diabetes|hypertension|heart)$"),
+    gzip: bool = Query(False, description="Compress the download with gzip"),
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_admin_user)
+):
+    """Stream risk assessments with submissions and recommendations (admin only)"""
+    logger.info(
+        "Assessment export started",
+        admin_id=str(current_user.id),
+        format=format,
+        disease=disease,
+        start=from_.isoformat() if from_ else None,
+        end=to.isoformat() if to else None
+    )
+    filename = f"assessments-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.{format}"
+    media_type = EXPORT_FORMATS[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        stream_assessments(session.get_bind().engine, format, from_, to, disease, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.put("/users/{user_id}/status")
 async def update_user_status(
     user_id: UUID,
@@ -136,6 +299,7 @@ async def update_user_status(
         )
     
     user.status = new_status
+    sync_patient_dimension(session, [user_id])
     session.commit()
     
     logger.info(
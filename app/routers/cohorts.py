@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlmodel import Session
+from typing import Optional
+from datetime import datetime
+import structlog
+
+from app.core.config import settings
+from app.database import get_read_session
+from app.schemas import CohortPage
+from app.models import User, RiskBucket
+from app.crud import get_assessment_type_by_slug
+from app.auth import get_provider_or_admin_user
+from app.services.cohorts import InvalidCursor, query_cohort
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+@router.get("", response_model=CohortPage)
+async def get_cohort(
+    disease: str = Query(..., description="Assessment type slug"),
+    bucket: Optional[RiskBucket] = Query(None, description="Risk bucket of the latest assessment"),
+    min_score: Optional[float] = Query(None, ge=0.0, le=1.0),
+    max_score: Optional[float] = Query(None, ge=0.0, le=1.0),
+    from_: Optional[datetime] = Query(None, alias="from", description="Predicted at or after"),
+    to: Optional[datetime] = Query(None, description="Predicted before"),
+    sex: Optional[str] = Query(None, pattern="^[MF]$"),
+    age_min: Optional[int] = Query(None, ge=0, le=150),
+    age_max: Optional[int] = Query(None, ge=0, le=150),
+    limit: int = Query(settings.COHORT_PAGE_SIZE, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_provider_or_admin_user)
+):
+    """Active patients whose latest assessment for a disease matches the filters (providers and admins)"""
+    if not get_assessment_type_by_slug(session, disease):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assessment type not found"
+        )
+    
+    try:
+        page = query_cohort(
+            session, disease, bucket, min_score, max_score, from_, to,
+            sex, age_min, age_max, limit, cursor
+        )
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
+    logger.info(
+        "Cohort queried",
+        disease=disease,
+        returned=len(page["items"]),
+        requested_by=str(current_user.id)
+    )
+    return page
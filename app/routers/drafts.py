@@ -10,6 +10,7 @@ from app.schemas import DraftCreate, DraftResponse
 from app.models import User
 from app.crud import upsert_draft, get_draft, get_assessment_type_by_slug
 from app.auth import get_current_user_optional
+from app.services.event_sketches import event_sketches
 
 logger = structlog.get_logger()
 router = APIRouter()
@@ -48,6 +49,8 @@ async def save_draft(
         draft_data.data
     )
     
+    event_sketches.record("draft_saved", draft_data.session_id, user_id, draft.last_saved_at)
+    
     logger.info("Draft saved", draft_id=str(draft.id), assessment_type=draft_data.assessment_type_id)
     
     return DraftResponse(
@@ -57,6 +60,7 @@ async def save_draft(
         session_id=draft.session_id,
         data=json.loads(draft.data),
         last_saved_at=draft.last_saved_at,
+        expires_at=draft.expires_at,
         created_at=draft.created_at
     )
 
@@ -97,6 +101,7 @@ async def get_draft_data(
         session_id=draft.session_id,
         data=json.loads(draft.data),
         last_saved_at=draft.last_saved_at,
+        expires_at=draft.expires_at,
         created_at=draft.created_at
     )
 
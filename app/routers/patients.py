@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlmodel import Session
+from typing import Optional
+from datetime import datetime
+from uuid import UUID
+import structlog
+
+from app.core.config import settings
+from app.database import get_read_session
+from app.schemas import PatientTimelineResponse
+from app.models import User, UserRole
+from app.crud import get_assessment_type_by_slug
+from app.auth import get_current_active_user
+from app.services.timeline import build_timeline
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+@router.get("/{user_id}/timeline", response_model=PatientTimelineResponse)
+async def get_patient_timeline(
+    user_id: UUID,
+    disease: Optional[str] = Query(None, description="Assessment type slug"),
+    from_: Optional[datetime] = Query(None, alias="from", description="Submitted at or after"),
+    to: Optional[datetime] = Query(None, description="Submitted before"),
+    max_points: int = Query(settings.TIMELINE_MAX_POINTS, ge=3, le=1000, description="Points per disease"),
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Latest risk and score history per disease for a patient (the patient, providers and admins)"""
+    if current_user.id != user_id and current_user.role not in [UserRole.PROVIDER, UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view this patient"
+        )
+    
+    if current_user.id != user_id and not session.get(User, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
+        )
+    
+    if disease and not get_assessment_type_by_slug(session, disease):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assessment type not found"
+        )
+    
+    return build_timeline(session, user_id, disease, from_, to, max_points)
@@ -4,7 +4,7 @@ from typing import Optional, List
 from uuid import UUID
 import structlog
 
-from app.database import get_session
+from app.database import get_session, get_read_session
 from app.schemas import RecommendationCreate, RecommendationResponse
 from app.models import User
 from app.crud import create_recommendation, get_user_recommendations
@@ -17,7 +17,7 @@ router = APIRouter()
 async def get_recommendations(
     disease: Optional[str] = Query(None, description="Filter by disease type"),
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """Get user recommendations"""
     recommendations = get_user_recommendations(session, current_user.id, disease)
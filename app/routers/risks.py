@@ -2,10 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
 from typing import Optional, Dict, Any
 from uuid import UUID
+from datetime import datetime
 import json
 import structlog
 
-from app.database import get_session
+from app.database import get_read_session
 from app.schemas import RiskAssessmentResponse, RecommendationResponse
 from app.models import (
     User, RiskAssessment, DiabetesAssessment, HypertensionAssessment, 
@@ -14,6 +15,7 @@ from app.models import (
 )
 from app.crud import get_risk_assessment
 from app.auth import get_current_user_optional
+from app.services.event_sketches import event_sketches
 
 logger = structlog.get_logger()
 router = APIRouter()
@@ -21,7 +23,7 @@ router = APIRouter()
 @router.get("/{risk_id}", response_model=Dict[str, Any])
 async def get_risk_assessment_details(
     risk_id: UUID,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """Get complete risk assessment with disease-specific details and recommendations"""
@@ -129,6 +131,10 @@ async def get_risk_assessment_details(
             for rec in recs
         ]
     
+    # The submitting session reached the last funnel stage, unless a provider is looking
+    if not current_user or current_user.id == risk.survey.user_id:
+        event_sketches.record("risk_viewed", risk.survey.session_id, risk.survey.user_id, datetime.utcnow())
+    
     return {
         "id": risk.id,
         "survey_id": risk.survey_id,
@@ -138,6 +144,7 @@ async def get_risk_assessment_details(
         "risk_bucket": risk.risk_bucket,
         "auc_at_train": risk.auc_at_train,
         "predicted_at": risk.predicted_at,
+        "details_status": risk.details_status,
         "disease_specific": disease_specific,
         "recommendations": recommendations,
         "submission_data": json.loads(risk.survey.data) if risk.survey.data else None
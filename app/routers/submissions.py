@@ -1,21 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Request
+from fastapi.responses import JSONResponse
 from sqlmodel import Session
 from typing import Optional, List
-from uuid import UUID
+from uuid import UUID, uuid4
+from datetime import datetime
 import json
 import structlog
 
-from app.database import get_session
+from app.database import get_session, get_read_session
 from app.schemas import SubmissionCreate, SubmissionResponse, CompleteSubmissionResponse, PaginatedResponse
 from app.models import User
 from app.crud import (
     create_submission, get_submission, get_user_submissions, 
-    get_assessment_type_by_slug, create_risk_assessment,
-    create_diabetes_assessment, create_hypertension_assessment, 
-    create_heart_assessment, create_recommendation
+    get_assessment_type_by_slug, create_risk_assessment
 )
 from app.auth import get_current_user_optional
-from app.services.risk_calculator import calculate_risk
+from app.services.background import background_runner
+from app.services.batcher import score_risk
+from app.services.event_sketches import event_sketches
+from app.services import idempotency, outbox
+from app.services.timeline import record_latest_risk
 
 logger = structlog.get_logger()
 router = APIRouter()
@@ -23,10 +27,43 @@ router = APIRouter()
 @router.post("/", response_model=CompleteSubmissionResponse, status_code=status.HTTP_201_CREATED)
 async def submit_assessment(
     submission_data: SubmissionCreate,
+    request: Request,
     session: Session = Depends(get_session),
-    current_user: Optional[User] = Depends(get_current_user_optional)
+    current_user: Optional[User] = Depends(get_current_user_optional),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
 ):
     """Submit assessment and calculate risk"""
+    if not idempotency_key:
+        return await process_submission(session, submission_data, current_user)
+
+    if current_user:
+        owner = f"user:{current_user.id}"
+    elif submission_data.session_id:
+        owner = f"session:{submission_data.session_id}"
+    else:
+        owner = f"client:{request.client.host if request.client else 'unknown'}"
+    key = idempotency.scoped_key(idempotency_key, owner)
+    fingerprint = idempotency.request_hash(submission_data.model_dump(mode="json"))
+
+    stored = await idempotency.begin(session, key, fingerprint)
+    if stored is not None:
+        status_code, body = stored
+        return JSONResponse(status_code=status_code, content=body, headers={"Idempotent-Replayed": "true"})
+
+    try:
+        response = await process_submission(session, submission_data, current_user)
+    except BaseException:
+        idempotency.abandon(session, key)
+        raise
+    idempotency.complete(session, key, status.HTTP_201_CREATED, response.model_dump(mode="json"))
+    return response
+
+async def process_submission(
+    session: Session,
+    submission_data: SubmissionCreate,
+    current_user: Optional[User]
+) -> CompleteSubmissionResponse:
+    """Store a submission and its score; details and recommendations are written by the outbox"""
     # Get assessment type
     assessment_type = get_assessment_type_by_slug(session, submission_data.assessment_type_id)
     if not assessment_type:
@@ -48,47 +85,48 @@ async def submit_assessment(
     )
     
     # Calculate risk
-    risk_result = calculate_risk(submission_data.assessment_type_id, submission_data.data)
+    risk_result = await score_risk(submission_data.assessment_type_id, submission_data.data)
     
-    # Create risk assessment
+    # Recommendations get their ids now so the response can show them before
+    # the outbox has written them
+    risk_id = uuid4()
+    now = datetime.utcnow()
+    recommendations = [
+        {
+            "id": uuid4(),
+            "title": rec_data["title"],
+            "details": rec_data.get("details"),
+            "priority": rec_data.get("priority", "med"),
+            "status": "open",
+            "created_at": now
+        }
+        for rec_data in risk_result.get("recommendations", [])
+    ]
+    
+    # Disease-specific row and recommendations are written off the request
+    # path; the task commits together with the risk assessment
+    outbox.enqueue(session, outbox.RISK_DETAILS, {
+        "risk_id": risk_id,
+        "disease": submission_data.assessment_type_id,
+        "user_id": user_id,
+        "clinical_data": risk_result.get("clinical_data", {}),
+        "recommendations": recommendations
+    })
     risk_assessment = create_risk_assessment(
         session,
         submission.id,
         submission_data.assessment_type_id,
         risk_result["risk_score"],
         risk_result["risk_bucket"],
-        risk_result["model_version"]
+        risk_result["model_version"],
+        risk_result.get("auc_at_train"),
+        risk_id=risk_id,
+        details_status=outbox.PENDING
     )
-    
-    # Create disease-specific assessment
-    disease_specific = None
-    if submission_data.assessment_type_id == "diabetes":
-        disease_specific = create_diabetes_assessment(session, risk_assessment.id, risk_result.get("clinical_data", {}))
-    elif submission_data.assessment_type_id == "hypertension":
-        disease_specific = create_hypertension_assessment(session, risk_assessment.id, risk_result.get("clinical_data", {}))
-    elif submission_data.assessment_type_id == "heart":
-        disease_specific = create_heart_assessment(session, risk_assessment.id, risk_result.get("clinical_data", {}))
-    
-    # Generate recommendations
-    recommendations = []
-    for rec_data in risk_result.get("recommendations", []):
-        recommendation = create_recommendation(
-            session,
-            submission_data.assessment_type_id,
-            user_id,
-            risk_assessment.id,
-            rec_data["title"],
-            rec_data.get("details"),
-            rec_data.get("priority", "med")
-        )
-        recommendations.append({
-            "id": recommendation.id,
-            "title": recommendation.title,
-            "details": recommendation.details,
-            "priority": recommendation.priority,
-            "status": recommendation.status,
-            "created_at": recommendation.created_at
-        })
+    background_runner.wake(outbox.OUTBOX_JOB)
+    if user_id:
+        record_latest_risk(session, user_id, risk_assessment, submission.submitted_at)
+    event_sketches.record("assessment_submitted", submission_data.session_id, user_id, submission.submitted_at)
     
     logger.info(
         "Assessment submitted and processed",
@@ -104,13 +142,14 @@ async def submit_assessment(
         score=risk_result["risk_score"],
         risk_bucket=risk_result["risk_bucket"],
         recommendations=recommendations,
-        disease_specific=risk_result.get("clinical_data")
+        disease_specific=risk_result.get("clinical_data"),
+        details_status=risk_assessment.details_status
     )
 
 @router.get("/{submission_id}", response_model=SubmissionResponse)
 async def get_submission_by_id(
     submission_id: UUID,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """Get submission by ID"""
@@ -145,7 +184,7 @@ async def get_user_submissions_list(
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=100),
     current_user: User = Depends(get_current_user_optional),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """Get user submissions with pagination"""
     if not current_user:
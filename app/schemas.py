@@ -10,6 +10,14 @@ class UserRegister(BaseModel):
     password: str = Field(min_length=8, max_length=100)
     full_name: Optional[str] = None
 
+class UserImportRecord(BaseModel):
+    email: EmailStr
+    password: str = Field(min_length=8, max_length=100)
+    role: UserRole = UserRole.PATIENT
+    full_name: Optional[str] = Field(None, max_length=255)
+    sex: Optional[str] = Field(None, pattern="^[MF]$")
+    birth_date: Optional[datetime] = None
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -29,6 +37,9 @@ class UserResponse(BaseModel):
     sex: Optional[str] = None
     birth_date: Optional[datetime] = None
 
+class UserSearchResult(UserResponse):
+    rank: float
+
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     sex: Optional[str] = None
@@ -48,6 +59,7 @@ class DraftResponse(BaseModel):
     session_id: Optional[str]
     data: Dict[str, Any]
     last_saved_at: datetime
+    expires_at: datetime
     created_at: datetime
 
 # Submission schemas
@@ -118,6 +130,52 @@ class HeartAssessmentResponse(BaseModel):
     smoking: Optional[bool]
     obesity: Optional[bool]
 
+# Patient timeline schemas
+class TimelinePoint(BaseModel):
+    t: datetime  # submitted at
+    score: float
+    bucket: RiskBucket
+    risk_id: UUID
+    model_version: str
+
+class DiseaseTimeline(BaseModel):
+    total: int  # points before downsampling
+    downsampled: bool
+    points: List[TimelinePoint]
+
+class LatestRiskResponse(BaseModel):
+    risk_id: UUID
+    score: float
+    bucket: RiskBucket
+    model_version: str
+    submitted_at: datetime
+
+class PatientTimelineResponse(BaseModel):
+    user_id: UUID
+    latest: Dict[str, LatestRiskResponse]
+    series: Dict[str, DiseaseTimeline]
+
+# Cohort schemas
+class CohortMember(BaseModel):
+    user_id: UUID
+    full_name: Optional[str]
+    email: str
+    sex: Optional[str]
+    age: Optional[int]
+    risk_id: UUID
+    risk_score: float
+    risk_bucket: RiskBucket
+    predicted_at: datetime
+    submitted_at: datetime
+
+class CohortPage(BaseModel):
+    disease: str
+    items: List[CohortMember]
+    next_cursor: Optional[str]
+    # First page only; capped at COHORT_COUNT_LIMIT, when total_exact is false
+    total: Optional[int]
+    total_exact: Optional[bool]
+
 # Analytics schemas
 class AnalyticsEventCreate(BaseModel):
     user_id: Optional[UUID] = None
@@ -133,6 +191,7 @@ class CompleteSubmissionResponse(BaseModel):
     risk_bucket: RiskBucket
     recommendations: List[RecommendationResponse]
     disease_specific: Optional[Dict[str, Any]] = None
+    details_status: str = "ready"  # pending until recommendations are stored
 
 # Pagination
 class PaginatedResponse(BaseModel):
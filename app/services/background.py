@@ -0,0 +1,164 @@
+"""
+Periodic background jobs inside the API process.
+
+Each registered job runs on its own daemon thread: it waits for its
+interval (or an explicit wake()), runs, records metrics and goes back to
+waiting. A failing run is logged and retried on the next tick; it never
+stops the thread. Threads are started from the app's startup event, so
+with gunicorn every worker runs its own set after the fork.
+
+Jobs registered with exclusive=True (e.g. archival) must not run in two
+workers or hosts at once. Before each run they take a lease row in
+job_leases, held for the job's lease_seconds; a worker that can't get
+the lease skips that tick.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+import structlog
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.core.metrics import registry
+from app.models import JobLease
+
+logger = structlog.get_logger()
+
+JOB_RUNS = registry.counter("background_job_runs_total", "Background job runs", ["job", "outcome"])
+JOB_DURATION = registry.histogram(
+    "background_job_duration_seconds", "Background job run duration", ["job"],
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0)
+)
+
+
+def acquire_lease(bind, name: str, owner: str, seconds: float) -> bool:
+    """Take or renew the named lease for owner; False if someone else holds it"""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=seconds)
+    with Session(bind) as session:
+        result = session.execute(
+            update(JobLease)
+            .where(JobLease.name == name, (JobLease.owner == owner) | (JobLease.expires_at < now))
+            .values(owner=owner, expires_at=expires_at)
+        )
+        if result.rowcount == 1:
+            session.commit()
+            return True
+        try:
+            session.add(JobLease(name=name, owner=owner, expires_at=expires_at))
+            session.commit()
+            return True
+        except IntegrityError:
+            session.rollback()
+            return False
+
+
+def release_lease(bind, name: str, owner: str):
+    with Session(bind) as session:
+        session.execute(
+            update(JobLease)
+            .where(JobLease.name == name, JobLease.owner == owner)
+            .values(expires_at=datetime.utcnow())
+        )
+        session.commit()
+
+
+class BackgroundJob:
+    def __init__(self, name: str, func: Callable[[], object], interval: float,
+                 exclusive: bool = False, lease_seconds: float = 600.0):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.exclusive = exclusive
+        self.lease_seconds = lease_seconds
+        self.wake_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.last_result: object = None
+
+
+class BackgroundRunner:
+    """Runs registered jobs on daemon threads until stop()"""
+
+    def __init__(self):
+        self.jobs: Dict[str, BackgroundJob] = {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+
+    def register(self, name: str, func: Callable[[], object], interval: float,
+                 exclusive: bool = False, lease_seconds: float = 600.0):
+        self.jobs[name] = BackgroundJob(name, func, interval, exclusive, lease_seconds)
+
+    def run_once(self, name: str) -> object:
+        """Run a job now on the calling thread; returns its result (None if the lease was taken)"""
+        from app.database import get_engine
+
+        job = self.jobs[name]
+        if job.exclusive and not acquire_lease(get_engine(), name, self.owner, job.lease_seconds):
+            JOB_RUNS.inc(job=name, outcome="skipped")
+            return None
+        started = time.perf_counter()
+        try:
+            job.last_result = job.func()
+            JOB_RUNS.inc(job=name, outcome="ok")
+            return job.last_result
+        except Exception:
+            JOB_RUNS.inc(job=name, outcome="error")
+            raise
+        finally:
+            JOB_DURATION.observe(time.perf_counter() - started, job=name)
+            if job.exclusive:
+                release_lease(get_engine(), name, self.owner)
+
+    def _loop(self, job: BackgroundJob):
+        while not self._stop.is_set():
+            job.wake_event.wait(job.interval)
+            job.wake_event.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.run_once(job.name)
+            except Exception as e:
+                logger.error("Background job failed", job=job.name, error=str(e))
+
+    def start(self):
+        self._stop.clear()
+        for job in self.jobs.values():
+            if job.thread is not None and job.thread.is_alive():
+                continue
+            job.thread = threading.Thread(target=self._loop, args=(job,), name=f"job-{job.name}", daemon=True)
+            job.thread.start()
+        if self.jobs:
+            logger.info("Background jobs started", jobs=sorted(self.jobs))
+
+    def wake(self, name: str):
+        """Run a job now instead of at its next interval"""
+        job = self.jobs.get(name)
+        if job is not None:
+            job.wake_event.set()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for job in self.jobs.values():
+            job.wake_event.set()
+        for job in self.jobs.values():
+            if job.thread is not None:
+                job.thread.join(timeout)
+                job.thread = None
+
+    def reset_after_fork(self):
+        # The parent's threads don't exist in the child; jobs are restarted from startup
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        for job in self.jobs.values():
+            job.thread = None
+            job.wake_event = threading.Event()
+
+
+background_runner = BackgroundRunner()
+os.register_at_fork(after_in_child=background_runner.reset_after_fork)
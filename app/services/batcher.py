@@ -0,0 +1,158 @@
+"""
+Micro-batching in front of calculate_risk.
+
+Concurrent scoring requests for the same disease are collected for up to
+SCORING_BATCH_MAX_WAIT_MS or SCORING_BATCH_MAX_SIZE items, whichever comes
+first, and scored together with calculate_risk_batch on a worker thread,
+so a loaded model sees one matrix instead of many single rows and the event
+loop never runs the scoring itself. The wait bound caps the queueing delay
+any single request can pick up.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import structlog
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.services.risk_calculator import SCORING_DURATION, calculate_risk, calculate_risk_batch
+
+logger = structlog.get_logger()
+
+BATCH_SIZE = registry.histogram(
+    "scoring_batch_size", "Submissions scored per batch", ["disease"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+QUEUE_DELAY = registry.histogram(
+    "scoring_queue_delay_seconds", "Time a scoring request waited for its batch to start", ["disease"],
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+BATCH_DURATION = registry.histogram(
+    "scoring_batch_duration_seconds", "calculate_risk_batch duration", ["disease"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+_Pending = Tuple[Dict[str, Any], asyncio.Future, float]
+
+
+class ScoringBatcher:
+    def __init__(self, max_size: int, max_wait_ms: float, workers: int = 1):
+        self.max_size = max(1, max_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, List[_Pending]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+    def _bind(self, loop: asyncio.AbstractEventLoop):
+        # Futures belong to one event loop; a new loop (tests, reloads)
+        # starts from an empty queue.
+        if self._loop is not loop:
+            self._loop = loop
+            self._pending = {}
+            self._timers = {}
+            self._tasks = set()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scoring")
+
+    async def score(self, disease: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue one submission for scoring and wait for its batch"""
+        loop = asyncio.get_running_loop()
+        self._bind(loop)
+
+        future = loop.create_future()
+        pending = self._pending.setdefault(disease, [])
+        pending.append((data, future, time.perf_counter()))
+
+        if len(pending) >= self.max_size:
+            self._flush(disease)
+        elif disease not in self._timers:
+            self._timers[disease] = loop.call_later(self.max_wait, self._flush, disease)
+        return await future
+
+    def _flush(self, disease: str):
+        timer = self._timers.pop(disease, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(disease, [])
+        if batch:
+            task = self._loop.create_task(self._run(disease, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, disease: str, batch: List[_Pending]):
+        started = time.perf_counter()
+        for _, _, queued_at in batch:
+            QUEUE_DELAY.observe(started - queued_at, disease=disease)
+        BATCH_SIZE.observe(len(batch), disease=disease)
+
+        rows = [data for data, _, _ in batch]
+        try:
+            results = await self._loop.run_in_executor(self._executor, self._score_batch, disease, rows)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _score_batch(disease: str, rows: List[Dict[str, Any]]) -> List[Any]:
+        started = time.perf_counter()
+        try:
+            results = calculate_risk_batch(disease, rows)
+        except Exception:
+            # One bad submission must not fail its neighbours: score them
+            # individually and hand each caller its own result or error.
+            results = []
+            for data in rows:
+                try:
+                    results.append(calculate_risk_batch(disease, [data])[0])
+                except Exception as e:
+                    results.append(e)
+        elapsed = time.perf_counter() - started
+        BATCH_DURATION.observe(elapsed, disease=disease)
+        # Per submission, so batched and direct scoring land in the same histogram
+        for _ in rows:
+            SCORING_DURATION.observe(elapsed / len(rows), disease=disease)
+        return results
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def reset_after_fork(self):
+        # Worker threads and loop-bound futures don't survive a fork
+        self._executor = None
+        self._loop = None
+        self._pending = {}
+        self._timers = {}
+        self._tasks = set()
+
+
+scoring_batcher = ScoringBatcher(
+    settings.SCORING_BATCH_MAX_SIZE,
+    settings.SCORING_BATCH_MAX_WAIT_MS,
+    settings.SCORING_BATCH_WORKERS
+)
+os.register_at_fork(after_in_child=scoring_batcher.reset_after_fork)
+
+
+async def score_risk(disease: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Score a submission, through the micro-batcher when it is enabled"""
+    if settings.SCORING_BATCH_ENABLED:
+        return await scoring_batcher.score(disease, data)
+    return calculate_risk(disease, data)
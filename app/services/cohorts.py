@@ -0,0 +1,204 @@
+"""
+Population cohort queries for providers.
+
+A cohort is every active patient whose latest assessment for a disease
+matches the filters (bucket, score range, prediction date, sex, age band).
+The query reads latest_risks through its (disease, risk_bucket,
+predicted_at, user_id) index and joins patient_dimension, a flat copy of
+users + patient_profiles, by primary key, so it never touches the
+submission or assessment tables.
+
+patient_dimension is rewritten for a patient in the same transaction as
+any change to their user or profile row (sync_patient_dimension);
+rebuild_patient_dimension recomputes it wholesale after bulk loads.
+
+Pages are ordered newest prediction first and continue from an opaque
+cursor holding the last row's (predicted_at, user_id), so deep pages cost
+the same as the first. The total is only counted for the first page and
+stops at COHORT_COUNT_LIMIT, past which it is reported as a lower bound.
+"""
+import base64
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import structlog
+from sqlalchemy import DateTime, and_, delete, func, insert, literal, or_, select
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models import LatestRisk, PatientDimension, PatientProfile, RiskBucket, User, UserRole, UserStatus
+
+logger = structlog.get_logger()
+
+# Ids per statement when syncing; well under SQL Server's 2100 parameters
+SYNC_CHUNK = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _dimension_source():
+    return (
+        select(
+            User.id,
+            User.email,
+            PatientProfile.full_name,
+            PatientProfile.sex,
+            PatientProfile.birth_date,
+            User.status,
+            literal(datetime.utcnow(), DateTime)
+        )
+        .join(PatientProfile, PatientProfile.user_id == User.id)
+        .where(User.role == UserRole.PATIENT)
+    )
+
+
+def _write_dimension(conn, user_ids: Optional[List[UUID]] = None) -> int:
+    table = PatientDimension.__table__
+    source = _dimension_source()
+    if user_ids is not None:
+        conn.execute(delete(table).where(table.c.user_id.in_(user_ids)))
+        source = source.where(User.id.in_(user_ids))
+    else:
+        conn.execute(delete(table))
+    result = conn.execute(insert(table).from_select(
+        ["user_id", "email", "full_name", "sex", "birth_date", "status", "updated_at"], source
+    ))
+    return result.rowcount
+
+
+def sync_patient_dimension(session: Session, user_ids: Iterable[UUID]):
+    """Rewrite these patients' dimension rows; committed with the caller's transaction"""
+    user_ids = list(user_ids)
+    session.flush()
+    for start in range(0, len(user_ids), SYNC_CHUNK):
+        _write_dimension(session, user_ids[start:start + SYNC_CHUNK])
+
+
+def rebuild_patient_dimension(bind: Engine) -> int:
+    """Recompute patient_dimension from users and patient_profiles; returns rows written"""
+    with bind.begin() as conn:
+        return _write_dimension(conn)
+
+
+def encode_cursor(predicted_at: datetime, user_id: UUID) -> str:
+    raw = json.dumps([predicted_at.isoformat(), str(user_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        predicted_at, user_id = json.loads(raw)
+        return datetime.fromisoformat(predicted_at), UUID(user_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def _years_before(day: date, years: int) -> date:
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        # 29 February in a non-leap year
+        return day.replace(year=day.year - years, day=28)
+
+
+def _birth_cutoff(today: date, years: int) -> datetime:
+    """Patients born before this are at least `years` old today"""
+    return datetime.combine(_years_before(today, years), time.min) + timedelta(days=1)
+
+
+def _age(birth_date: Optional[datetime], today: date) -> Optional[int]:
+    if birth_date is None:
+        return None
+    born = birth_date.date()
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+
+def query_cohort(session: Session, disease: str, bucket: Optional[RiskBucket] = None,
+                 min_score: Optional[float] = None, max_score: Optional[float] = None,
+                 start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 sex: Optional[str] = None, age_min: Optional[int] = None, age_max: Optional[int] = None,
+                 limit: int = 50, cursor: Optional[str] = None, today: Optional[date] = None) -> Dict[str, Any]:
+    """One page of the cohort, plus the (possibly capped) total on the first page"""
+    today = today or datetime.utcnow().date()
+    conditions = [LatestRisk.disease == disease, PatientDimension.status == UserStatus.ACTIVE]
+    if bucket is not None:
+        conditions.append(LatestRisk.risk_bucket == bucket)
+    if min_score is not None:
+        conditions.append(LatestRisk.risk_score >= min_score)
+    if max_score is not None:
+        conditions.append(LatestRisk.risk_score <= max_score)
+    if start:
+        conditions.append(LatestRisk.predicted_at >= start)
+    if end:
+        conditions.append(LatestRisk.predicted_at < end)
+    if sex:
+        conditions.append(PatientDimension.sex == sex)
+    # Age band as a birth date range, so it is a plain comparison on the column
+    if age_min is not None:
+        conditions.append(PatientDimension.birth_date < _birth_cutoff(today, age_min))
+    if age_max is not None:
+        conditions.append(PatientDimension.birth_date >= _birth_cutoff(today, age_max + 1))
+
+    base = select(
+        LatestRisk.user_id,
+        LatestRisk.risk_id,
+        LatestRisk.risk_score,
+        LatestRisk.risk_bucket,
+        LatestRisk.predicted_at,
+        LatestRisk.submitted_at,
+        PatientDimension.email,
+        PatientDimension.full_name,
+        PatientDimension.sex,
+        PatientDimension.birth_date
+    ).join(PatientDimension, PatientDimension.user_id == LatestRisk.user_id).where(*conditions)
+
+    total, total_exact = None, None
+    if cursor is None:
+        cap = settings.COHORT_COUNT_LIMIT
+        counted = session.execute(
+            select(func.count()).select_from(base.with_only_columns(LatestRisk.user_id).limit(cap + 1).subquery())
+        ).scalar_one()
+        total, total_exact = min(counted, cap), counted <= cap
+
+    page = base
+    if cursor is not None:
+        after_at, after_user = decode_cursor(cursor)
+        page = page.where(or_(
+            LatestRisk.predicted_at < after_at,
+            and_(LatestRisk.predicted_at == after_at, LatestRisk.user_id < after_user)
+        ))
+    rows = session.execute(
+        page.order_by(LatestRisk.predicted_at.desc(), LatestRisk.user_id.desc()).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].predicted_at, rows[-1].user_id)
+    return {
+        "disease": disease,
+        "items": [
+            {
+                "user_id": row.user_id,
+                "full_name": row.full_name,
+                "email": row.email,
+                "sex": row.sex,
+                "age": _age(row.birth_date, today),
+                "risk_id": row.risk_id,
+                "risk_score": row.risk_score,
+                "risk_bucket": row.risk_bucket,
+                "predicted_at": row.predicted_at,
+                "submitted_at": row.submitted_at
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor,
+        "total": total,
+        "total_exact": total_exact
+    }
@@ -0,0 +1,56 @@
+"""
+Sweeper for expired assessment drafts.
+
+A draft expires DRAFT_TTL_ANONYMOUS_HOURS or DRAFT_TTL_AUTHENTICATED_HOURS
+after its last save (crud.draft_expiry). Reads already ignore expired
+drafts, so the sweep only reclaims space: it deletes them in batches of
+DRAFT_SWEEP_BATCH_SIZE via the expires_at index, one short transaction per
+batch, until none are left or the run's time budget is used up.
+"""
+import time
+from datetime import datetime
+from typing import Optional
+
+import structlog
+from sqlalchemy import delete, select
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.models import AssessmentDraft
+
+logger = structlog.get_logger()
+
+DRAFTS_EXPIRED = registry.counter("drafts_expired_total", "Expired drafts deleted by the sweeper")
+
+MAX_SWEEP_SECONDS = 60.0
+
+
+def sweep_expired_drafts(bind: Optional[Engine] = None, now: Optional[datetime] = None,
+                         batch_size: Optional[int] = None) -> int:
+    """Delete expired drafts in batches; returns how many were deleted"""
+    if bind is None:
+        from app.database import get_engine
+        bind = get_engine()
+    now = now or datetime.utcnow()
+    batch_size = batch_size or settings.DRAFT_SWEEP_BATCH_SIZE
+    deadline = time.monotonic() + MAX_SWEEP_SECONDS
+    table = AssessmentDraft.__table__
+
+    total = 0
+    while time.monotonic() < deadline:
+        with bind.begin() as conn:
+            ids = conn.execute(
+                select(table.c.id).where(table.c.expires_at <= now).order_by(table.c.expires_at).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            deleted = conn.execute(delete(table).where(table.c.id.in_(ids), table.c.expires_at <= now)).rowcount
+        total += deleted
+        DRAFTS_EXPIRED.inc(deleted)
+        if len(ids) < batch_size:
+            break
+
+    if total:
+        logger.info("Expired drafts swept", count=total)
+    return total
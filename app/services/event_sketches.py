@@ -0,0 +1,456 @@
+"""
+Unique visitors and the assessment funnel, from analytics events as they arrive.
+
+Every tracked event is counted in memory for its day (of created_at) and
+event type, with its session and user added to two HyperLogLog sketches.
+Events of the funnel types below also set their stage's bit for the
+session. Only assessment_started comes from clients; the API records the
+other stages itself when a draft is saved, an assessment submitted or a
+risk viewed (SERVER_EVENTS), since nothing sends those as events. The event_sketches background job flushes both every
+EVENT_SKETCH_FLUSH_SECONDS:
+
+- Sketches are merged into event_sketches with a version check, so
+  workers flushing the same key concurrently retry rather than overwrite
+  each other.
+- Stages are OR-ed into funnel_sessions (one row per session, dated by its
+  first funnel event). When a session's stages change, funnel_counts, its
+  sessions per day and stage set, moves it from the old set to the new one
+  in the same transaction.
+
+Visitor and funnel reports read only these tables: a few rows per day and
+event type, and at most 2**len(FUNNEL_STAGES) rows per day. They never
+scan analytics_events, whose rows the retention job purges anyway. Events
+buffered in a worker that dies before a flush are lost;
+rebuild_event_sketches and rebuild_funnel recompute the days whose events
+are still retained. Server-recorded events exist only in these tables, so
+rebuilds keep what they recorded.
+"""
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import structlog
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.models import AnalyticsEvent, EventSketch, FunnelCount, FunnelSession
+from app.services.hyperloglog import HyperLogLog
+
+logger = structlog.get_logger()
+
+EVENT_SKETCH_JOB = "event_sketches"
+
+# (stage, event type) in funnel order; a stage's bit is 1 << its position
+FUNNEL_STAGES = (
+    ("draft_started", "assessment_started"),
+    ("draft_saved", "draft_saved"),
+    ("submitted", "assessment_submitted"),
+    ("risk_viewed", "risk_viewed")
+)
+# Any funnel event also means its session started an assessment
+STAGE_BITS = {event_type: 1 << i | 1 for i, (_, event_type) in enumerate(FUNNEL_STAGES)}
+# Recorded by the API as requests happen rather than sent by clients
+SERVER_EVENTS = ("draft_saved", "assessment_submitted", "risk_viewed")
+
+# Sessions per statement when flushing or rebuilding the funnel
+FUNNEL_CHUNK = 500
+
+EVENT_SKETCH_MERGES = registry.counter(
+    "event_sketch_merges_total", "Merges into event_sketches and funnel_sessions", ["table", "outcome"]
+)
+
+
+class _Conflict(Exception):
+    """A funnel session changed between reading and updating it"""
+
+
+class _Pending:
+    __slots__ = ("count", "sessions", "users")
+
+    def __init__(self):
+        self.count = 0
+        self.sessions = HyperLogLog(settings.EVENT_SKETCH_PRECISION)
+        self.users = HyperLogLog(settings.EVENT_SKETCH_PRECISION)
+
+    def add(self, session_id: Optional[str], user_id: Any):
+        self.count += 1
+        if session_id:
+            self.sessions.add(session_id)
+        if user_id:
+            self.users.add(_user_key(user_id))
+
+    def merge(self, other: "_Pending"):
+        self.count += other.count
+        self.sessions.merge(other.sessions)
+        self.users.merge(other.users)
+
+
+def _user_key(user_id: Any) -> str:
+    """The same string for a user id whether it arrives as a UUID or as stored text"""
+    return (user_id if isinstance(user_id, UUID) else UUID(str(user_id))).hex
+
+
+def _merge_stages(stages: Dict[str, Tuple[date, int]], session_id: str, day: date, bits: int):
+    current = stages.get(session_id)
+    if current is None:
+        stages[session_id] = (day, bits)
+    else:
+        stages[session_id] = (min(current[0], day), current[1] | bits)
+
+
+class EventSketchBuffer:
+    def __init__(self):
+        self._pending: Dict[Tuple[date, str], _Pending] = {}
+        self._stages: Dict[str, Tuple[date, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, event_type: str, session_id: Optional[str], user_id: Optional[UUID], created_at: datetime):
+        day = created_at.date()
+        with self._lock:
+            pending = self._pending.get((day, event_type))
+            if pending is None:
+                pending = self._pending[(day, event_type)] = _Pending()
+            pending.add(session_id, user_id)
+            if session_id and event_type in STAGE_BITS:
+                _merge_stages(self._stages, session_id, day, STAGE_BITS[event_type])
+
+    def _restore(self, pending: Dict[Tuple[date, str], _Pending], stages: Dict[str, Tuple[date, int]]):
+        """Put batches that couldn't be flushed back, merged with anything recorded since"""
+        with self._lock:
+            for key, batch in pending.items():
+                current = self._pending.get(key)
+                if current is None:
+                    self._pending[key] = batch
+                else:
+                    current.merge(batch)
+            for session_id, (day, bits) in stages.items():
+                _merge_stages(self._stages, session_id, day, bits)
+
+    def flush(self, bind: Optional[Engine] = None) -> int:
+        """Merge everything buffered into event_sketches and the funnel tables; returns rows written"""
+        if bind is None:
+            from app.database import get_engine
+            bind = get_engine()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            stages, self._stages = self._stages, {}
+        written = 0
+        failed_sketches: Dict[Tuple[date, str], _Pending] = {}
+        for key, batch in pending.items():
+            try:
+                if _merge_sketch(bind, key, batch):
+                    written += 1
+                    continue
+                EVENT_SKETCH_MERGES.inc(table="event_sketches", outcome="conflict")
+            except Exception as e:
+                EVENT_SKETCH_MERGES.inc(table="event_sketches", outcome="error")
+                logger.error("Event sketch flush failed", day=key[0].isoformat(), event_type=key[1], error=str(e))
+            failed_sketches[key] = batch
+
+        failed_stages: Dict[str, Tuple[date, int]] = {}
+        session_ids = list(stages)
+        for start in range(0, len(session_ids), FUNNEL_CHUNK):
+            chunk = {session_id: stages[session_id] for session_id in session_ids[start:start + FUNNEL_CHUNK]}
+            try:
+                if _merge_funnel(bind, chunk):
+                    written += len(chunk)
+                    continue
+                EVENT_SKETCH_MERGES.inc(table="funnel_sessions", outcome="conflict")
+            except Exception as e:
+                EVENT_SKETCH_MERGES.inc(table="funnel_sessions", outcome="error")
+                logger.error("Funnel flush failed", sessions=len(chunk), error=str(e))
+            failed_stages.update(chunk)
+
+        if failed_sketches or failed_stages:
+            self._restore(failed_sketches, failed_stages)
+        return written
+
+    def reset(self):
+        with self._lock:
+            self._pending = {}
+            self._stages = {}
+
+
+event_sketches = EventSketchBuffer()
+
+
+def _merge_sketch(bind: Engine, key: Tuple[date, str], batch: _Pending, attempts: int = 5) -> bool:
+    table = EventSketch.__table__
+    day, event_type = key
+    where = (table.c.day == day, table.c.event_type == event_type)
+    for _ in range(attempts):
+        try:
+            with bind.begin() as conn:
+                row = conn.execute(
+                    select(table.c.count, table.c.sessions, table.c.users, table.c.version).where(*where)
+                ).first()
+                if row is None:
+                    conn.execute(insert(table).values(
+                        day=day, event_type=event_type, count=batch.count,
+                        sessions=batch.sessions.to_bytes(), users=batch.users.to_bytes(),
+                        version=1, updated_at=datetime.utcnow()
+                    ))
+                    EVENT_SKETCH_MERGES.inc(table="event_sketches", outcome="created")
+                    return True
+                sessions = HyperLogLog.from_bytes(row.sessions)
+                sessions.merge(batch.sessions)
+                users = HyperLogLog.from_bytes(row.users)
+                users.merge(batch.users)
+                result = conn.execute(
+                    update(table).where(*where, table.c.version == row.version).values(
+                        count=row.count + batch.count, sessions=sessions.to_bytes(), users=users.to_bytes(),
+                        version=row.version + 1, updated_at=datetime.utcnow()
+                    )
+                )
+            if result.rowcount == 1:
+                EVENT_SKETCH_MERGES.inc(table="event_sketches", outcome="merged")
+                return True
+        except IntegrityError:
+            # Another worker created the row first; merge into it
+            pass
+    return False
+
+
+def _apply_counts(conn: Connection, deltas: Dict[Tuple[date, int], int]):
+    table = FunnelCount.__table__
+    # Sorted, so concurrent flushes lock the rows in the same order
+    for (day, stages), delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        result = conn.execute(
+            update(table).where(table.c.day == day, table.c.stages == stages)
+            .values(sessions=table.c.sessions + delta)
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(table).values(day=day, stages=stages, sessions=delta))
+
+
+def _merge_funnel(bind: Engine, batch: Dict[str, Tuple[date, int]], attempts: int = 5) -> bool:
+    table = FunnelSession.__table__
+    for _ in range(attempts):
+        try:
+            with bind.begin() as conn:
+                existing = {
+                    row.session_id: (row.day, row.stages)
+                    for row in conn.execute(
+                        select(table.c.session_id, table.c.day, table.c.stages)
+                        .where(table.c.session_id.in_(list(batch)))
+                    )
+                }
+                now = datetime.utcnow()
+                created = []
+                deltas: Dict[Tuple[date, int], int] = {}
+                for session_id, (day, stages) in batch.items():
+                    if session_id in existing:
+                        # A session keeps the day it was first counted on
+                        day, old = existing[session_id]
+                        stages |= old
+                        if stages == old:
+                            continue
+                        result = conn.execute(
+                            update(table).where(table.c.session_id == session_id, table.c.stages == old)
+                            .values(stages=stages, updated_at=now)
+                        )
+                        if result.rowcount != 1:
+                            raise _Conflict(session_id)
+                        deltas[(day, old)] = deltas.get((day, old), 0) - 1
+                    else:
+                        created.append({"session_id": session_id, "day": day, "stages": stages, "updated_at": now})
+                    deltas[(day, stages)] = deltas.get((day, stages), 0) + 1
+                if created:
+                    conn.execute(insert(table), created)
+                _apply_counts(conn, deltas)
+            EVENT_SKETCH_MERGES.inc(table="funnel_sessions", outcome="merged")
+            return True
+        except (IntegrityError, _Conflict):
+            # Another worker wrote one of these sessions (or a count row) first
+            pass
+    return False
+
+
+def flush_event_sketches() -> int:
+    return event_sketches.flush()
+
+
+def build_event_sketch_rows(rows: Iterable[Tuple[datetime, str, Optional[str], Any]]) -> List[Dict[str, Any]]:
+    """event_sketches rows for (created_at, event type, session id, user id) tuples"""
+    batches: Dict[Tuple[date, str], _Pending] = {}
+    for created_at, event_type, session_id, user_id in rows:
+        key = (created_at.date(), event_type)
+        batch = batches.get(key)
+        if batch is None:
+            batch = batches[key] = _Pending()
+        batch.add(session_id, user_id)
+    now = datetime.utcnow()
+    return [
+        {
+            "day": day, "event_type": event_type, "count": batch.count,
+            "sessions": batch.sessions.to_bytes(), "users": batch.users.to_bytes(),
+            "version": 1, "updated_at": now
+        }
+        for (day, event_type), batch in batches.items()
+    ]
+
+
+def _rebuild_start(conn: Connection) -> Optional[date]:
+    """First day whose events are all still retained"""
+    oldest = conn.execute(select(func.min(AnalyticsEvent.created_at))).scalar()
+    if oldest is None:
+        return None
+    # Retention cuts off mid-day, so the oldest day may be partly purged
+    return oldest.date() + timedelta(days=1) if settings.RETENTION_ENABLED else oldest.date()
+
+
+def rebuild_event_sketches(bind: Engine, start: Optional[date] = None) -> int:
+    """Recompute the sketches for days from start (default: all retained days) from analytics_events; returns rows written"""
+    table = EventSketch.__table__
+    with bind.begin() as conn:
+        start = start or _rebuild_start(conn)
+        if start is None:
+            return 0
+        rows = build_event_sketch_rows(conn.execution_options(yield_per=10000).execute(
+            select(AnalyticsEvent.created_at, AnalyticsEvent.event_type, AnalyticsEvent.session_id,
+                   AnalyticsEvent.user_id)
+            .where(AnalyticsEvent.created_at >= datetime.combine(start, datetime.min.time()))
+        ))
+        # Server-recorded event types have no events to rebuild from unless a client sent them too
+        kept = [event_type for event_type in SERVER_EVENTS if event_type not in {row["event_type"] for row in rows}]
+        conn.execute(delete(table).where(table.c.day >= start, table.c.event_type.not_in(kept)))
+        if rows:
+            conn.execute(insert(table), rows)
+    logger.info("Event sketches rebuilt", rows=len(rows), start=start.isoformat())
+    return len(rows)
+
+
+def funnel_stages_query(start: Optional[datetime] = None):
+    """(session_id, first funnel event, stage bits) per session, from analytics_events"""
+    event_type = AnalyticsEvent.event_type
+    # Bitwise OR over the session's events, one stage at a time
+    stages = sum(
+        func.max(case(
+            (event_type.in_([name for name, bits in STAGE_BITS.items() if bits & (1 << i)]), 1 << i), else_=0
+        ))
+        for i in range(len(FUNNEL_STAGES))
+    )
+    statement = select(
+        AnalyticsEvent.session_id, func.min(AnalyticsEvent.created_at).label("first_at"), stages.label("stages")
+    ).where(AnalyticsEvent.session_id.is_not(None), event_type.in_(list(STAGE_BITS)))
+    if start is not None:
+        statement = statement.where(AnalyticsEvent.created_at >= start)
+    return statement.group_by(AnalyticsEvent.session_id)
+
+
+def rebuild_funnel(bind: Engine, start: Optional[date] = None) -> int:
+    """Recompute funnel sessions first seen from start (default: all retained days) and their counts; returns sessions written"""
+    sessions, counts = FunnelSession.__table__, FunnelCount.__table__
+    with bind.begin() as conn:
+        start = start or _rebuild_start(conn)
+        if start is None:
+            return 0
+        # Sessions already counted on an earlier day keep their row
+        earlier = select(sessions.c.session_id).where(sessions.c.day < start)
+        source = funnel_stages_query(datetime.combine(start, datetime.min.time())).where(
+            AnalyticsEvent.session_id.not_in(earlier)
+        )
+        # Stages the API recorded have no events, so merge into the stored ones rather than replace them
+        stages = {
+            row.session_id: (row.day, row.stages)
+            for row in conn.execute(select(sessions.c.session_id, sessions.c.day, sessions.c.stages)
+                                    .where(sessions.c.day >= start))
+        }
+        for row in conn.execute(source):
+            _merge_stages(stages, row.session_id, row.first_at.date(), row.stages)
+        now = datetime.utcnow()
+        rows = [
+            {"session_id": session_id, "day": day, "stages": bits, "updated_at": now}
+            for session_id, (day, bits) in stages.items()
+        ]
+        conn.execute(delete(sessions).where(sessions.c.day >= start))
+        conn.execute(delete(counts).where(counts.c.day >= start))
+        for offset in range(0, len(rows), FUNNEL_CHUNK):
+            conn.execute(insert(sessions), rows[offset:offset + FUNNEL_CHUNK])
+        conn.execute(insert(counts).from_select(
+            ["day", "stages", "sessions"],
+            select(sessions.c.day, sessions.c.stages, func.count())
+            .where(sessions.c.day >= start).group_by(sessions.c.day, sessions.c.stages)
+        ))
+    logger.info("Funnel rebuilt", sessions=len(rows), start=start.isoformat())
+    return len(rows)
+
+
+def _estimate(sketch: Optional[HyperLogLog]) -> int:
+    return sketch.count() if sketch is not None else 0
+
+
+def _union(target: Optional[HyperLogLog], sketch: HyperLogLog) -> HyperLogLog:
+    if target is None:
+        target = HyperLogLog(sketch.precision)
+    target.merge(sketch)
+    return target
+
+
+def funnel_report(session: Session, start: date, end: date) -> Dict[str, Any]:
+    """Funnel conversion and estimated distinct sessions and users for days in [start, end)"""
+    by_stages: Dict[int, int] = dict(session.execute(
+        select(FunnelCount.stages, func.sum(FunnelCount.sessions))
+        .where(FunnelCount.day >= start, FunnelCount.day < end)
+        .group_by(FunnelCount.stages)
+    ).all())
+    funnel = []
+    previous = None
+    entered = 0
+    for i, (stage, event_type) in enumerate(FUNNEL_STAGES):
+        # A stage counts once the session has also reached every earlier one
+        path = (1 << (i + 1)) - 1
+        converted = sum(n for stages, n in by_stages.items() if stages & path == path)
+        if i == 0:
+            entered = converted
+        funnel.append({
+            "stage": stage,
+            "event_type": event_type,
+            "sessions": converted,
+            "reached": sum(n for stages, n in by_stages.items() if stages & (1 << i)),
+            "conversion": converted / previous if previous else None,
+            "overall_conversion": converted / entered if entered else None
+        })
+        previous = converted
+
+    # Event count and session and user sketches: overall, per event type and per day
+    def group() -> Dict[str, Any]:
+        return {"count": 0, "sessions": None, "users": None}
+
+    totals = group()
+    events: Dict[str, Dict[str, Any]] = {}
+    days: Dict[date, Dict[str, Any]] = {}
+    for row in session.execute(
+        select(EventSketch.day, EventSketch.event_type, EventSketch.count, EventSketch.sessions, EventSketch.users)
+        .where(EventSketch.day >= start, EventSketch.day < end)
+    ):
+        sessions, users = HyperLogLog.from_bytes(row.sessions), HyperLogLog.from_bytes(row.users)
+        for target in (totals, events.setdefault(row.event_type, group()), days.setdefault(row.day, group())):
+            target["count"] += row.count
+            target["sessions"] = _union(target["sessions"], sessions)
+            target["users"] = _union(target["users"], users)
+
+    def estimates(target: Dict[str, Any]) -> Dict[str, int]:
+        return {"count": target["count"], "sessions": _estimate(target["sessions"]), "users": _estimate(target["users"])}
+
+    return {
+        "from": start,
+        "to": end,
+        **estimates(totals),
+        "funnel": funnel,
+        "events": [
+            {"event_type": event_type, **estimates(target)}
+            for event_type, target in sorted(events.items())
+        ],
+        "daily": [
+            {"day": day, **estimates(target)}
+            for day, target in sorted(days.items())
+        ]
+    }
@@ -0,0 +1,200 @@
+"""
+Streaming export of risk assessments with their submission and
+recommendations, as NDJSON or CSV.
+
+Rows come from a server-side cursor (stream_results + yield_per), so only
+one chunk is held in memory at a time; the recommendations for a chunk are
+fetched with one IN query per disease table. The generator is sync and is
+iterated on a worker thread by StreamingResponse, each chunk being encoded
+(and optionally gzip-compressed) before the next one is read.
+
+Assessments whose recommendations the outbox hasn't written yet are left
+out; export the range again once they are ready.
+
+The export runs on its own connection at settings.EXPORT_ISOLATION_LEVEL
+(e.g. SNAPSHOT on SQL Server) so a long dump reads a consistent view
+without holding shared locks on the OLTP tables.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+from uuid import UUID
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.models import (
+    RiskAssessment, SurveySubmission,
+    DiabetesRecommendation, HypertensionRecommendation, HeartRecommendation
+)
+from app.services.outbox import PENDING
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+logger = structlog.get_logger()
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+RECOMMENDATION_MODELS = {
+    "diabetes": DiabetesRecommendation,
+    "hypertension": HypertensionRecommendation,
+    "heart": HeartRecommendation
+}
+
+CSV_COLUMNS = [
+    "risk_id", "survey_id", "disease", "model_version", "risk_score", "risk_bucket",
+    "auc_at_train", "predicted_at", "user_id", "session_id", "submitted_at",
+    "data", "recommendations"
+]
+
+EXPORT_ROWS = registry.counter("export_rows_total", "Rows written by streaming exports", ["format"])
+
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, default=str, ensure_ascii=False).encode()
+
+
+def export_statement(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     disease: Optional[str] = None):
+    """Assessments with their details written, joined to their submissions, in a stable order"""
+    statement = select(
+        RiskAssessment.id.label("risk_id"),
+        RiskAssessment.survey_id,
+        RiskAssessment.disease,
+        RiskAssessment.model_version,
+        RiskAssessment.risk_score,
+        RiskAssessment.risk_bucket,
+        RiskAssessment.auc_at_train,
+        RiskAssessment.predicted_at,
+        SurveySubmission.user_id,
+        SurveySubmission.session_id,
+        SurveySubmission.submitted_at,
+        SurveySubmission.data
+    ).join(
+        SurveySubmission, SurveySubmission.id == RiskAssessment.survey_id
+    ).where(RiskAssessment.details_status != PENDING)
+    if start is not None:
+        statement = statement.where(RiskAssessment.predicted_at >= start)
+    if end is not None:
+        statement = statement.where(RiskAssessment.predicted_at < end)
+    if disease is not None:
+        statement = statement.where(RiskAssessment.disease == disease)
+    return statement.order_by(RiskAssessment.predicted_at, RiskAssessment.id)
+
+
+def fetch_recommendations(conn, rows) -> Dict[UUID, List[Dict[str, Any]]]:
+    """Recommendations for a chunk of assessments, one IN query per disease"""
+    risk_ids: Dict[str, List[UUID]] = {}
+    for row in rows:
+        risk_ids.setdefault(row.disease, []).append(row.risk_id)
+
+    by_risk: Dict[UUID, List[Dict[str, Any]]] = {}
+    for disease, ids in risk_ids.items():
+        model = RECOMMENDATION_MODELS.get(disease)
+        if model is None:
+            continue
+        result = conn.execute(
+            select(model.risk_id, model.title, model.details, model.priority, model.status, model.created_at)
+            .where(model.risk_id.in_(ids))
+            .order_by(model.created_at)
+        )
+        for rec in result:
+            by_risk.setdefault(rec.risk_id, []).append({
+                "title": rec.title,
+                "details": rec.details,
+                "priority": rec.priority.value if hasattr(rec.priority, "value") else rec.priority,
+                "status": rec.status,
+                "created_at": rec.created_at
+            })
+    return by_risk
+
+
+def _record(row, recommendations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "risk_id": str(row.risk_id),
+        "survey_id": str(row.survey_id),
+        "disease": row.disease,
+        "model_version": row.model_version,
+        "risk_score": row.risk_score,
+        "risk_bucket": row.risk_bucket.value if hasattr(row.risk_bucket, "value") else row.risk_bucket,
+        "auc_at_train": row.auc_at_train,
+        "predicted_at": row.predicted_at,
+        "user_id": str(row.user_id) if row.user_id else None,
+        "session_id": row.session_id,
+        "submitted_at": row.submitted_at,
+        "data": row.data,
+        "recommendations": recommendations
+    }
+
+
+def _encode_ndjson(records: List[Dict[str, Any]], first: bool) -> bytes:
+    lines = []
+    for record in records:
+        record["data"] = json.loads(record["data"]) if record["data"] else None
+        lines.append(_dumps(record))
+    return b"\n".join(lines) + b"\n" if lines else b""
+
+
+def _encode_csv(records: List[Dict[str, Any]], first: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if first:
+        writer.writerow(CSV_COLUMNS)
+    for record in records:
+        record["recommendations"] = _dumps(record["recommendations"]).decode() if record["recommendations"] else ""
+        writer.writerow(["" if record[column] is None else record[column] for column in CSV_COLUMNS])
+    return buffer.getvalue().encode("utf-8")
+
+
+ENCODERS = {"ndjson": _encode_ndjson, "csv": _encode_csv}
+
+
+def stream_assessments(bind: Engine, export_format: str = "ndjson", start: Optional[datetime] = None,
+                       end: Optional[datetime] = None, disease: Optional[str] = None,
+                       compress: bool = False, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """Yield the export as encoded (and optionally gzipped) byte chunks"""
+    encode = ENCODERS[export_format]
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    total = 0
+
+    with bind.connect() as conn:
+        if settings.EXPORT_ISOLATION_LEVEL:
+            conn = conn.execution_options(isolation_level=settings.EXPORT_ISOLATION_LEVEL)
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+            export_statement(start, end, disease)
+        )
+        first = True
+        for rows in result.partitions():
+            recommendations = fetch_recommendations(conn, rows)
+            records = [_record(row, recommendations.get(row.risk_id, [])) for row in rows]
+            payload = encode(records, first)
+            first = False
+            total += len(records)
+            EXPORT_ROWS.inc(len(records), format=export_format)
+            if compressor is not None:
+                payload = compressor.compress(payload)
+            if payload:
+                yield payload
+        if first and export_format == "csv":
+            # Empty export: still send the header row
+            payload = encode([], True)
+            yield compressor.compress(payload) if compressor is not None else payload
+
+    if compressor is not None:
+        yield compressor.flush()
+    logger.info("Assessment export finished", format=export_format, rows=total, compressed=compress)
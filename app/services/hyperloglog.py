@@ -0,0 +1,131 @@
+"""
+HyperLogLog (Flajolet et al.) for distinct counts.
+
+Each value is hashed to 64 bits; the top `precision` bits pick one of
+m = 2**precision registers, which keeps the longest run of leading zeros
+(plus one) seen in the remaining bits. The count is estimated with Ertl's
+improved raw estimator, which needs no bias tables and stays unbiased from
+zero to billions, with a standard error of about 1.04 / sqrt(m) (0.8% at
+the default precision of 14). Sketches of any two sets merge into the
+sketch of their union by taking the register-wise maximum, so daily
+sketches are stored once and combined for any date range. Sketches of
+different precisions merge at the lower one.
+
+to_bytes/from_bytes give a compact encoding: a two-byte header (format,
+precision), then either (index, value) pairs for the non-empty registers
+or, once that would be larger, every register as one byte.
+"""
+import math
+from hashlib import blake2b
+from typing import Iterable
+
+import numpy as np
+
+_DENSE = 1
+_SPARSE = 2
+_SPARSE_PAIR = np.dtype([("index", "<u2"), ("value", "u1")])
+
+
+def _sigma(x: float) -> float:
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = 14):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def _width(self) -> int:
+        """Hash bits left after the register index"""
+        return 64 - self.precision
+
+    def add(self, value: str):
+        hashed = int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), "big")
+        width = self._width
+        index = hashed >> width
+        rank = width - (hashed & ((1 << width) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[str]):
+        for value in values:
+            self.add(value)
+
+    def _folded(self, precision: int) -> np.ndarray:
+        """These registers as they would be at a lower precision"""
+        shift = self.precision - precision
+        if not shift:
+            return self.registers
+        # The index bits dropped become the leading bits of the rest of the hash
+        dropped = np.arange(len(self.registers)) & ((1 << shift) - 1)
+        leading = shift - np.floor(np.log2(np.maximum(dropped, 1))).astype(np.int64)
+        ranks = np.where(dropped > 0, leading, shift + self.registers.astype(np.int64))
+        ranks = np.where(self.registers > 0, ranks, 0).astype(np.uint8)
+        return np.maximum.reduce(ranks.reshape(1 << precision, 1 << shift), axis=1)
+
+    def merge(self, other: "HyperLogLog"):
+        """Fold another sketch into this one, which then counts the union"""
+        if other.precision < self.precision:
+            self.registers = self._folded(other.precision)
+            self.precision = other.precision
+        np.maximum(self.registers, other._folded(self.precision), out=self.registers)
+
+    def count(self) -> int:
+        m = len(self.registers)
+        width = self._width
+        histogram = np.bincount(self.registers, minlength=width + 2)
+        z = m * _tau(1 - histogram[width + 1] / m)
+        for k in range(width, 0, -1):
+            z = 0.5 * (z + histogram[k])
+        z += m * _sigma(histogram[0] / m)
+        if math.isinf(z):
+            return 0
+        return round(m * m / (2 * math.log(2) * z))
+
+    def to_bytes(self) -> bytes:
+        header = bytes((_DENSE, self.precision))
+        occupied = np.flatnonzero(self.registers)
+        if len(occupied) * _SPARSE_PAIR.itemsize >= len(self.registers):
+            return header + self.registers.tobytes()
+        pairs = np.empty(len(occupied), dtype=_SPARSE_PAIR)
+        pairs["index"] = occupied
+        pairs["value"] = self.registers[occupied]
+        return bytes((_SPARSE, self.precision)) + pairs.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        encoding, precision = data[0], data[1]
+        sketch = cls(precision)
+        if encoding == _DENSE:
+            sketch.registers = np.frombuffer(data, dtype=np.uint8, offset=2).copy()
+        elif encoding == _SPARSE:
+            pairs = np.frombuffer(data, dtype=_SPARSE_PAIR, offset=2)
+            sketch.registers[pairs["index"]] = pairs["value"]
+        else:
+            raise ValueError(f"Unknown HyperLogLog format {encoding}")
+        return sketch
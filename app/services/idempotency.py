@@ -0,0 +1,174 @@
+"""
+Idempotency-Key support for POST /submissions/.
+
+The first request with a key claims it by inserting an in_progress row
+(the primary key makes the claim atomic across workers), does the work and
+stores the response on the row. A retry with the same key and body gets
+the stored response back; with a different body it gets 422. A duplicate
+that arrives while the first is still running waits for it: on an
+asyncio.Event when the owner is in the same process, otherwise by polling
+the row, and gets 409 if it isn't done within IDEMPOTENCY_WAIT_SECONDS.
+
+Keys expire after IDEMPOTENCY_KEY_TTL_HOURS. An in_progress row older than
+IDEMPOTENCY_LOCK_SECONDS is treated as abandoned (its worker died) and can
+be claimed again; a request that fails releases its key so the client can
+retry.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import structlog
+from fastapi import HTTPException, status
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.models import IdempotencyKey
+
+logger = structlog.get_logger()
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+IDEMPOTENCY_OUTCOMES = registry.counter(
+    "idempotency_requests_total", "Requests carrying an Idempotency-Key, by outcome", ["outcome"]
+)
+
+# Keys being processed by this process, so local duplicates can wait
+# without polling the database
+_in_flight: Dict[str, asyncio.Event] = {}
+_last_purge = 0.0
+
+
+def scoped_key(idempotency_key: str, owner: str) -> str:
+    """Storage key: the client's key is only meaningful together with who sent it"""
+    return hashlib.sha256(f"{owner}\n{idempotency_key}".encode()).hexdigest()
+
+
+def request_hash(payload: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _load(session: Session, key: str) -> Optional[IdempotencyKey]:
+    return session.exec(
+        select(IdempotencyKey).where(IdempotencyKey.key == key).execution_options(populate_existing=True)
+    ).first()
+
+
+def _claim(session: Session, key: str, fingerprint: str, existing: Optional[IdempotencyKey]) -> bool:
+    now = datetime.utcnow()
+    expires_at = now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    try:
+        if existing is None:
+            session.add(IdempotencyKey(key=key, request_hash=fingerprint, created_at=now, expires_at=expires_at))
+            session.commit()
+            return True
+        # Take over an expired or abandoned row, unless another request got there first
+        result = session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key, IdempotencyKey.created_at == existing.created_at)
+            .values(request_hash=fingerprint, status=IN_PROGRESS, status_code=None, response=None,
+                    created_at=now, expires_at=expires_at)
+        )
+        session.commit()
+        return result.rowcount == 1
+    except IntegrityError:
+        session.rollback()
+        return False
+
+
+def _purge_expired(session: Session):
+    """Delete a batch of expired keys, at most once per IDEMPOTENCY_PURGE_INTERVAL per process"""
+    global _last_purge
+    if time.monotonic() - _last_purge < settings.IDEMPOTENCY_PURGE_INTERVAL:
+        return
+    _last_purge = time.monotonic()
+    expired = select(IdempotencyKey.key).where(IdempotencyKey.expires_at < datetime.utcnow()).limit(1000)
+    result = session.execute(delete(IdempotencyKey).where(IdempotencyKey.key.in_(expired)))
+    session.commit()
+    if result.rowcount:
+        logger.info("Expired idempotency keys purged", count=result.rowcount)
+
+
+async def begin(session: Session, key: str, fingerprint: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """Claim a key; returns None if the caller should do the work, else the stored (status, body) to replay"""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        event = _in_flight.get(key)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+
+        row = _load(session, key)
+        now = datetime.utcnow()
+        if row is None or row.expires_at <= now:
+            if _claim(session, key, fingerprint, row):
+                _in_flight[key] = asyncio.Event()
+                IDEMPOTENCY_OUTCOMES.inc(outcome="new")
+                _purge_expired(session)
+                return None
+            continue
+
+        if row.request_hash != fingerprint:
+            IDEMPOTENCY_OUTCOMES.inc(outcome="mismatch")
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        if row.status == COMPLETED:
+            IDEMPOTENCY_OUTCOMES.inc(outcome="replayed")
+            return row.status_code, json.loads(row.response)
+        if row.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS) and key not in _in_flight:
+            logger.warning("Taking over abandoned idempotency key", started_at=row.created_at.isoformat())
+            if _claim(session, key, fingerprint, row):
+                _in_flight[key] = asyncio.Event()
+                IDEMPOTENCY_OUTCOMES.inc(outcome="new")
+                return None
+            continue
+
+        if time.monotonic() >= deadline:
+            IDEMPOTENCY_OUTCOMES.inc(outcome="timeout")
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+        if key not in _in_flight:
+            # Owned by another worker: poll the row
+            await asyncio.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+
+def complete(session: Session, key: str, status_code: int, body: Dict[str, Any]):
+    """Store the response for replay and wake local duplicates"""
+    try:
+        session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key)
+            .values(status=COMPLETED, status_code=status_code, response=json.dumps(body, default=str))
+        )
+        session.commit()
+    finally:
+        _release(key)
+
+
+def abandon(session: Session, key: str):
+    """Forget a key whose request failed, so a retry can run it again"""
+    try:
+        session.rollback()
+        session.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.status == IN_PROGRESS))
+        session.commit()
+    finally:
+        _release(key)
+
+
+def _release(key: str):
+    event = _in_flight.pop(key, None)
+    if event is not None:
+        event.set()
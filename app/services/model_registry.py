@@ -0,0 +1,378 @@
+"""
+In-process registry of trained risk models, one active model per disease.
+
+Artifacts live under settings.MODEL_DIR as <disease>/<version>/ with:
+
+    metadata.json  {"version": "...", "disease": "diabetes",
+                    "kind": "logistic_regression" | "gradient_boosting",
+                    "features": ["age", "bmi", ...], "auc_at_train": 0.84,
+                    "decision_threshold": 0.5, "calibration_method": "platt"}
+    model.npz      logistic_regression: coef (n_features,), intercept (1,)
+                   gradient_boosting: feature, threshold, left, right, value
+                   (flattened tree nodes, -1 children for leaves), roots,
+                   base_score (1,), learning_rate (1,)
+                   both may add: fill (n_features,) imputation values, and
+                   mean/scale (n_features,) for standardisation
+
+<disease>/CURRENT may name the version to serve; otherwise the highest
+version directory wins, comparing runs of digits as numbers (v10 after
+v9, 2024-10-01 after 2024-09-30). Swapping replaces the whole model map at once, so
+concurrent scorers see either the old or the new model, never a mix.
+Without an artifact for a disease, calculate_risk keeps its rule-based
+scoring.
+
+Each worker process holds its own models. Activating a version writes it
+to CURRENT, and every worker's model_sync job (sync(), every
+MODEL_SYNC_INTERVAL_SECONDS) loads whatever MODEL_DIR selects when it
+differs from what it serves, so all workers converge on the same version.
+"""
+import json
+import math
+import os
+import re
+import threading
+from typing import Dict, Any, List, Optional
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+MODEL_KINDS = ("logistic_regression", "gradient_boosting")
+DISEASES = ("diabetes", "hypertension", "heart")
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9._-]+$")
+MODEL_SYNC_JOB = "model_sync"
+
+
+class ModelArtifactError(Exception):
+    """Raised when an artifact is missing, malformed or fails validation"""
+
+
+def _to_float(value) -> float:
+    if value is None or value == "" or value == "unknown":
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _yes(value) -> float:
+    if value is None:
+        return math.nan
+    return 1.0 if value == "نعم" else 0.0
+
+
+def _bp_means(data: Dict[str, Any]):
+    systolic = []
+    diastolic = []
+    for reading in data.get("bpReadings") or []:
+        if reading.get("systolic") and reading.get("diastolic"):
+            systolic.append(_to_float(reading["systolic"]))
+            diastolic.append(_to_float(reading["diastolic"]))
+    if not systolic:
+        return math.nan, math.nan, 0.0
+    return sum(systolic) / len(systolic), sum(diastolic) / len(diastolic), float(len(systolic))
+
+
+def survey_features(data: Dict[str, Any]) -> Dict[str, float]:
+    """Numeric features derived from raw survey answers; missing answers are NaN"""
+    weight = _to_float(data.get("weight"))
+    height = _to_float(data.get("height"))
+    bmi = weight / ((height / 100) ** 2) if weight and height and not math.isnan(weight + height) else math.nan
+    systolic, diastolic, readings = _bp_means(data)
+    gender = data.get("gender")
+    exercise = data.get("exercise")
+    salt = data.get("salt")
+    diabetes_status = data.get("diabetesStatus")
+    return {
+        "age": _to_float(data.get("age")),
+        "weight": weight,
+        "height": height,
+        "bmi": bmi,
+        "fasting_glucose": _to_float(data.get("fastingGlucose")),
+        "hba1c": _to_float(data.get("hba1c")),
+        "systolic_mean": systolic,
+        "diastolic_mean": diastolic,
+        "bp_readings": readings,
+        "cholesterol": _to_float(data.get("cholesterol")),
+        "ldl": _to_float(data.get("ldl")),
+        "hdl": _to_float(data.get("hdl")),
+        "triglycerides": _to_float(data.get("triglycerides")),
+        "family_history": _yes(data.get("familyHistory")),
+        "smoking": _yes(data.get("smoking")),
+        "no_exercise": math.nan if exercise is None else float(exercise == "لا أمارس"),
+        "high_salt": math.nan if salt is None else float(salt == "كثير"),
+        "male": math.nan if gender is None else float(gender == "ذكر"),
+        "diabetes": math.nan if diabetes_status is None else float(diabetes_status in ("نوع 1", "نوع 2")),
+    }
+
+
+class LoadedModel:
+    """A validated model artifact held in memory"""
+
+    def __init__(self, metadata: Dict[str, Any], arrays: Dict[str, Any], path: str):
+        import numpy as np
+
+        self.metadata = metadata
+        self.path = path
+        self.disease = metadata["disease"]
+        self.version = metadata["version"]
+        self.kind = metadata["kind"]
+        self.features: List[str] = list(metadata["features"])
+        self.auc_at_train: Optional[float] = metadata.get("auc_at_train")
+        self.decision_threshold: float = metadata.get("decision_threshold", 0.5)
+        self.calibration_method: str = metadata.get("calibration_method", "none")
+
+        n = len(self.features)
+        self.fill = np.asarray(arrays.get("fill", np.zeros(n)), dtype=np.float64)
+        self.mean = np.asarray(arrays.get("mean", np.zeros(n)), dtype=np.float64)
+        self.scale = np.asarray(arrays.get("scale", np.ones(n)), dtype=np.float64)
+
+        if self.kind == "logistic_regression":
+            self.coef = np.asarray(arrays["coef"], dtype=np.float64).reshape(-1)
+            self.intercept = float(np.asarray(arrays["intercept"]).reshape(-1)[0])
+            if self.coef.shape != (n,):
+                raise ModelArtifactError(f"coef has shape {self.coef.shape}, expected ({n},)")
+        elif self.kind == "gradient_boosting":
+            self.node_feature = np.asarray(arrays["feature"], dtype=np.int64)
+            self.node_threshold = np.asarray(arrays["threshold"], dtype=np.float64)
+            self.node_left = np.asarray(arrays["left"], dtype=np.int64)
+            self.node_right = np.asarray(arrays["right"], dtype=np.int64)
+            self.node_value = np.asarray(arrays["value"], dtype=np.float64)
+            self.roots = np.asarray(arrays["roots"], dtype=np.int64)
+            self.base_score = float(np.asarray(arrays.get("base_score", [0.0])).reshape(-1)[0])
+            self.learning_rate = float(np.asarray(arrays.get("learning_rate", [1.0])).reshape(-1)[0])
+            internal = self.node_left >= 0
+            if internal.any() and self.node_feature[internal].max() >= n:
+                raise ModelArtifactError("tree references a feature index beyond the feature list")
+        else:
+            raise ModelArtifactError(f"Unknown model kind: {self.kind}")
+
+        for name in ("fill", "mean", "scale"):
+            if getattr(self, name).shape != (n,):
+                raise ModelArtifactError(f"{name} must have one value per feature")
+
+    def feature_matrix(self, rows: List[Dict[str, Any]]):
+        """Imputed, standardised feature matrix for raw survey answers"""
+        import numpy as np
+
+        matrix = np.empty((len(rows), len(self.features)), dtype=np.float64)
+        for i, data in enumerate(rows):
+            values = survey_features(data)
+            matrix[i] = [values.get(name, math.nan) for name in self.features]
+        matrix = np.where(np.isnan(matrix), self.fill, matrix)
+        return (matrix - self.mean) / self.scale
+
+    def predict_proba(self, matrix):
+        """Positive-class probability for each row of a feature matrix"""
+        import numpy as np
+
+        if self.kind == "logistic_regression":
+            margin = matrix @ self.coef + self.intercept
+        else:
+            margin = np.full(matrix.shape[0], self.base_score)
+            rows = np.arange(matrix.shape[0])
+            for root in self.roots:
+                node = np.full(matrix.shape[0], root)
+                while True:
+                    internal = self.node_left[node] >= 0
+                    if not internal.any():
+                        break
+                    go_left = matrix[rows, self.node_feature[node]] <= self.node_threshold[node]
+                    child = np.where(go_left, self.node_left[node], self.node_right[node])
+                    node = np.where(internal, child, node)
+                margin = margin + self.learning_rate * self.node_value[node]
+        return 1.0 / (1.0 + np.exp(-margin))
+
+    def score(self, rows: List[Dict[str, Any]]) -> List[float]:
+        return [float(p) for p in self.predict_proba(self.feature_matrix(rows))]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "disease": self.disease,
+            "version": self.version,
+            "kind": self.kind,
+            "features": self.features,
+            "auc_at_train": self.auc_at_train,
+            "path": self.path
+        }
+
+
+def load_artifact(path: str) -> LoadedModel:
+    """Load and validate one <disease>/<version> artifact directory"""
+    import numpy as np
+
+    try:
+        with open(os.path.join(path, "metadata.json"), encoding="utf-8") as f:
+            metadata = json.load(f)
+        with np.load(os.path.join(path, "model.npz"), allow_pickle=False) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+    except (OSError, ValueError) as e:
+        raise ModelArtifactError(f"Cannot read model artifact at {path}: {e}") from e
+
+    for key in ("disease", "version", "kind", "features"):
+        if key not in metadata:
+            raise ModelArtifactError(f"metadata.json is missing '{key}'")
+    try:
+        model = LoadedModel(metadata, arrays, path)
+    except KeyError as e:
+        raise ModelArtifactError(f"model.npz is missing array {e}") from e
+
+    # Smoke test: an all-missing survey must score to a finite probability
+    probability = model.score([{}])[0]
+    if not 0.0 <= probability <= 1.0:
+        raise ModelArtifactError(f"Model returned {probability} for an empty survey")
+    return model
+
+
+def save_artifact(directory: str, metadata: Dict[str, Any], arrays: Dict[str, Any]) -> str:
+    """Write an artifact in the layout load_artifact expects; returns its path"""
+    import numpy as np
+
+    path = os.path.join(directory, metadata["disease"], metadata["version"])
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    np.savez(os.path.join(path, "model.npz"), **{name: np.asarray(value) for name, value in arrays.items()})
+    return path
+
+
+def _write_current(disease_dir: str, version: str):
+    current = os.path.join(disease_dir, "CURRENT")
+    tmp = f"{current}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, current)
+
+
+def _valid_version(version: str) -> bool:
+    """A plain directory name: no separators, and not . or .."""
+    return bool(VERSION_PATTERN.match(version)) and version.strip(".") != ""
+
+
+def _version_key(version: str):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", version)]
+
+
+def _select_version(disease_dir: str) -> Optional[str]:
+    current = os.path.join(disease_dir, "CURRENT")
+    if os.path.exists(current):
+        with open(current, encoding="utf-8") as f:
+            return f.read().strip() or None
+    versions = sorted(
+        (
+            name for name in os.listdir(disease_dir)
+            if _valid_version(name) and os.path.isdir(os.path.join(disease_dir, name))
+        ),
+        key=_version_key
+    )
+    return versions[-1] if versions else None
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._models: Dict[str, LoadedModel] = {}
+        self._lock = threading.Lock()
+        # disease -> selected version that failed to load, so sync() doesn't retry it every tick
+        self._failed: Dict[str, str] = {}
+
+    def get(self, disease: str) -> Optional[LoadedModel]:
+        return self._models.get(disease)
+
+    def swap(self, model: LoadedModel) -> Optional[LoadedModel]:
+        """Make model the active one for its disease; returns the one it replaced"""
+        with self._lock:
+            models = dict(self._models)
+            previous = models.get(model.disease)
+            models[model.disease] = model
+            self._models = models
+        logger.info(
+            "Model activated",
+            disease=model.disease,
+            version=model.version,
+            previous_version=previous.version if previous else None
+        )
+        return previous
+
+    def unload(self, disease: str) -> Optional[LoadedModel]:
+        """Drop the model for a disease so scoring falls back to the rules"""
+        with self._lock:
+            models = dict(self._models)
+            previous = models.pop(disease, None)
+            self._models = models
+        return previous
+
+    def load(self, disease: str, version: Optional[str] = None, model_dir: Optional[str] = None) -> LoadedModel:
+        """Load a version (default: CURRENT or latest) from the model directory and swap it in"""
+        model_dir = model_dir or settings.MODEL_DIR
+        if not model_dir:
+            raise ModelArtifactError("MODEL_DIR is not configured")
+        if disease not in DISEASES:
+            raise ModelArtifactError(f"Unknown disease: {disease}")
+        disease_dir = os.path.join(model_dir, disease)
+        if not os.path.isdir(disease_dir):
+            raise ModelArtifactError(f"No model directory for {disease}")
+        version = version or _select_version(disease_dir)
+        if not version:
+            raise ModelArtifactError(f"No model versions for {disease}")
+        if not _valid_version(version):
+            raise ModelArtifactError(f"Invalid model version: {version!r}")
+
+        model = load_artifact(os.path.join(disease_dir, version))
+        if model.disease != disease:
+            raise ModelArtifactError(f"Artifact is for {model.disease}, not {disease}")
+        self.swap(model)
+        self._failed.pop(disease, None)
+        return model
+
+    def activate(self, disease: str, version: str, model_dir: Optional[str] = None) -> LoadedModel:
+        """Load and swap in a version, then name it in CURRENT so every worker's sync() follows"""
+        model = self.load(disease, version, model_dir)
+        _write_current(os.path.join(model_dir or settings.MODEL_DIR, disease), version)
+        return model
+
+    def sync(self, model_dir: Optional[str] = None) -> Dict[str, str]:
+        """Load the selected version of each disease this process isn't serving yet; returns those loaded"""
+        model_dir = model_dir or settings.MODEL_DIR
+        loaded = {}
+        if not model_dir or not os.path.isdir(model_dir):
+            return loaded
+        for disease in DISEASES:
+            disease_dir = os.path.join(model_dir, disease)
+            if not os.path.isdir(disease_dir):
+                continue
+            version = _select_version(disease_dir)
+            active = self._models.get(disease)
+            if not version or self._failed.get(disease) == version:
+                continue
+            if active is not None and active.version == version:
+                continue
+            try:
+                loaded[disease] = self.load(disease, version, model_dir).version
+            except ModelArtifactError as e:
+                self._failed[disease] = version
+                logger.error("Failed to load model", disease=disease, version=version, error=str(e))
+        return loaded
+
+    def load_all(self, model_dir: Optional[str] = None) -> Dict[str, str]:
+        """Load the selected version for every disease directory; failures keep the current model"""
+        model_dir = model_dir or settings.MODEL_DIR
+        loaded = {}
+        if not model_dir or not os.path.isdir(model_dir):
+            return loaded
+        for disease in DISEASES:
+            if not os.path.isdir(os.path.join(model_dir, disease)):
+                continue
+            try:
+                loaded[disease] = self.load(disease, model_dir=model_dir).version
+            except ModelArtifactError as e:
+                logger.error("Failed to load model", disease=disease, error=str(e))
+        return loaded
+
+    def active(self) -> Dict[str, Dict[str, Any]]:
+        return {disease: model.describe() for disease, model in self._models.items()}
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,168 @@
+"""
+Outbox for work deferred from the request path.
+
+A request enqueues a task (a row in outbox_tasks) in the same transaction
+as the data it refers to, so the task exists exactly when that data does.
+The outbox background job picks up due tasks, claims each one by pushing
+its available_at forward by OUTBOX_LOCK_SECONDS (a conditional UPDATE, so
+only one worker wins), runs its handler and deletes the task in the
+handler's transaction. A failed attempt is retried with exponential
+backoff; after OUTBOX_MAX_ATTEMPTS the task is kept as failed along with
+its last error. A worker that dies mid-task leaves it claimed until the
+lock runs out, after which another worker retries it.
+
+Requests call background_runner.wake(OUTBOX_JOB) after enqueueing, so tasks
+normally run within milliseconds rather than at the next poll.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import structlog
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.crud import DISEASE_ASSESSMENT_BUILDERS, build_recommendation
+from app.models import OutboxTask, RiskAssessment
+
+logger = structlog.get_logger()
+
+OUTBOX_JOB = "outbox"
+# Task statuses, also used for RiskAssessment.details_status
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+RISK_DETAILS = "risk_details"
+
+OUTBOX_TASKS = registry.counter("outbox_tasks_total", "Outbox task attempts", ["kind", "outcome"])
+OUTBOX_LAG = registry.histogram(
+    "outbox_task_lag_seconds", "Time from enqueue to successful completion", ["kind"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0, 600.0, 3600.0)
+)
+
+Handler = Callable[[Session, Dict[str, Any]], None]
+_handlers: Dict[str, Tuple[Handler, Optional[Handler]]] = {}
+
+
+def handler(kind: str, on_failure: Optional[Handler] = None):
+    """Register the function that runs tasks of this kind; on_failure runs once when retries are exhausted"""
+    def register(func: Handler) -> Handler:
+        _handlers[kind] = (func, on_failure)
+        return func
+    return register
+
+
+def enqueue(session: Session, kind: str, payload: Dict[str, Any]) -> OutboxTask:
+    """Add a task to the session; it is committed with the caller's transaction"""
+    task = OutboxTask(kind=kind, payload=json.dumps(payload, default=str))
+    session.add(task)
+    return task
+
+
+def _retry_delay(attempts: int) -> float:
+    return settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1)
+
+
+def _claim(bind: Engine, task_id: UUID, now: datetime) -> bool:
+    table = OutboxTask.__table__
+    with bind.begin() as conn:
+        result = conn.execute(
+            update(table)
+            .where(table.c.id == task_id, table.c.status == PENDING, table.c.available_at <= now)
+            .values(available_at=now + timedelta(seconds=settings.OUTBOX_LOCK_SECONDS), attempts=table.c.attempts + 1)
+        )
+    return result.rowcount == 1
+
+
+def _run_task(bind: Engine, task_id: UUID) -> bool:
+    with Session(bind) as session:
+        task = session.get(OutboxTask, task_id)
+        func, on_failure = _handlers[task.kind]
+        kind, payload = task.kind, json.loads(task.payload)
+        try:
+            func(session, payload)
+            OUTBOX_LAG.observe((datetime.utcnow() - task.created_at).total_seconds(), kind=kind)
+            session.delete(task)
+            session.commit()
+            OUTBOX_TASKS.inc(kind=kind, outcome="done")
+            return True
+        except Exception as e:
+            session.rollback()
+            task = session.get(OutboxTask, task_id)
+            task.last_error = f"{type(e).__name__}: {e}"[:2000]
+            if task.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                task.status = FAILED
+                if on_failure is not None:
+                    on_failure(session, payload)
+                OUTBOX_TASKS.inc(kind=kind, outcome="failed")
+                logger.error("Outbox task failed permanently", task_id=str(task_id), kind=kind,
+                             attempts=task.attempts, error=task.last_error)
+            else:
+                task.available_at = datetime.utcnow() + timedelta(seconds=_retry_delay(task.attempts))
+                OUTBOX_TASKS.inc(kind=kind, outcome="retry")
+                logger.warning("Outbox task will be retried", task_id=str(task_id), kind=kind,
+                               attempts=task.attempts, error=task.last_error)
+            session.add(task)
+            session.commit()
+            return False
+
+
+def run_outbox(bind: Optional[Engine] = None, batch_size: Optional[int] = None) -> int:
+    """Run due tasks until none are left (or a batch yields nothing new); returns how many succeeded"""
+    if bind is None:
+        from app.database import get_engine
+        bind = get_engine()
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    done = 0
+    while True:
+        now = datetime.utcnow()
+        with Session(bind) as session:
+            due: List[UUID] = session.exec(
+                select(OutboxTask.id)
+                .where(OutboxTask.status == PENDING, OutboxTask.available_at <= now)
+                .order_by(OutboxTask.available_at)
+                .limit(batch_size)
+            ).all()
+        claimed = 0
+        for task_id in due:
+            if _claim(bind, task_id, now):
+                claimed += 1
+                done += _run_task(bind, task_id)
+        if len(due) < batch_size or not claimed:
+            return done
+
+
+# Handlers
+
+def _set_details_status(session: Session, risk_id: UUID, details_status: str):
+    session.execute(
+        update(RiskAssessment)
+        .where(RiskAssessment.id == risk_id)
+        .values(details_status=details_status, updated_at=datetime.utcnow())
+    )
+
+
+def _risk_details_failed(session: Session, payload: Dict[str, Any]):
+    _set_details_status(session, UUID(payload["risk_id"]), FAILED)
+
+
+@handler(RISK_DETAILS, on_failure=_risk_details_failed)
+def materialize_risk_details(session: Session, payload: Dict[str, Any]):
+    """Write a new assessment's disease-specific row and recommendations, then mark it ready"""
+    risk_id = UUID(payload["risk_id"])
+    disease = payload["disease"]
+    user_id = UUID(payload["user_id"]) if payload.get("user_id") else None
+    builder = DISEASE_ASSESSMENT_BUILDERS.get(disease)
+    if builder is not None:
+        session.add(builder(risk_id, payload.get("clinical_data") or {}))
+    for rec in payload.get("recommendations", []):
+        session.add(build_recommendation(
+            disease, user_id, risk_id, rec["title"], rec.get("details"), rec.get("priority", "med"),
+            id=UUID(rec["id"]), created_at=datetime.fromisoformat(rec["created_at"])
+        ))
+    _set_details_status(session, risk_id, READY)
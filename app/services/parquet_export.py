@@ -0,0 +1,298 @@
+"""
+Incremental, partitioned Parquet export of risk assessments for analytics.
+
+Each assessment becomes one row with typed columns: the assessment itself,
+a few disease-specific outputs, and numeric answers flattened out of the
+submission JSON (the same features the models use). Files are laid out as
+
+    <output>/disease=<disease>/month=<YYYY-MM>/part-<run>-<n>.parquet
+
+Rows are read in (predicted_at, id) order after the watermark saved by the
+previous run, so each run only exports new assessments. Rows are buffered
+per partition and written as a row group every ROW_GROUP_SIZE rows, which
+keeps memory bounded by (open partitions x row group size). Because input
+is time-ordered, a month's writers are closed as soon as a later month
+appears. Files are written under a .tmp name and renamed, and the watermark
+is only advanced once every file of the run is in place.
+
+Disease-specific columns are written by the outbox after the assessment
+itself, so a run stops at the first assessment whose details are still
+pending and leaves the watermark before it; the next run picks up from
+there.
+
+pyarrow is optional and only needed to run the export.
+"""
+import json
+import math
+import os
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from uuid import UUID
+
+import structlog
+from sqlalchemy import select, and_, or_
+from sqlalchemy.engine import Engine
+
+from app.models import (
+    RiskAssessment, SurveySubmission,
+    DiabetesAssessment, HypertensionAssessment, HeartAssessment
+)
+from app.services.model_registry import survey_features
+from app.services.outbox import PENDING
+
+logger = structlog.get_logger()
+
+WATERMARK_FILE = "_watermark.json"
+ROW_GROUP_SIZE = 50000
+
+FLOAT_FEATURES = [
+    "age", "weight", "height", "bmi", "fasting_glucose", "hba1c",
+    "systolic_mean", "diastolic_mean", "cholesterol", "ldl", "hdl", "triglycerides"
+]
+BOOL_FEATURES = ["family_history", "smoking", "no_exercise", "high_salt", "male"]
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow") from e
+    return pyarrow, pyarrow.parquet
+
+
+def parquet_schema():
+    pa, _ = _require_pyarrow()
+    return pa.schema(
+        [
+            ("risk_id", pa.string()),
+            ("survey_id", pa.string()),
+            ("user_id", pa.string()),
+            ("disease", pa.string()),
+            ("model_version", pa.string()),
+            ("risk_score", pa.float64()),
+            ("risk_bucket", pa.string()),
+            ("auc_at_train", pa.float64()),
+            ("predicted_at", pa.timestamp("us")),
+            ("submitted_at", pa.timestamp("us")),
+            ("pred_class", pa.string()),
+            ("pre_diabetes_flag", pa.bool_()),
+            ("systolic_mmhg", pa.int32()),
+            ("diastolic_mmhg", pa.int32()),
+            ("cholesterol_mgdl", pa.float64()),
+            ("ldl_mgdl", pa.float64()),
+            ("hdl_mgdl", pa.float64()),
+            ("bp_readings", pa.int16()),
+        ]
+        + [(name, pa.float64()) for name in FLOAT_FEATURES]
+        + [(name, pa.bool_()) for name in BOOL_FEATURES]
+    )
+
+
+def export_statement(after: Optional[Tuple[datetime, str]] = None):
+    """Assessments with submission and disease-specific columns, after a (predicted_at, id) watermark"""
+    statement = select(
+        RiskAssessment.id,
+        RiskAssessment.survey_id,
+        RiskAssessment.disease,
+        RiskAssessment.model_version,
+        RiskAssessment.risk_score,
+        RiskAssessment.risk_bucket,
+        RiskAssessment.auc_at_train,
+        RiskAssessment.predicted_at,
+        RiskAssessment.details_status,
+        SurveySubmission.user_id,
+        SurveySubmission.submitted_at,
+        SurveySubmission.data,
+        DiabetesAssessment.pred_class,
+        DiabetesAssessment.pre_diabetes_flag,
+        HypertensionAssessment.systolic_mmhg,
+        HypertensionAssessment.diastolic_mmhg,
+        HeartAssessment.cholesterol_mgdl,
+        HeartAssessment.ldl_mgdl,
+        HeartAssessment.hdl_mgdl
+    ).join(
+        SurveySubmission, SurveySubmission.id == RiskAssessment.survey_id
+    ).outerjoin(
+        DiabetesAssessment, DiabetesAssessment.risk_id == RiskAssessment.id
+    ).outerjoin(
+        HypertensionAssessment, HypertensionAssessment.risk_id == RiskAssessment.id
+    ).outerjoin(
+        HeartAssessment, HeartAssessment.risk_id == RiskAssessment.id
+    )
+    if after is not None:
+        predicted_at, risk_id = after
+        statement = statement.where(or_(
+            RiskAssessment.predicted_at > predicted_at,
+            and_(RiskAssessment.predicted_at == predicted_at, RiskAssessment.id > UUID(risk_id))
+        ))
+    return statement.order_by(RiskAssessment.predicted_at, RiskAssessment.id)
+
+
+def _none_if_nan(value: float) -> Optional[float]:
+    return None if value is None or math.isnan(value) else value
+
+
+def flatten(row) -> Dict[str, Any]:
+    """One typed Parquet row from an export_statement result row"""
+    try:
+        data = json.loads(row.data) if row.data else {}
+    except ValueError:
+        data = {}
+    features = survey_features(data)
+    flat = {
+        "risk_id": str(row.id),
+        "survey_id": str(row.survey_id),
+        "user_id": str(row.user_id) if row.user_id else None,
+        "disease": row.disease,
+        "model_version": row.model_version,
+        "risk_score": row.risk_score,
+        "risk_bucket": row.risk_bucket.value if hasattr(row.risk_bucket, "value") else row.risk_bucket,
+        "auc_at_train": row.auc_at_train,
+        "predicted_at": row.predicted_at,
+        "submitted_at": row.submitted_at,
+        "pred_class": row.pred_class,
+        "pre_diabetes_flag": row.pre_diabetes_flag,
+        "systolic_mmhg": row.systolic_mmhg,
+        "diastolic_mmhg": row.diastolic_mmhg,
+        "cholesterol_mgdl": row.cholesterol_mgdl,
+        "ldl_mgdl": row.ldl_mgdl,
+        "hdl_mgdl": row.hdl_mgdl,
+        "bp_readings": int(features["bp_readings"]),
+    }
+    for name in FLOAT_FEATURES:
+        flat[name] = _none_if_nan(features[name])
+    for name in BOOL_FEATURES:
+        value = _none_if_nan(features[name])
+        flat[name] = None if value is None else bool(value)
+    return flat
+
+
+def load_watermark(output_dir: str) -> Optional[Tuple[datetime, str]]:
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    return datetime.fromisoformat(saved["predicted_at"]), saved["risk_id"]
+
+
+def save_watermark(output_dir: str, predicted_at: datetime, risk_id: str, rows: int):
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "predicted_at": predicted_at.isoformat(),
+            "risk_id": risk_id,
+            "rows": rows,
+            "exported_at": datetime.utcnow().isoformat()
+        }, f)
+    os.replace(tmp, path)
+
+
+class _PartitionWriter:
+    """Buffers rows for one disease/month and writes them as bounded row groups"""
+
+    def __init__(self, output_dir: str, disease: str, month: str, run_id: str, schema, row_group_size: int):
+        self.directory = os.path.join(output_dir, f"disease={disease}", f"month={month}")
+        os.makedirs(self.directory, exist_ok=True)
+        index = len([name for name in os.listdir(self.directory) if name.startswith(f"part-{run_id}")])
+        self.path = os.path.join(self.directory, f"part-{run_id}-{index}.parquet")
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.rows: List[Dict[str, Any]] = []
+        self.writer = None
+        self.written = 0
+
+    def add(self, row: Dict[str, Any]):
+        self.rows.append(row)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        pa, pq = _require_pyarrow()
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(f"{self.path}.tmp", self.schema, compression="zstd")
+        self.writer.write_table(pa.Table.from_pylist(self.rows, schema=self.schema))
+        self.written += len(self.rows)
+        self.rows = []
+
+    def close(self) -> Optional[str]:
+        """Flush, close and return the temporary file path (None if nothing was written)"""
+        self.flush()
+        if self.writer is None:
+            return None
+        self.writer.close()
+        return f"{self.path}.tmp"
+
+
+def export_parquet(bind: Engine, output_dir: str, row_group_size: int = ROW_GROUP_SIZE,
+                   chunk_size: int = 5000, full: bool = False) -> Dict[str, Any]:
+    """Export assessments newer than the watermark; returns a run summary"""
+    schema = parquet_schema()
+    os.makedirs(output_dir, exist_ok=True)
+    after = None if full else load_watermark(output_dir)
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+
+    writers: Dict[Tuple[str, str], _PartitionWriter] = {}
+    finished: List[str] = []
+    current_month = None
+    last: Optional[Tuple[datetime, str]] = None
+    total = 0
+    pending = False
+
+    def close_months_before(month: str):
+        for key in [key for key in writers if key[1] < month]:
+            tmp = writers.pop(key).close()
+            if tmp:
+                finished.append(tmp)
+
+    try:
+        with bind.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+                export_statement(after)
+            )
+            for rows in result.partitions():
+                for row in rows:
+                    if row.details_status == PENDING:
+                        pending = True
+                        break
+                    month = row.predicted_at.strftime("%Y-%m")
+                    if current_month is not None and month > current_month:
+                        close_months_before(month)
+                    current_month = month
+                    key = (row.disease, month)
+                    if key not in writers:
+                        writers[key] = _PartitionWriter(output_dir, row.disease, month, run_id, schema, row_group_size)
+                    writers[key].add(flatten(row))
+                    last = (row.predicted_at, str(row.id))
+                    total += 1
+                if pending:
+                    break
+        close_months_before("9999-99")
+    except BaseException:
+        for writer in writers.values():
+            if writer.writer is not None:
+                writer.writer.close()
+        for tmp in finished + [w.path + ".tmp" for w in writers.values()]:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
+
+    files = []
+    for tmp in finished:
+        final = tmp[:-len(".tmp")]
+        os.replace(tmp, final)
+        files.append(os.path.relpath(final, output_dir))
+    if last is not None:
+        save_watermark(output_dir, last[0], last[1], total)
+
+    logger.info("Parquet export finished", rows=total, files=len(files), output=output_dir, pending=pending)
+    return {
+        "rows": total,
+        "files": files,
+        "pending": pending,
+        "watermark": {"predicted_at": last[0].isoformat(), "risk_id": last[1]} if last else None
+    }
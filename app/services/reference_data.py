@@ -0,0 +1,110 @@
+"""
+In-memory cache of reference data (assessment types and other lookups).
+
+Reference rows almost never change, yet every draft and submission request
+looked its assessment type up by slug. The cache loads them once into an
+immutable snapshot: frozen records in read-only maps keyed by slug and by
+id, plus the /assessments response body already encoded as JSON. Requests
+read the current snapshot without taking a lock.
+
+A snapshot is replaced when the cache's version is bumped (invalidate(),
+called by code that writes reference rows) or when it is older than
+REFERENCE_DATA_TTL_SECONDS, which bounds how long another worker process
+can serve data changed elsewhere.
+"""
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+from uuid import UUID
+
+import structlog
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.models import AssessmentType
+
+logger = structlog.get_logger()
+
+REFERENCE_DATA_LOADS = registry.counter("reference_data_loads_total", "Reference data cache (re)loads")
+
+
+@dataclass(frozen=True)
+class AssessmentTypeRef:
+    id: UUID
+    slug: str
+    title: str
+    description: Optional[str]
+
+
+@dataclass(frozen=True)
+class ReferenceSnapshot:
+    version: int
+    loaded_at: float
+    assessment_types_by_slug: Mapping[str, AssessmentTypeRef]
+    assessment_types_by_id: Mapping[UUID, AssessmentTypeRef]
+    # GET /assessments body and its ETag
+    assessments_json: bytes
+    assessments_etag: str
+
+
+class ReferenceDataCache:
+    def __init__(self):
+        self.version = 0
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._lock = threading.Lock()
+
+    def _fresh(self, snapshot: Optional[ReferenceSnapshot]) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.version == self.version
+            and time.monotonic() - snapshot.loaded_at < settings.REFERENCE_DATA_TTL_SECONDS
+        )
+
+    def load(self, session: Session) -> ReferenceSnapshot:
+        """Read the reference tables and publish a new snapshot"""
+        version = self.version
+        types = [
+            AssessmentTypeRef(id=row.id, slug=row.slug, title=row.title, description=row.description)
+            for row in session.exec(select(AssessmentType).order_by(AssessmentType.created_at, AssessmentType.slug))
+        ]
+        # The API identifies assessment types by slug, so that is the public id
+        body = json.dumps(
+            [{"id": t.slug, "slug": t.slug, "title": t.title, "description": t.description} for t in types],
+            ensure_ascii=False
+        ).encode("utf-8")
+        snapshot = ReferenceSnapshot(
+            version=version,
+            loaded_at=time.monotonic(),
+            assessment_types_by_slug=MappingProxyType({t.slug: t for t in types}),
+            assessment_types_by_id=MappingProxyType({t.id: t for t in types}),
+            assessments_json=body,
+            assessments_etag=f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        )
+        self._snapshot = snapshot
+        REFERENCE_DATA_LOADS.inc()
+        logger.debug("Reference data loaded", assessment_types=len(types), version=version)
+        return snapshot
+
+    def get(self, session: Session) -> ReferenceSnapshot:
+        """The current snapshot, loading it through session if missing, invalidated or expired"""
+        snapshot = self._snapshot
+        if self._fresh(snapshot):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if self._fresh(snapshot):
+                return snapshot
+            return self.load(session)
+
+    def invalidate(self):
+        """Bump the version so the next read reloads"""
+        with self._lock:
+            self.version += 1
+
+
+reference_data = ReferenceDataCache()
@@ -0,0 +1,265 @@
+"""
+Rescoring backfill: score historical submissions with the current rules or
+models and store the results as new RiskAssessment rows.
+
+Submissions are read in primary-key order, one keyset chunk at a time, with
+a streaming (server-side) cursor. Chunks are scored on a process pool and
+written back in order with bulk inserts. After each chunk commits, the last
+submission id is saved to a checkpoint file, so an interrupted run resumes
+where it stopped. Surveys that already have an assessment for the model
+version being written are skipped, which makes reruns idempotent. A new
+assessment replaces its survey's row in latest_risks, in the same
+transaction, when that survey is the patient's latest for the disease.
+Recommendations are not regenerated: they are actions shown to the patient
+for the assessment they saw.
+"""
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+import structlog
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.engine import Engine
+
+from app.crud import DISEASE_ASSESSMENT_BUILDERS
+from app.models import AssessmentType, LatestRisk, RiskAssessment, RiskBucket, SurveySubmission
+from app.services.risk_sketches import risk_sketches
+
+logger = structlog.get_logger()
+
+# (survey id, disease slug, raw JSON answers)
+SubmissionRow = Tuple[str, str, Optional[str]]
+
+
+@dataclass
+class Checkpoint:
+    last_id: Optional[str] = None
+    scanned: int = 0
+    written: int = 0
+    skipped: int = 0
+    failed: int = 0
+    model_versions: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> "Checkpoint":
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return cls(**json.load(f))
+        return cls()
+
+    def save(self, path: Optional[str]):
+        if not path:
+            return
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp, path)
+
+
+def _init_worker(model_dir: Optional[str]):
+    """Process pool initializer: load the same models the parent serves"""
+    if model_dir:
+        from app.services.model_registry import model_registry
+        model_registry.load_all(model_dir)
+
+
+def score_chunk(rows: List[SubmissionRow]) -> List[Dict[str, Any]]:
+    """Score one chunk of submissions; runs in a worker process"""
+    from app.services.risk_calculator import calculate_risk_batch
+
+    by_disease: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+    for survey_id, disease, data in rows:
+        by_disease.setdefault(disease, []).append((survey_id, json.loads(data) if data else {}))
+
+    scored = []
+    for disease, items in by_disease.items():
+        try:
+            results = calculate_risk_batch(disease, [data for _, data in items])
+        except Exception:
+            results = []
+            for _, data in items:
+                try:
+                    results.append(calculate_risk_batch(disease, [data])[0])
+                except Exception as e:
+                    results.append({"error": str(e)})
+        for (survey_id, _), result in zip(items, results):
+            scored.append({"survey_id": survey_id, "disease": disease, **result})
+    return scored
+
+
+def read_chunk(bind: Engine, slugs: Dict[UUID, str], after: Optional[str],
+               size: int, disease: Optional[str] = None) -> List[SubmissionRow]:
+    """Next chunk of submissions in primary-key order, read through a streaming cursor"""
+    statement = select(
+        SurveySubmission.id, SurveySubmission.assessment_type_id, SurveySubmission.data
+    ).order_by(SurveySubmission.id).limit(size)
+    if after is not None:
+        statement = statement.where(SurveySubmission.id > UUID(after))
+    if disease is not None:
+        type_ids = [type_id for type_id, slug in slugs.items() if slug == disease]
+        statement = statement.where(SurveySubmission.assessment_type_id.in_(type_ids))
+
+    with bind.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=size).execute(statement)
+        return [(str(row.id), slugs[row.assessment_type_id], row.data) for row in result]
+
+
+def write_results(bind: Engine, scored: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Bulk insert new assessments, skipping surveys already scored by the same model version"""
+    counts = {"written": 0, "skipped": 0, "failed": 0}
+    ok = [item for item in scored if "error" not in item]
+    counts["failed"] = len(scored) - len(ok)
+    if not ok:
+        return counts
+
+    with bind.begin() as conn:
+        existing = set()
+        for version in {item["model_version"] for item in ok}:
+            survey_ids = [UUID(item["survey_id"]) for item in ok if item["model_version"] == version]
+            existing.update(
+                (str(survey_id), version) for survey_id in conn.execute(
+                    select(RiskAssessment.survey_id).where(
+                        RiskAssessment.model_version == version,
+                        RiskAssessment.survey_id.in_(survey_ids)
+                    )
+                ).scalars()
+            )
+
+        now = datetime.utcnow()
+        risk_rows = []
+        detail_rows: Dict[Any, List[Dict[str, Any]]] = {}
+        for item in ok:
+            if (item["survey_id"], item["model_version"]) in existing:
+                counts["skipped"] += 1
+                continue
+            risk_id = uuid4()
+            risk_rows.append({
+                "id": risk_id,
+                "survey_id": UUID(item["survey_id"]),
+                "disease": item["disease"],
+                "model_version": item["model_version"],
+                "risk_score": item["risk_score"],
+                "risk_bucket": RiskBucket(item["risk_bucket"]),
+                "auc_at_train": item.get("auc_at_train"),
+                "predicted_at": now,
+                "created_at": now,
+                "updated_at": now
+            })
+            builder = DISEASE_ASSESSMENT_BUILDERS.get(item["disease"])
+            if builder is not None:
+                detail = builder(risk_id, item.get("clinical_data") or {})
+                detail_rows.setdefault(detail.__table__, []).append(
+                    {column.name: getattr(detail, column.name) for column in detail.__table__.columns}
+                )
+
+        if risk_rows:
+            conn.execute(insert(RiskAssessment.__table__), risk_rows)
+            for table, rows in detail_rows.items():
+                conn.execute(insert(table), rows)
+            update_latest_risks(conn, risk_rows)
+        counts["written"] = len(risk_rows)
+    for row in risk_rows:
+        risk_sketches.record(row["disease"], row["risk_bucket"], row["model_version"], row["predicted_at"], row["risk_score"])
+    return counts
+
+
+def update_latest_risks(conn, risk_rows: List[Dict[str, Any]]):
+    """Point latest_risks at the new assessments of surveys it currently shows"""
+    table = LatestRisk.__table__
+    statement = update(table).where(
+        table.c.survey_id == bindparam("b_survey_id"),
+        table.c.disease == bindparam("b_disease"),
+        table.c.predicted_at <= bindparam("b_predicted_at")
+    ).values(
+        risk_id=bindparam("b_risk_id"),
+        risk_score=bindparam("b_risk_score"),
+        risk_bucket=bindparam("b_risk_bucket"),
+        model_version=bindparam("b_model_version"),
+        predicted_at=bindparam("b_predicted_at"),
+        updated_at=bindparam("b_predicted_at")
+    )
+    conn.execute(statement, [
+        {
+            "b_survey_id": row["survey_id"],
+            "b_disease": row["disease"],
+            "b_risk_id": row["id"],
+            "b_risk_score": row["risk_score"],
+            "b_risk_bucket": row["risk_bucket"],
+            "b_model_version": row["model_version"],
+            "b_predicted_at": row["predicted_at"]
+        }
+        for row in risk_rows
+    ])
+
+
+def rescore(bind: Engine, checkpoint_path: Optional[str] = None, chunk_size: int = 1000,
+            workers: int = 0, model_dir: Optional[str] = None, disease: Optional[str] = None,
+            max_chunks: Optional[int] = None) -> Checkpoint:
+    """
+    Rescore submissions after the checkpoint and write new assessments.
+    workers=0 scores in this process with the models already loaded here.
+    """
+    checkpoint = Checkpoint.load(checkpoint_path)
+    with bind.connect() as conn:
+        slugs = {row.id: row.slug for row in conn.execute(select(AssessmentType.id, AssessmentType.slug))}
+
+    executor: Optional[Executor] = None
+    if workers > 0:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_dir,))
+
+    # Keep a few chunks scoring ahead of the writer; results are written
+    # strictly in key order so the checkpoint never skips an unwritten chunk.
+    inflight: deque = deque()
+    max_inflight = max(1, workers) * 2
+    after = checkpoint.last_id
+    chunks = 0
+    started = time.perf_counter()
+    resumed_at = checkpoint.scanned
+
+    def drain_one():
+        last_id, count, future = inflight.popleft()
+        scored = future.result() if isinstance(future, Future) else future
+        counts = write_results(bind, scored)
+        risk_sketches.flush(bind)
+        checkpoint.last_id = last_id
+        checkpoint.scanned += count
+        checkpoint.written += counts["written"]
+        checkpoint.skipped += counts["skipped"]
+        checkpoint.failed += counts["failed"]
+        for item in scored:
+            if "model_version" in item:
+                version = item["model_version"]
+                checkpoint.model_versions[version] = checkpoint.model_versions.get(version, 0) + 1
+        checkpoint.save(checkpoint_path)
+        logger.info(
+            "Rescoring chunk written",
+            last_id=last_id,
+            scanned=checkpoint.scanned,
+            written=checkpoint.written,
+            rate_per_s=round((checkpoint.scanned - resumed_at) / max(time.perf_counter() - started, 1e-9), 1)
+        )
+
+    try:
+        while max_chunks is None or chunks < max_chunks:
+            rows = read_chunk(bind, slugs, after, chunk_size, disease)
+            if not rows:
+                break
+            after = rows[-1][0]
+            chunks += 1
+            work = executor.submit(score_chunk, rows) if executor else score_chunk(rows)
+            inflight.append((after, len(rows), work))
+            if len(inflight) >= max_inflight:
+                drain_one()
+        while inflight:
+            drain_one()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    return checkpoint
@@ -0,0 +1,154 @@
+"""
+Retention for analytics_events and audit_logs.
+
+Rows older than the table's retention period are read in (created_at, id)
+keyset order, one batch at a time. Each batch is appended to gzip NDJSON
+archive files partitioned by day,
+
+    <archive>/<table>/date=<YYYY-MM-DD>/part-<run>.ndjson.gz
+
+which are fsynced before the batch is deleted by primary key in its own
+short transaction. Every batch appends one gzip member, which gzip/zcat
+read as one stream. If the process dies between the archive write and the
+delete, the next run archives that batch again, so readers should
+deduplicate on id.
+
+Between batches the job sleeps RETENTION_BATCH_PAUSE_SECONDS, four times
+longer while the API is busy (half of the concurrency limit in use), and
+each run stops after RETENTION_MAX_RUN_SECONDS so it never holds the
+database for long.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import structlog
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.models import AnalyticsEvent, AuditLog
+
+logger = structlog.get_logger()
+
+RETAINED_TABLES = {
+    "analytics_events": AnalyticsEvent.__table__,
+    "audit_logs": AuditLog.__table__
+}
+
+ROWS_ARCHIVED = registry.counter("retention_rows_archived_total", "Rows written to retention archives", ["table"])
+ROWS_DELETED = registry.counter("retention_rows_deleted_total", "Rows deleted by retention", ["table"])
+BATCH_DURATION = registry.histogram(
+    "retention_batch_duration_seconds", "Archive and delete time per retention batch", ["table"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+
+def retention_days() -> Dict[str, int]:
+    """Retention period per table; 0 keeps rows forever"""
+    return {
+        "analytics_events": settings.RETENTION_ANALYTICS_EVENTS_DAYS,
+        "audit_logs": settings.RETENTION_AUDIT_LOGS_DAYS
+    }
+
+
+def foreground_busy() -> bool:
+    from app.core.rate_limit import concurrency_limiter
+
+    return concurrency_limiter.limit > 0 and concurrency_limiter.in_flight >= concurrency_limiter.limit // 2
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class _Archive:
+    """Day-partitioned gzip NDJSON files for one table and run"""
+
+    def __init__(self, directory: str, table: str, run_id: str):
+        self.directory = os.path.join(directory, table)
+        self.run_id = run_id
+
+    def write(self, rows) -> int:
+        by_day: Dict[str, List[bytes]] = {}
+        for row in rows:
+            line = json.dumps({key: _json_value(value) for key, value in row._mapping.items()}, ensure_ascii=False).encode("utf-8")
+            by_day.setdefault(row.created_at.strftime("%Y-%m-%d"), []).append(line)
+        for day, lines in by_day.items():
+            partition = os.path.join(self.directory, f"date={day}")
+            os.makedirs(partition, exist_ok=True)
+            with open(os.path.join(partition, f"part-{self.run_id}.ndjson.gz"), "ab") as f:
+                f.write(gzip.compress(b"\n".join(lines) + b"\n"))
+                f.flush()
+                os.fsync(f.fileno())
+        return sum(len(lines) for lines in by_day.values())
+
+
+def purge_table(bind: Engine, table_name: str, days: int, archive_dir: Optional[str] = None,
+                batch_size: Optional[int] = None, pause: Optional[float] = None,
+                max_seconds: Optional[float] = None, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Archive and delete rows of one table older than `days`"""
+    table = RETAINED_TABLES[table_name]
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    pause = settings.RETENTION_BATCH_PAUSE_SECONDS if pause is None else pause
+    deadline = time.monotonic() + (max_seconds or settings.RETENTION_MAX_RUN_SECONDS)
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=days)
+    archive = _Archive(archive_dir, table_name, now.strftime("%Y%m%dT%H%M%S")) if archive_dir else None
+
+    stats = {"archived": 0, "deleted": 0, "batches": 0}
+    after = None
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        statement = select(table).where(table.c.created_at < cutoff)
+        if after is not None:
+            statement = statement.where(or_(
+                table.c.created_at > after[0],
+                and_(table.c.created_at == after[0], table.c.id > after[1])
+            ))
+        with bind.connect() as conn:
+            rows = conn.execute(statement.order_by(table.c.created_at, table.c.id).limit(batch_size)).all()
+        if not rows:
+            break
+
+        if archive is not None:
+            written = archive.write(rows)
+            stats["archived"] += written
+            ROWS_ARCHIVED.inc(written, table=table_name)
+        with bind.begin() as conn:
+            deleted = conn.execute(delete(table).where(table.c.id.in_([row.id for row in rows]))).rowcount
+        stats["deleted"] += deleted
+        stats["batches"] += 1
+        ROWS_DELETED.inc(deleted, table=table_name)
+        BATCH_DURATION.observe(time.perf_counter() - started, table=table_name)
+        after = (rows[-1].created_at, rows[-1].id)
+
+        if len(rows) < batch_size:
+            break
+        time.sleep(pause * 4 if foreground_busy() else pause)
+
+    if stats["batches"]:
+        logger.info("Retention purge finished", table=table_name, cutoff=cutoff.isoformat(), **stats)
+    return stats
+
+
+def run_retention(bind: Optional[Engine] = None, tables: Optional[List[str]] = None,
+                  now: Optional[datetime] = None) -> Dict[str, Dict[str, int]]:
+    """Apply the configured retention to every table; the background job's entry point"""
+    if bind is None:
+        from app.database import get_engine
+        bind = get_engine()
+    results = {}
+    for table_name, days in retention_days().items():
+        if days <= 0 or (tables and table_name not in tables):
+            continue
+        results[table_name] = purge_table(bind, table_name, days, settings.RETENTION_ARCHIVE_DIR or None, now=now)
+    return results
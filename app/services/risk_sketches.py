@@ -0,0 +1,258 @@
+"""
+Risk score distributions from mergeable quantile sketches.
+
+Every scored assessment is added to an in-memory t-digest for its disease,
+day (of predicted_at), bucket and model version. The risk_sketches
+background job flushes these into risk_score_sketches every
+RISK_SKETCH_FLUSH_SECONDS, merging each into the stored digest with a
+version check, so workers flushing the same key concurrently retry rather
+than overwrite each other. Values buffered in a worker that dies before a
+flush are lost; rebuild_risk_sketches recomputes a date range from
+risk_assessments.
+
+Distribution queries read one small row per key and day and merge the
+digests, so medians, p90 and histograms over any range never sort
+risk_assessments.
+"""
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.models import RiskAssessment, RiskBucket, RiskScoreSketch
+from app.services.tdigest import TDigest
+
+logger = structlog.get_logger()
+
+RISK_SKETCH_JOB = "risk_sketches"
+INTERVALS = ("day", "week", "month")
+
+SKETCH_MERGES = registry.counter("risk_sketch_merges_total", "Sketch merges into risk_score_sketches", ["outcome"])
+
+# (disease, day, bucket, model version)
+SketchKey = Tuple[str, date, RiskBucket, str]
+
+
+class _Pending:
+    __slots__ = ("digest", "score_sum")
+
+    def __init__(self):
+        self.digest = TDigest(settings.RISK_SKETCH_COMPRESSION)
+        self.score_sum = 0.0
+
+    def add(self, score: float):
+        self.digest.add(score)
+        self.score_sum += score
+
+
+class RiskSketchBuffer:
+    def __init__(self):
+        self._pending: Dict[SketchKey, _Pending] = {}
+        self._lock = threading.Lock()
+
+    def record(self, disease: str, risk_bucket: RiskBucket, model_version: str,
+               predicted_at: datetime, risk_score: float):
+        key = (disease, predicted_at.date(), RiskBucket(risk_bucket), model_version)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _Pending()
+            pending.add(risk_score)
+
+    def _restore(self, key: SketchKey, pending: _Pending):
+        """Put a batch that couldn't be flushed back, merged with anything recorded since"""
+        with self._lock:
+            current = self._pending.get(key)
+            if current is None:
+                self._pending[key] = pending
+            else:
+                current.digest.merge(pending.digest)
+                current.score_sum += pending.score_sum
+
+    def flush(self, bind: Optional[Engine] = None) -> int:
+        """Merge everything buffered into risk_score_sketches; returns keys written"""
+        if bind is None:
+            from app.database import get_engine
+            bind = get_engine()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        written = 0
+        for key, batch in pending.items():
+            try:
+                if _merge_into_table(bind, key, batch):
+                    written += 1
+                    continue
+                SKETCH_MERGES.inc(outcome="conflict")
+            except Exception as e:
+                SKETCH_MERGES.inc(outcome="error")
+                logger.error("Risk sketch flush failed", disease=key[0], day=key[1].isoformat(), error=str(e))
+            self._restore(key, batch)
+        return written
+
+    def reset(self):
+        with self._lock:
+            self._pending = {}
+
+
+risk_sketches = RiskSketchBuffer()
+
+
+def _merge_into_table(bind: Engine, key: SketchKey, batch: _Pending, attempts: int = 5) -> bool:
+    table = RiskScoreSketch.__table__
+    disease, day, bucket, model_version = key
+    where = (table.c.disease == disease, table.c.day == day,
+             table.c.risk_bucket == bucket, table.c.model_version == model_version)
+    for _ in range(attempts):
+        try:
+            with bind.begin() as conn:
+                row = conn.execute(
+                    select(table.c.count, table.c.score_sum, table.c.digest, table.c.version).where(*where)
+                ).first()
+                if row is None:
+                    conn.execute(insert(table).values(
+                        disease=disease, day=day, risk_bucket=bucket, model_version=model_version,
+                        count=int(batch.digest.count), score_sum=batch.score_sum,
+                        digest=batch.digest.to_bytes(), version=1, updated_at=datetime.utcnow()
+                    ))
+                    SKETCH_MERGES.inc(outcome="created")
+                    return True
+                merged = TDigest.from_bytes(row.digest)
+                merged.merge(batch.digest)
+                result = conn.execute(
+                    update(table).where(*where, table.c.version == row.version).values(
+                        count=row.count + int(batch.digest.count), score_sum=row.score_sum + batch.score_sum,
+                        digest=merged.to_bytes(), version=row.version + 1, updated_at=datetime.utcnow()
+                    )
+                )
+            if result.rowcount == 1:
+                SKETCH_MERGES.inc(outcome="merged")
+                return True
+        except IntegrityError:
+            # Another worker created the row first; merge into it
+            pass
+    return False
+
+
+def flush_risk_sketches() -> int:
+    return risk_sketches.flush()
+
+
+def build_sketch_rows(rows: Iterable[Tuple[str, datetime, Any, str, float]]) -> List[Dict[str, Any]]:
+    """risk_score_sketches rows for (disease, predicted_at, bucket, model version, score) tuples"""
+    batches: Dict[Tuple[str, date, Any, str], _Pending] = {}
+    for disease, predicted_at, bucket, model_version, score in rows:
+        key = (disease, predicted_at.date(), bucket, model_version)
+        batch = batches.get(key)
+        if batch is None:
+            batch = batches[key] = _Pending()
+        batch.add(score)
+    now = datetime.utcnow()
+    return [
+        {
+            "disease": disease, "day": day, "risk_bucket": bucket, "model_version": model_version,
+            "count": int(batch.digest.count), "score_sum": batch.score_sum,
+            "digest": batch.digest.to_bytes(), "version": 1, "updated_at": now
+        }
+        for (disease, day, bucket, model_version), batch in batches.items()
+    ]
+
+
+def rebuild_risk_sketches(bind: Engine, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """Recompute the sketches for days in [start, end) (default: all) from risk_assessments; returns rows written"""
+    table = RiskScoreSketch.__table__
+    source = select(
+        RiskAssessment.disease, RiskAssessment.predicted_at, RiskAssessment.risk_bucket,
+        RiskAssessment.model_version, RiskAssessment.risk_score
+    )
+    clear = delete(table)
+    if start:
+        source = source.where(RiskAssessment.predicted_at >= datetime.combine(start, datetime.min.time()))
+        clear = clear.where(table.c.day >= start)
+    if end:
+        source = source.where(RiskAssessment.predicted_at < datetime.combine(end, datetime.min.time()))
+        clear = clear.where(table.c.day < end)
+    with bind.begin() as conn:
+        rows = build_sketch_rows(conn.execution_options(yield_per=10000).execute(source))
+        conn.execute(clear)
+        if rows:
+            conn.execute(insert(table), rows)
+    logger.info("Risk score sketches rebuilt", rows=len(rows))
+    return len(rows)
+
+
+def _period(day: date, interval: str) -> date:
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _summary(digest: TDigest, count: int, score_sum: float, quantiles: List[float]) -> Dict[str, Any]:
+    return {
+        "count": count,
+        "mean": score_sum / count if count else None,
+        "min": digest.min if count else None,
+        "max": digest.max if count else None,
+        "quantiles": {f"p{q * 100:g}": digest.quantile(q) for q in quantiles}
+    }
+
+
+def score_distribution(session: Session, disease: str, start: date, end: date,
+                       risk_bucket: Optional[RiskBucket] = None, model_version: Optional[str] = None,
+                       quantiles: Iterable[float] = (0.5, 0.9), bins: int = 10,
+                       interval: Optional[str] = None) -> Dict[str, Any]:
+    """Merged distribution of risk_score for days in [start, end), optionally with one summary per period"""
+    quantiles = list(quantiles)
+    statement = select(
+        RiskScoreSketch.day, RiskScoreSketch.count, RiskScoreSketch.score_sum, RiskScoreSketch.digest
+    ).where(RiskScoreSketch.disease == disease, RiskScoreSketch.day >= start, RiskScoreSketch.day < end)
+    if risk_bucket is not None:
+        statement = statement.where(RiskScoreSketch.risk_bucket == risk_bucket)
+    if model_version:
+        statement = statement.where(RiskScoreSketch.model_version == model_version)
+
+    overall = TDigest(settings.RISK_SKETCH_COMPRESSION)
+    count, score_sum = 0, 0.0
+    periods: Dict[date, Tuple[TDigest, List[float]]] = {}
+    for row in session.execute(statement):
+        digest = TDigest.from_bytes(row.digest)
+        overall.merge(digest)
+        count += row.count
+        score_sum += row.score_sum
+        if interval:
+            period, totals = periods.setdefault(
+                _period(row.day, interval), (TDigest(settings.RISK_SKETCH_COMPRESSION), [0, 0.0])
+            )
+            period.merge(digest)
+            totals[0] += row.count
+            totals[1] += row.score_sum
+
+    # Scores are probabilities, so bins split [0, 1] evenly
+    edges = [i / bins for i in range(bins + 1)]
+    cumulative = [0.0] + [overall.cdf(edge) * count if count else 0.0 for edge in edges[1:-1]] + [float(count)]
+    result = {
+        "disease": disease,
+        "from": start,
+        "to": end,
+        "risk_bucket": risk_bucket,
+        "model_version": model_version,
+        **_summary(overall, count, score_sum, quantiles),
+        "histogram": [
+            {"lower": edges[i], "upper": edges[i + 1], "count": round(cumulative[i + 1] - cumulative[i])}
+            for i in range(bins)
+        ]
+    }
+    if interval:
+        result["series"] = [
+            {"period": period, **_summary(digest, int(totals[0]), totals[1], quantiles)}
+            for period, (digest, totals) in sorted(periods.items())
+        ]
+    return result
@@ -0,0 +1,152 @@
+"""
+Merging t-digest (Dunning & Ertl) for streaming quantile estimates.
+
+A digest summarizes any number of values as at most about `compression`
+weighted centroids, small near the tails and larger in the middle (the k1
+arcsine scale function), so extreme quantiles stay accurate. Digests of
+disjoint sets merge into a digest of their union, which is what lets daily
+sketches be stored once and combined for any date range.
+
+to_bytes/from_bytes give a compact encoding: a fixed header with the
+compression, count bounds and centroid count, then float32 means and
+float64 weights.
+"""
+import math
+import struct
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Tuple
+
+_HEADER = struct.Struct("<BdddI")  # format, compression, min, max, centroids
+_FORMAT = 1
+
+
+class TDigest:
+    def __init__(self, compression: float = 100.0):
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer: List[Tuple[float, float]] = []
+
+    def add(self, value: float, weight: float = 1.0):
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= 5 * self.compression:
+            self.compress()
+
+    def update(self, values: Iterable[float]):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "TDigest"):
+        """Fold another digest's centroids into this one"""
+        other.compress()
+        if not other.count:
+            return
+        self._buffer.extend(zip(other.means, other.weights))
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self._buffer) >= 5 * self.compression:
+            self.compress()
+
+    def _max_q(self, q: float) -> float:
+        """Largest cumulative fraction a centroid starting at q may reach (k1 scale, one unit of k)"""
+        k = self.compression / (2 * math.pi) * math.asin(2 * q - 1) + 1
+        k = min(k, self.compression / 4)
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def compress(self):
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = sum(weight for _, weight in items)
+        means, weights = [], []
+        mean, weight = items[0]
+        below = 0.0
+        limit = self._max_q(0.0) * total
+        for next_mean, next_weight in items[1:]:
+            if below + weight + next_weight <= limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                below += weight
+                limit = self._max_q(below / total) * total
+                mean, weight = next_mean, next_weight
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights = means, weights
+
+    def _points(self) -> Tuple[List[float], List[float]]:
+        """(value, cumulative weight) knots: min, each centroid's center, max"""
+        self.compress()
+        xs, cs = [self.min], [0.0]
+        below = 0.0
+        for mean, weight in zip(self.means, self.weights):
+            xs.append(mean)
+            cs.append(below + weight / 2)
+            below += weight
+        xs.append(self.max)
+        cs.append(below)
+        return xs, cs
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        xs, cs = self._points()
+        target = q * self.count
+        i = bisect_right(cs, target)
+        if i >= len(cs):
+            return self.max
+        span = cs[i] - cs[i - 1]
+        if span <= 0:
+            return xs[i]
+        return xs[i - 1] + (xs[i] - xs[i - 1]) * (target - cs[i - 1]) / span
+
+    def cdf(self, value: float) -> Optional[float]:
+        """Estimated fraction of values <= value"""
+        if not self.count:
+            return None
+        if value < self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+        xs, cs = self._points()
+        i = bisect_right(xs, value)
+        span = xs[i] - xs[i - 1]
+        if span <= 0:
+            return cs[i] / self.count
+        return (cs[i - 1] + (cs[i] - cs[i - 1]) * (value - xs[i - 1]) / span) / self.count
+
+    def to_bytes(self) -> bytes:
+        self.compress()
+        n = len(self.means)
+        return (
+            _HEADER.pack(_FORMAT, self.compression, self.min, self.max, n)
+            + struct.pack(f"<{n}f", *self.means)
+            + struct.pack(f"<{n}d", *self.weights)
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        version, compression, low, high, n = _HEADER.unpack_from(data)
+        if version != _FORMAT:
+            raise ValueError(f"Unknown t-digest format {version}")
+        digest = cls(compression)
+        offset = _HEADER.size
+        digest.means = list(struct.unpack_from(f"<{n}f", data, offset))
+        digest.weights = list(struct.unpack_from(f"<{n}d", data, offset + 4 * n))
+        digest.count = sum(digest.weights)
+        digest.min, digest.max = low, high
+        return digest
@@ -0,0 +1,205 @@
+"""
+Per-patient risk history.
+
+latest_risks holds each patient's most recent assessment per disease. It is
+updated right after a submission is scored (record_latest_risk), so the
+summary part of a timeline is one primary key lookup. rebuild_latest_risks
+recomputes it from risk_assessments for backfills and repairs.
+
+The score history reads the patient's submissions through the
+(user_id, submitted_at) index, keeps one point per submission (its most
+recent scoring, if it was rescored) and, when a disease has more points
+than requested, downsamples it with Largest-Triangle-Three-Buckets. LTTB
+keeps the first and last points and, per bucket, the point that best
+preserves the shape of the curve, so spikes survive downsampling.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+
+import structlog
+from sqlalchemy import DateTime, delete, func, insert, literal, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlmodel import Session
+
+from app.models import LatestRisk, RiskAssessment, SurveySubmission
+
+logger = structlog.get_logger()
+
+
+def record_latest_risk(session: Session, user_id: UUID, risk: RiskAssessment, submitted_at: datetime):
+    """Point latest_risks at this assessment unless a later submission is already recorded"""
+    table = LatestRisk.__table__
+    key = (table.c.user_id == user_id, table.c.disease == risk.disease)
+    values = {
+        "risk_id": risk.id,
+        "survey_id": risk.survey_id,
+        "risk_score": risk.risk_score,
+        "risk_bucket": risk.risk_bucket,
+        "model_version": risk.model_version,
+        "submitted_at": submitted_at,
+        "predicted_at": risk.predicted_at,
+        "updated_at": datetime.utcnow()
+    }
+    try:
+        for _ in range(2):
+            result = session.execute(update(table).where(*key, table.c.submitted_at <= submitted_at).values(**values))
+            if result.rowcount or session.execute(select(table.c.risk_id).where(*key)).first() is not None:
+                session.commit()
+                return
+            try:
+                session.execute(insert(table).values(user_id=user_id, disease=risk.disease, **values))
+                session.commit()
+                return
+            except IntegrityError:
+                # A concurrent submission inserted the row first; compare against it
+                session.rollback()
+    except SQLAlchemyError as e:
+        # Derived data: the assessment itself is stored; a rebuild repairs this
+        session.rollback()
+        logger.error("Latest risk not recorded", user_id=str(user_id), disease=risk.disease, error=str(e))
+
+
+def rebuild_latest_risks(bind: Engine, user_id: Optional[UUID] = None) -> int:
+    """Recompute latest_risks from all assessments (or one patient's); returns rows written"""
+    ranked = (
+        select(
+            SurveySubmission.user_id,
+            RiskAssessment.disease,
+            RiskAssessment.id.label("risk_id"),
+            RiskAssessment.survey_id,
+            RiskAssessment.risk_score,
+            RiskAssessment.risk_bucket,
+            RiskAssessment.model_version,
+            SurveySubmission.submitted_at,
+            RiskAssessment.predicted_at,
+            func.row_number().over(
+                partition_by=(SurveySubmission.user_id, RiskAssessment.disease),
+                order_by=(SurveySubmission.submitted_at.desc(), RiskAssessment.predicted_at.desc())
+            ).label("position")
+        )
+        .join(SurveySubmission, SurveySubmission.id == RiskAssessment.survey_id)
+        .where(SurveySubmission.user_id.is_not(None), SurveySubmission.submitted_at.is_not(None))
+    )
+    if user_id is not None:
+        ranked = ranked.where(SurveySubmission.user_id == user_id)
+    ranked = ranked.subquery()
+
+    table = LatestRisk.__table__
+    columns = ["user_id", "disease", "risk_id", "survey_id", "risk_score", "risk_bucket",
+               "model_version", "submitted_at", "predicted_at"]
+    with bind.begin() as conn:
+        conn.execute(delete(table) if user_id is None else delete(table).where(table.c.user_id == user_id))
+        result = conn.execute(
+            insert(table).from_select(
+                columns + ["updated_at"],
+                select(*(ranked.c[name] for name in columns), literal(datetime.utcnow(), DateTime)).where(ranked.c.position == 1)
+            )
+        )
+    return result.rowcount
+
+
+def lttb(points: Sequence[Dict[str, Any]], threshold: int, x: str = "t", y: str = "score") -> List[Dict[str, Any]]:
+    """Downsample points (sorted by x) to at most threshold, keeping the first and last"""
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+
+    xs = [p[x].timestamp() if isinstance(p[x], datetime) else float(p[x]) for p in points]
+    ys = [float(p[y]) for p in points]
+    sampled = [points[0]]
+    every = (count - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, count)
+        span = max(1, next_end - next_start)
+        avg_x = sum(xs[next_start:next_end]) / span if next_end > next_start else xs[-1]
+        avg_y = sum(ys[next_start:next_end]) / span if next_end > next_start else ys[-1]
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def get_latest_risks(session: Session, user_id: UUID) -> List[LatestRisk]:
+    return session.execute(
+        select(LatestRisk).where(LatestRisk.user_id == user_id).order_by(LatestRisk.disease)
+    ).scalars().all()
+
+
+def get_risk_history(session: Session, user_id: UUID, disease: Optional[str] = None,
+                     start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """One point per submission, per disease, in submission order"""
+    statement = (
+        select(
+            SurveySubmission.id.label("survey_id"),
+            SurveySubmission.submitted_at,
+            RiskAssessment.id.label("risk_id"),
+            RiskAssessment.disease,
+            RiskAssessment.risk_score,
+            RiskAssessment.risk_bucket,
+            RiskAssessment.model_version
+        )
+        .join(RiskAssessment, RiskAssessment.survey_id == SurveySubmission.id)
+        .where(SurveySubmission.user_id == user_id, SurveySubmission.submitted_at.is_not(None))
+        .order_by(SurveySubmission.submitted_at, RiskAssessment.predicted_at)
+    )
+    if disease:
+        statement = statement.where(RiskAssessment.disease == disease)
+    if start:
+        statement = statement.where(SurveySubmission.submitted_at >= start)
+    if end:
+        statement = statement.where(SurveySubmission.submitted_at < end)
+
+    series: Dict[str, Dict[UUID, Dict[str, Any]]] = {}
+    for row in session.execute(statement):
+        # Later (re)scorings of the same submission replace earlier ones
+        series.setdefault(row.disease, {})[row.survey_id] = {
+            "t": row.submitted_at,
+            "score": row.risk_score,
+            "bucket": row.risk_bucket,
+            "risk_id": row.risk_id,
+            "model_version": row.model_version
+        }
+    return {name: list(points.values()) for name, points in series.items()}
+
+
+def build_timeline(session: Session, user_id: UUID, disease: Optional[str] = None,
+                   start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   max_points: int = 200) -> Dict[str, Any]:
+    latest = get_latest_risks(session, user_id)
+    if disease:
+        latest = [row for row in latest if row.disease == disease]
+    history = get_risk_history(session, user_id, disease, start, end)
+    return {
+        "user_id": user_id,
+        "latest": {
+            row.disease: {
+                "risk_id": row.risk_id,
+                "score": row.risk_score,
+                "bucket": row.risk_bucket,
+                "model_version": row.model_version,
+                "submitted_at": row.submitted_at
+            }
+            for row in latest
+        },
+        "series": {
+            name: {
+                "total": len(points),
+                "downsampled": len(points) > max_points,
+                "points": lttb(points, max_points)
+            }
+            for name, points in history.items()
+        }
+    }
@@ -0,0 +1,281 @@
+"""
+Bulk import of user accounts from CSV or NDJSON.
+
+Input is consumed line by line, so a file of any size is never held in
+memory. CSV needs a header row naming the columns (email, password and
+optionally role, full_name, sex, birth_date); NDJSON has one object with
+the same keys per line. Records are validated as they arrive and buffered
+into batches. Each batch is checked for emails that already exist, its
+passwords are hashed on a process pool spread over all cores, and the
+users and patient profiles are written with two multi-row INSERTs and one
+commit.
+
+Bad lines and duplicate emails (already registered, or repeated in the
+input) are reported with their line number and skipped; the rest of the
+import carries on.
+"""
+import csv
+import json
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, Union
+from uuid import uuid4
+
+import structlog
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.security import hash_passwords
+from app.models import User, PatientProfile, UserRole, UserStatus
+from app.schemas import UserImportRecord
+from app.services.cohorts import sync_patient_dimension
+from app.services.user_search import sync_user_search
+
+logger = structlog.get_logger()
+
+IMPORT_FORMATS = ("csv", "ndjson")
+IMPORTABLE_ROLES = {UserRole.PATIENT, UserRole.PROVIDER}
+
+USERS_IMPORTED = registry.counter("users_imported_total", "Lines processed by bulk user import", ["outcome"])
+
+_hash_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_hash_executor() -> Optional[Executor]:
+    """Process pool for bcrypt, created on first use (None hashes on the calling thread)"""
+    global _hash_executor
+    workers = settings.USER_IMPORT_HASH_WORKERS
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 0:
+        return None
+    if _hash_executor is None:
+        # spawn, not fork: the app process has logging and metrics threads
+        _hash_executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _hash_executor
+
+
+def _reset_executor_after_fork():
+    global _hash_executor
+    _hash_executor = None
+
+
+os.register_at_fork(after_in_child=_reset_executor_after_fork)
+
+
+class ImportReport:
+    """Counts per outcome plus the lines that were not imported"""
+
+    def __init__(self, max_lines: int):
+        self.created = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.max_lines = max_lines
+        self.lines: List[Dict[str, Any]] = []
+        self.truncated = False
+
+    def problem(self, line: int, outcome: str, detail: str, email: Optional[str] = None):
+        if outcome == "duplicate":
+            self.duplicates += 1
+        else:
+            self.errors += 1
+        USERS_IMPORTED.inc(outcome=outcome)
+        if len(self.lines) < self.max_lines:
+            self.lines.append({"line": line, "email": email, "status": outcome, "detail": detail})
+        else:
+            self.truncated = True
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "created": self.created,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "lines": self.lines,
+            "truncated": self.truncated
+        }
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'record'}: {item['msg']}" for item in error.errors()
+    )
+
+
+class UserImporter:
+    """Validates records as they are fed in and writes them in batches"""
+
+    def __init__(self, session: Session, import_format: str, executor: Optional[Executor] = None,
+                 batch_size: Optional[int] = None):
+        if import_format not in IMPORT_FORMATS:
+            raise ValueError(f"Unknown import format: {import_format}")
+        self.session = session
+        self.format = import_format
+        self.executor = executor
+        self.batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+        self.report = ImportReport(settings.USER_IMPORT_MAX_REPORTED_LINES)
+        self.line_number = 0
+        self.pending: List[Tuple[int, UserImportRecord]] = []
+        self._header: Optional[List[str]] = None
+        self._seen: Set[str] = set()
+
+    def _parse(self, text: str) -> Optional[Dict[str, Any]]:
+        if self.format == "ndjson":
+            record = json.loads(text)
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+            return record
+        values = next(csv.reader([text]))
+        if self._header is None:
+            self._header = [name.strip().lower() for name in values]
+            if "email" not in self._header or "password" not in self._header:
+                raise ValueError("CSV header must name the email and password columns")
+            return None
+        if len(values) != len(self._header):
+            raise ValueError(f"expected {len(self._header)} columns, got {len(values)}")
+        return {name: value for name, value in zip(self._header, values) if value != ""}
+
+    def feed(self, line: Union[str, bytes]) -> bool:
+        """Validate one input line; returns True once a batch is ready to flush"""
+        self.line_number += 1
+        try:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8-sig" if self.line_number == 1 else "utf-8")
+            text = line.strip()
+            if not text:
+                return False
+            data = self._parse(text)
+            if data is None:
+                return False
+            record = UserImportRecord.model_validate(data)
+        except ValidationError as e:
+            self.report.problem(self.line_number, "error", _validation_message(e))
+            return False
+        except (ValueError, UnicodeDecodeError) as e:
+            self.report.problem(self.line_number, "error", str(e))
+            return False
+
+        if record.role not in IMPORTABLE_ROLES:
+            self.report.problem(self.line_number, "error", f"role {record.role.value} can't be imported", record.email)
+            return False
+        if record.email.lower() in self._seen:
+            self.report.problem(self.line_number, "duplicate", "email repeated in the import", record.email)
+            return False
+        self._seen.add(record.email.lower())
+        self.pending.append((self.line_number, record))
+        return len(self.pending) >= self.batch_size
+
+    def _hash(self, passwords: List[str]) -> List[str]:
+        if self.executor is None:
+            return hash_passwords(passwords)
+        workers = getattr(self.executor, "_max_workers", 1)
+        size = max(1, -(-len(passwords) // workers))
+        chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+        return [hashed for chunk in self.executor.map(hash_passwords, chunks) for hashed in chunk]
+
+    def _existing_emails(self, emails: List[str]) -> Set[str]:
+        """Lowercased emails among these that are already registered"""
+        rows = self.session.exec(select(User.email).where(User.email.in_(emails))).all()
+        return {email.lower() for email in rows}
+
+    def flush(self):
+        """Hash and insert the pending batch"""
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        existing = self._existing_emails([record.email for _, record in batch])
+        new = []
+        for line, record in batch:
+            if record.email.lower() in existing:
+                self.report.problem(line, "duplicate", "email already registered", record.email)
+            else:
+                new.append((line, record))
+        if not new:
+            return
+
+        hashed = self._hash([record.password for _, record in new])
+        now = datetime.utcnow()
+        users, profiles = [], []
+        for (line, record), password_hash in zip(new, hashed):
+            user_id = uuid4()
+            users.append({
+                "id": user_id,
+                "email": record.email,
+                "password_hash": password_hash,
+                "role": record.role,
+                "status": UserStatus.ACTIVE,
+                "created_at": now
+            })
+            if record.role == UserRole.PATIENT:
+                profiles.append({
+                    "user_id": user_id,
+                    "full_name": record.full_name,
+                    "sex": record.sex,
+                    "birth_date": record.birth_date,
+                    "updated_at": now
+                })
+
+        try:
+            self.session.execute(insert(User), users)
+            if profiles:
+                self.session.execute(insert(PatientProfile), profiles)
+                sync_patient_dimension(self.session, [profile["user_id"] for profile in profiles])
+            sync_user_search(self.session, [user["id"] for user in users])
+            self.session.commit()
+        except IntegrityError:
+            # Someone registered one of these emails since the check; find
+            # which, report them, and insert the rest
+            self.session.rollback()
+            taken = self._existing_emails([user["email"] for user in users])
+            if not taken:
+                raise
+            self.pending = [(line, record) for line, record in new if record.email.lower() not in taken]
+            for line, record in new:
+                if record.email.lower() in taken:
+                    self.report.problem(line, "duplicate", "email already registered", record.email)
+            self.flush()
+            return
+
+        self.report.created += len(users)
+        USERS_IMPORTED.inc(len(users), outcome="created")
+        logger.info("User import batch written", users=len(users), profiles=len(profiles))
+
+    def finish(self) -> Dict[str, Any]:
+        self.flush()
+        summary = self.report.as_dict()
+        logger.info(
+            "User import finished",
+            lines=self.line_number,
+            created=summary["created"],
+            duplicates=summary["duplicates"],
+            errors=summary["errors"]
+        )
+        return summary
+
+
+def import_lines(importer: UserImporter, lines: Iterable[Union[str, bytes]]) -> Dict[str, Any]:
+    """Run an import over an iterable of lines (e.g. an open file)"""
+    for line in lines:
+        if importer.feed(line):
+            importer.flush()
+    return importer.finish()
+
+
+async def import_chunks(importer: UserImporter, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """Run an import over a streamed request body, writing batches on a worker thread"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if importer.feed(line):
+                await run_in_threadpool(importer.flush)
+    if buffer:
+        importer.feed(buffer)
+    return await run_in_threadpool(importer.finish)
@@ -0,0 +1,193 @@
+"""
+Admin user search by email or name.
+
+Every user has a row in user_search_documents holding the tokens of their
+email and full name, normalized the same way as queries: Unicode NFKC,
+case folded, Arabic diacritics (tashkeel) and tatweel removed, alef and
+hamza forms unified (أ إ آ ٱ → ا, ؤ → و, ئ → ي), ى → ي and ة → ه, and
+Arabic-Indic digits mapped to 0-9. So "أحمد" finds "احمد" and "مُحَمَّد"
+finds "محمد". The row is rewritten in the same transaction as any change
+to the user's email or profile (sync_user_search).
+
+The table is indexed by the database's own text search: an FTS5 table on
+SQLite and a full-text index on SQL Server. Each query token is matched
+as a word prefix and all tokens must match; results are ranked by the
+engine's relevance (bm25 on SQLite, RANK on SQL Server). Other databases
+fall back to LIKE on the document, which scans. Only the best
+USER_SEARCH_MAX_RESULTS matches are counted and paged through, so a very
+short prefix can't make a request return every user; pages past it are
+empty.
+"""
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import structlog
+from sqlalchemy import and_, column, delete, func, insert, literal, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Selectable
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models import PatientProfile, User, UserSearchDocument
+
+logger = structlog.get_logger()
+
+# Longest query honoured, in tokens
+MAX_QUERY_TOKENS = 8
+# Users per statement when syncing or rebuilding
+SYNC_CHUNK = 500
+
+# Harakat, Quranic marks and tatweel
+_TASHKEEL = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06dc\u06df-\u06e8\u06ea-\u06ed\u0640]")
+_FOLD = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ؤ": "و", "ئ": "ي", "ى": "ي", "ة": "ه",
+    **{chr(0x0660 + d): str(d) for d in range(10)},
+    **{chr(0x06F0 + d): str(d) for d in range(10)}
+})
+# Letters and digits; underscores and punctuation separate tokens, as in FTS5's unicode61
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def normalize(value: str) -> str:
+    """Fold case, Arabic diacritics and letter variants so spellings compare equal"""
+    value = unicodedata.normalize("NFKC", value).casefold()
+    return _TASHKEEL.sub("", value).translate(_FOLD)
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    return _TOKEN.findall(normalize(value)) if value else []
+
+
+def search_document(email: str, full_name: Optional[str]) -> str:
+    return " ".join(tokenize(email) + tokenize(full_name))
+
+
+# Backends: each turns query tokens into a selectable of (user_id, rank),
+# higher rank first
+
+def _fts5_matches(tokens: List[str]) -> Selectable:
+    return text(
+        "SELECT d.user_id AS user_id, -bm25(user_search_fts) AS rank "
+        "FROM user_search_fts JOIN user_search_documents d ON d.id = user_search_fts.rowid "
+        "WHERE user_search_fts MATCH :query"
+    ).bindparams(query=" ".join(f'"{token}"*' for token in tokens)).columns(
+        column("user_id"), column("rank")
+    ).subquery("matches")
+
+
+def _fulltext_matches(tokens: List[str]) -> Selectable:
+    return text(
+        "SELECT d.user_id AS user_id, ft.[RANK] AS rank "
+        "FROM CONTAINSTABLE(user_search_documents, document, :query) AS ft "
+        "JOIN user_search_documents d ON d.id = ft.[KEY]"
+    ).bindparams(query=" AND ".join(f'"{token}*"' for token in tokens)).columns(
+        column("user_id"), column("rank")
+    ).subquery("matches")
+
+
+def _like_matches(tokens: List[str]) -> Selectable:
+    document = UserSearchDocument.document
+    return select(UserSearchDocument.user_id, literal(0.0).label("rank")).where(and_(*(
+        or_(document.like(f"{token}%"), document.like(f"% {token}%")) for token in tokens
+    ))).subquery("matches")
+
+
+SEARCH_BACKENDS: Dict[str, Callable[[List[str]], Selectable]] = {
+    "sqlite": _fts5_matches,
+    "mssql": _fulltext_matches
+}
+
+
+def search_users(session: Session, query: str, role: Optional[str] = None, status: Optional[str] = None,
+                 page: int = 1, per_page: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+    """One page of users matching every token of query as a word prefix, best first, and the capped total"""
+    tokens = tokenize(query)[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return [], 0
+    backend = SEARCH_BACKENDS.get(session.get_bind().dialect.name, _like_matches)
+    matches = backend(tokens)
+
+    statement = select(User.id, User.email, matches.c.rank).select_from(matches).join(User, User.id == matches.c.user_id)
+    if role:
+        statement = statement.where(User.role == role)
+    if status:
+        statement = statement.where(User.status == status)
+
+    # Only the best USER_SEARCH_MAX_RESULTS matches are kept (a query matching
+    # more should be narrowed). They are counted, ordered and paged in one
+    # statement; the page's details are then read by primary key
+    found = statement.order_by(matches.c.rank.desc(), User.email).limit(settings.USER_SEARCH_MAX_RESULTS).subquery()
+    page_rows = session.execute(
+        select(found.c.id, found.c.rank, func.count().over().label("total"))
+        .order_by(found.c.rank.desc(), found.c.email)
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+    ).all()
+    if not page_rows:
+        total = session.execute(select(func.count()).select_from(found)).scalar_one() if page > 1 else 0
+        return [], total
+    ranks = {row.id: row.rank for row in page_rows}
+
+    rows = session.execute(
+        select(
+            User.id, User.email, User.role, User.status, User.created_at,
+            PatientProfile.full_name, PatientProfile.sex, PatientProfile.birth_date
+        )
+        .outerjoin(PatientProfile, PatientProfile.user_id == User.id)
+        .where(User.id.in_(list(ranks)))
+    ).all()
+    details = {row.id: dict(row._mapping, rank=ranks[row.id]) for row in rows}
+    return [details[user_id] for user_id in ranks if user_id in details], page_rows[0].total
+
+
+def _documents(conn, user_ids: List[UUID]) -> List[Dict[str, Any]]:
+    now = datetime.utcnow()
+    rows = conn.execute(
+        select(User.id, User.email, PatientProfile.full_name)
+        .outerjoin(PatientProfile, PatientProfile.user_id == User.id)
+        .where(User.id.in_(user_ids))
+    ).all()
+    return [
+        {"user_id": row.id, "document": search_document(row.email, row.full_name)[:1000], "updated_at": now}
+        for row in rows
+    ]
+
+
+def _write_documents(conn, user_ids: List[UUID]) -> int:
+    table = UserSearchDocument.__table__
+    documents = _documents(conn, user_ids)
+    conn.execute(delete(table).where(table.c.user_id.in_(user_ids)))
+    if documents:
+        conn.execute(insert(table), documents)
+    return len(documents)
+
+
+def sync_user_search(session: Session, user_ids: Iterable[UUID]):
+    """Rewrite these users' search documents; committed with the caller's transaction"""
+    user_ids = list(user_ids)
+    session.flush()
+    for start in range(0, len(user_ids), SYNC_CHUNK):
+        _write_documents(session, user_ids[start:start + SYNC_CHUNK])
+
+
+def rebuild_user_search(bind: Engine) -> int:
+    """Recompute every user's search document; returns rows written"""
+    written = 0
+    last_id = None
+    with bind.begin() as conn:
+        conn.execute(delete(UserSearchDocument.__table__))
+        while True:
+            statement = select(User.id).order_by(User.id).limit(SYNC_CHUNK)
+            if last_id is not None:
+                statement = statement.where(User.id > last_id)
+            user_ids = conn.execute(statement).scalars().all()
+            if not user_ids:
+                break
+            written += _write_documents(conn, user_ids)
+            last_id = user_ids[-1]
+    logger.info("User search documents rebuilt", rows=written)
+    return written
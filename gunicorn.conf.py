@@ -0,0 +1,52 @@
+"""
+Gunicorn settings for multi-worker deployments:
+
+    gunicorn app.main:app -c gunicorn.conf.py
+
+WEB_CONCURRENCY sets the worker count (default: one per CPU) and is also
+what app.database uses to split DB_MAX_CONNECTIONS into per-worker pools.
+The app is preloaded in the master so workers share its imported code
+copy-on-write; each worker creates its own database engine, log writer and
+metrics flusher after the fork. Metrics from all workers are merged through
+METRICS_MULTIPROC_DIR, which is cleared when the master starts; the
+counters of a worker that exits are folded into one totals file there.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+workers = int(os.environ.setdefault("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = None
+
+if workers > 1:
+    os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "healthbeat-metrics"))
+
+
+def on_starting(server):
+    directory = os.environ.get("METRICS_MULTIPROC_DIR")
+    if directory and os.path.isdir(directory):
+        for pattern in ("metrics-*.json", "exited.json"):
+            for path in glob.glob(os.path.join(directory, pattern)):
+                os.remove(path)
+
+
+def post_fork(server, worker):
+    # app.database, app.core.logging and app.core.metrics reset their
+    # per-process state through os.register_at_fork; this only logs it.
+    server.log.info("Worker %s forked", worker.pid)
+
+
+def child_exit(server, worker):
+    directory = os.environ.get("METRICS_MULTIPROC_DIR")
+    if directory:
+        from app.core.metrics import MultiprocessStore
+        MultiprocessStore(directory).retire(worker.pid)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark and regression gate for the risk scoring hot path.
+
+Measures ns/op and memory per call for calculate_risk (per disease and
+input profile) and for the recommendation generators, using seeded
+synthetic payloads. With --baseline, exits 1 when any case got slower or
+allocates more than --tolerance allows.
+
+    python scripts/bench_scoring.py --save bench_baseline.json
+    python scripts/bench_scoring.py --baseline bench_baseline.json --tolerance 0.15
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Any, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import DISEASES, survey_payload
+from app.services.risk_calculator import (
+    calculate_risk, generate_diabetes_recommendations,
+    generate_hypertension_recommendations, generate_heart_recommendations
+)
+
+# Input profiles: keyword arguments for the synthetic generators
+PROFILES = {
+    "typical": {},
+    "sparse": {"missing_rate": 0.5},
+    "unknown_labs": {"unknown_rate": 1.0},
+    "many_readings": {"max_readings": 7}
+}
+
+RECOMMENDATION_GENERATORS = {
+    "diabetes": generate_diabetes_recommendations,
+    "hypertension": generate_hypertension_recommendations,
+    "heart": generate_heart_recommendations
+}
+
+
+def _profile_kwargs(disease: str, profile: str) -> Dict[str, Any]:
+    """Drop profile options the disease's generator does not take"""
+    kwargs = dict(PROFILES[profile])
+    if disease == "hypertension":
+        kwargs.pop("unknown_rate", None)
+    else:
+        kwargs.pop("max_readings", None)
+    return kwargs
+
+
+def build_cases(seed: int, inputs: int) -> List[Tuple[str, Callable, List[Tuple]]]:
+    """(name, function, argument tuples) for every benchmarked case"""
+    rng = random.Random(seed)
+    cases = []
+    for disease in DISEASES:
+        for profile in PROFILES:
+            if profile == "many_readings" and disease != "hypertension":
+                continue
+            if profile == "unknown_labs" and disease == "hypertension":
+                continue
+            kwargs = _profile_kwargs(disease, profile)
+            args = [(disease, survey_payload(rng, disease, **kwargs)) for _ in range(inputs)]
+            cases.append((f"calculate_risk/{disease}/{profile}", calculate_risk, args))
+
+    for disease, generator in RECOMMENDATION_GENERATORS.items():
+        args = [(rng.random(), [], {}) for _ in range(inputs)]
+        cases.append((f"recommendations/{disease}", generator, args))
+    return cases
+
+
+def time_case(func: Callable, args: List[Tuple], repeats: int, loops: int) -> float:
+    """Best-of-repeats mean wall time per call, in nanoseconds"""
+    best = float("inf")
+    calls = len(args) * loops
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            started = time.perf_counter_ns()
+            for _ in range(loops):
+                for call_args in args:
+                    func(*call_args)
+            best = min(best, (time.perf_counter_ns() - started) / calls)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best
+
+
+def measure_memory(func: Callable, args: List[Tuple]) -> Tuple[float, float]:
+    """Mean peak traced bytes per call, and blocks still held by the results per call"""
+    tracemalloc.start()
+    try:
+        peak_total = 0
+        for call_args in args:
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            result = func(*call_args)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - current
+            del result
+
+        results = []
+        before = tracemalloc.take_snapshot()
+        for call_args in args:
+            results.append(func(*call_args))
+        after = tracemalloc.take_snapshot()
+        retained = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+        del results
+    finally:
+        tracemalloc.stop()
+    return peak_total / len(args), retained / len(args)
+
+
+def run_benchmarks(seed: int, inputs: int, repeats: int, loops: int, only: str = None) -> Dict[str, Any]:
+    results = {}
+    for name, func, args in build_cases(seed, inputs):
+        if only and only not in name:
+            continue
+        func(*args[0])  # warm up
+        ns_per_op = time_case(func, args, repeats, loops)
+        peak_bytes, retained_blocks = measure_memory(func, args)
+        results[name] = {
+            "ns_per_op": round(ns_per_op, 1),
+            "ops_per_s": round(1e9 / ns_per_op, 1) if ns_per_op else 0.0,
+            "peak_bytes_per_op": round(peak_bytes, 1),
+            "retained_blocks_per_op": round(retained_blocks, 2)
+        }
+    return {
+        "meta": {
+            "seed": seed,
+            "inputs": inputs,
+            "repeats": repeats,
+            "loops": loops,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform()
+        },
+        "results": results
+    }
+
+
+def check_regressions(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float,
+                      memory_tolerance: float) -> List[str]:
+    """Human-readable regressions of current against baseline"""
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        if before["ns_per_op"] and result["ns_per_op"] > before["ns_per_op"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: ns/op {before['ns_per_op']:.0f} -> {result['ns_per_op']:.0f} "
+                f"(+{result['ns_per_op'] / before['ns_per_op'] - 1:.1%})"
+            )
+        if before["peak_bytes_per_op"] and result["peak_bytes_per_op"] > before["peak_bytes_per_op"] * (1 + memory_tolerance):
+            regressions.append(
+                f"{name}: peak bytes/op {before['peak_bytes_per_op']:.0f} -> {result['peak_bytes_per_op']:.0f}"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the risk scoring hot path")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--inputs", type=int, default=500, help="Distinct synthetic inputs per case")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing repeats; the fastest is kept")
+    parser.add_argument("--loops", type=int, default=4, help="Passes over the inputs per repeat")
+    parser.add_argument("--only", help="Run only cases whose name contains this string")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this results file and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed ns/op increase, e.g. 0.15 for 15%%")
+    parser.add_argument("--memory-tolerance", type=float, default=0.05, help="Allowed peak bytes/op increase")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.seed, args.inputs, args.repeats, args.loops, args.only)
+
+    for name, result in current["results"].items():
+        print(f"{name:<45} {result['ns_per_op']:>10.0f} ns/op {result['peak_bytes_per_op']:>9.0f} B/op "
+              f"{result['retained_blocks_per_op']:>7.1f} blocks/op")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = check_regressions(baseline, current, args.tolerance, args.memory_tolerance)
+        if regressions:
+            print("\nRegressions:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%} (memory {args.memory_tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Worker-count benchmark: run the load test against gunicorn with 1, 2, 4...
+workers and report throughput and tail latency for each.
+
+    python scripts/bench_workers.py --workers 1,2,4,8 --duration 30 --concurrency 64
+
+Each configuration gets a fresh gunicorn (gunicorn.conf.py, preloaded app)
+on --port, is warmed up with --warmup seconds of load that are not
+recorded, and is then measured with scripts/load_test.py. The database is
+whatever the environment configures; the admin account the load test
+needs is created first if missing. Results are only meaningful on a box
+with at least as many cores as the largest worker count, with the
+database on separate hardware.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import httpx
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPTS)
+
+
+def wait_for_health(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server at {url} did not become healthy within {timeout}s")
+
+
+def run_load(url: str, args, duration: float) -> dict:
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output = f.name
+    try:
+        subprocess.run(
+            [sys.executable, os.path.join(SCRIPTS, "load_test.py"), "run",
+             "--target", url,
+             "--concurrency", str(args.concurrency),
+             "--duration", str(duration),
+             "--admin-email", args.admin_email,
+             "--admin-password", args.admin_password,
+             "-o", output],
+            check=True, cwd=PROJECT_ROOT
+        )
+        with open(output, encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+
+def summarize(workers: int, report: dict) -> dict:
+    routes = report["routes"]
+    worst = max(routes.items(), key=lambda item: item[1]["p99_ms"]) if routes else (None, {})
+    return {
+        "workers": workers,
+        "throughput_rps": report["totals"]["throughput_rps"],
+        "requests": report["totals"]["requests"],
+        "errors": report["totals"]["errors"],
+        "worst_p99_route": worst[0],
+        "worst_p99_ms": worst[1].get("p99_ms"),
+        "submit_p99_ms": max(
+            (stats["p99_ms"] for route, stats in routes.items() if route.startswith("POST /submissions/")),
+            default=None
+        )
+    }
+
+
+def bench(workers: int, args) -> dict:
+    url = f"http://127.0.0.1:{args.port}"
+    metrics_dir = tempfile.mkdtemp(prefix="healthbeat-metrics-")
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "BIND": f"127.0.0.1:{args.port}",
+        "METRICS_MULTIPROC_DIR": metrics_dir,
+        "RATE_LIMIT_ENABLED": os.environ.get("RATE_LIMIT_ENABLED", "false"),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING")
+    }
+    server = subprocess.Popen(
+        ["gunicorn", "app.main:app", "-c", os.path.join(PROJECT_ROOT, "gunicorn.conf.py")],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_health(url, args.startup_timeout)
+        if args.warmup > 0:
+            run_load(url, args, args.warmup)
+        return summarize(workers, run_load(url, args, args.duration))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds of load before measuring")
+    parser.add_argument("--concurrency", type=int, default=32, help="Load-test virtual users")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--admin-email", default="admin@example.com")
+    parser.add_argument("--admin-password", default="Passw0rd!")
+    parser.add_argument("-o", "--output", help="Write the JSON results here as well")
+    args = parser.parse_args()
+
+    from load_test import prepare_in_process_database
+    prepare_in_process_database(args.admin_email, args.admin_password)
+
+    results = []
+    for workers in [int(value) for value in args.workers.split(",")]:
+        results.append(bench(workers, args))
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    report = {"cpu_count": os.cpu_count(), "concurrency": args.concurrency, "duration_s": args.duration, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"{'workers':>8} {'req/s':>10} {'errors':>7} {'submit p99 ms':>14} {'worst p99 ms':>13}")
+    for row in results:
+        print(f"{row['workers']:>8} {row['throughput_rps']:>10.1f} {row['errors']:>7} "
+              f"{row['submit_p99_ms'] or 0:>14.1f} {row['worst_p99_ms'] or 0:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Export risk assessments to Parquet, partitioned by disease and month.
+
+Only assessments newer than the watermark left by the previous run are
+exported; pass --full to export everything again. Requires pyarrow.
+
+    python scripts/export_parquet.py --output ./exports/assessments
+"""
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.database import engine
+from app.services.parquet_export import export_parquet, ROW_GROUP_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help="Dataset root directory")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE,
+                        help="Rows per Parquet row group (bounds memory per open partition)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per database fetch")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and export all rows")
+    args = parser.parse_args()
+
+    summary = export_parquet(
+        engine,
+        args.output,
+        row_group_size=args.row_group_size,
+        chunk_size=args.chunk_size,
+        full=args.full
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
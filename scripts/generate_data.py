@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Generate a production-sized synthetic dataset: users, patient profiles,
+drafts, submissions, risk assessments with their disease details,
+recommendations and analytics events.
+
+    python scripts/generate_data.py --users 200000 --workers 8 --seed 7
+    python scripts/generate_data.py --users 1000 --config distributions.json --db sqlite:///./big.db
+
+With the default distributions each user accounts for about 50 rows
+(most of them analytics events), so --users 200000 loads roughly 10M rows.
+Users are generated in shards of --shard-size. Each shard has its own
+random stream derived from --seed, so for a given shard size the data does
+not depend on --workers. Every worker process generates whole shards and
+writes them with Core multi-row inserts on its own connection. SQLite is
+switched to WAL with synchronous=OFF for the load, and its writers take
+turns while the other workers keep generating.
+
+Survey answers come from scripts/synthetic.py and are scored with the
+rule-based calculators, so risk buckets and recommendations match the
+answers. All synthetic users share the password given by --password,
+hashed once. --config takes a JSON object overriding any field of
+Distribution.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, event, insert, select
+from sqlmodel import SQLModel, Session
+
+from app.core.security import get_password_hash
+from app.crud import create_assessment_types, draft_expiry, DISEASE_ASSESSMENT_BUILDERS
+from app.models import AssessmentType, Priority, RiskBucket, UserRole, UserStatus
+from app.services.cohorts import rebuild_patient_dimension
+from app.services.event_sketches import rebuild_event_sketches, rebuild_funnel
+from app.services.risk_calculator import calculate_rule_based_risk
+from app.services.risk_sketches import rebuild_risk_sketches
+from app.services.timeline import rebuild_latest_risks
+from app.services.user_search import rebuild_user_search
+from synthetic import survey_payload, partial_payload
+
+FIRST_NAMES = ["محمد", "أحمد", "علي", "عمر", "خالد", "يوسف", "فاطمة", "مريم", "نورة", "سارة", "هند", "ليلى"]
+LAST_NAMES = ["العلي", "الأحمد", "الحربي", "القحطاني", "الشمري", "الزهراني", "العتيبي", "المطيري", "الدوسري"]
+
+
+@dataclass
+class Distribution:
+    """Shape of the generated data; every field can be overridden with --config"""
+    # Share of accounts per role; the remainder are admins
+    patient_fraction: float = 0.96
+    provider_fraction: float = 0.035
+    suspended_fraction: float = 0.01
+    profile_fill_rate: float = 0.7  # patients with name/sex/birth date filled in
+    # Poisson means per registered user
+    submissions_per_user: float = 2.5
+    abandoned_drafts_per_user: float = 0.8
+    anonymous_submissions_per_user: float = 0.4  # sessions that never register
+    draft_saves_per_submission: float = 3.0
+    risk_view_rate: float = 0.85
+    recommendation_view_rate: float = 0.4
+    page_views_per_session: float = 2.0
+    disease_weights: Dict[str, float] = field(
+        default_factory=lambda: {"diabetes": 0.45, "hypertension": 0.35, "heart": 0.2}
+    )
+    # Survey answers
+    missing_rate: float = 0.1
+    unknown_rate: float = 0.2
+    max_bp_readings: int = 3
+    # Activity spread over this many days before --end
+    days: int = 365
+
+
+def poisson(rng: random.Random, mean: float) -> int:
+    """Knuth's method; fine for the small means used here"""
+    if mean <= 0:
+        return 0
+    limit, count, product = math.exp(-mean), 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def rng_uuid(rng: random.Random) -> UUID:
+    return UUID(int=rng.getrandbits(128), version=4)
+
+
+class ShardBuilder:
+    """Builds the rows of one shard of users from its own random stream"""
+
+    def __init__(self, first_user: int, seed: int, dist: Distribution, type_ids: Dict[str, UUID],
+                 password_hash: str, end: datetime):
+        self.rng = random.Random(f"{seed}:{first_user}")
+        self.dist = dist
+        self.type_ids = type_ids
+        self.password_hash = password_hash
+        self.end = end
+        self.diseases = list(dist.disease_weights)
+        self.disease_weights = [dist.disease_weights[name] for name in self.diseases]
+        self.rows: Dict[str, List[Dict[str, Any]]] = {}
+
+    def add(self, table: str, row: Dict[str, Any]):
+        self.rows.setdefault(table, []).append(row)
+
+    def when(self, after: Optional[datetime] = None) -> datetime:
+        start = after or self.end - timedelta(days=self.dist.days)
+        span = max(1.0, (self.end - start).total_seconds())
+        return start + timedelta(seconds=self.rng.random() * span)
+
+    def payload(self, disease: str) -> Dict[str, Any]:
+        kwargs = {"missing_rate": self.dist.missing_rate}
+        if disease == "hypertension":
+            kwargs["max_readings"] = self.dist.max_bp_readings
+        else:
+            kwargs["unknown_rate"] = self.dist.unknown_rate
+        return survey_payload(self.rng, disease, **kwargs)
+
+    def event(self, user_id: Optional[UUID], session_id: str, event_type: str, at: datetime,
+              payload: Optional[Dict[str, Any]] = None):
+        self.add("analytics_events", {
+            "id": rng_uuid(self.rng),
+            "user_id": user_id,
+            "session_id": session_id,
+            "event_type": event_type,
+            "payload": json.dumps(payload, ensure_ascii=False) if payload else None,
+            "created_at": at
+        })
+
+    def user(self, index: int) -> Tuple[UUID, datetime]:
+        rng, dist = self.rng, self.dist
+        user_id = rng_uuid(rng)
+        created_at = self.when()
+        draw = rng.random()
+        if draw < dist.patient_fraction:
+            role = UserRole.PATIENT
+        elif draw < dist.patient_fraction + dist.provider_fraction:
+            role = UserRole.PROVIDER
+        else:
+            role = UserRole.ADMIN
+        self.add("users", {
+            "id": user_id,
+            "email": f"user{index}@synthetic.example",
+            "password_hash": self.password_hash,
+            "role": role,
+            "status": UserStatus.SUSPENDED if rng.random() < dist.suspended_fraction else UserStatus.ACTIVE,
+            "created_at": created_at
+        })
+        if role == UserRole.PATIENT:
+            filled = rng.random() < dist.profile_fill_rate
+            self.add("patient_profiles", {
+                "user_id": user_id,
+                "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" if filled else None,
+                "sex": rng.choice("MF") if filled else None,
+                "birth_date": created_at - timedelta(days=rng.randint(18, 85) * 365) if filled else None,
+                "updated_at": created_at
+            })
+        return user_id, created_at
+
+    def session(self, user_id: Optional[UUID], after: datetime, submit: bool):
+        """One assessment session: page views, draft saves and, if submitted, the scored result"""
+        rng, dist = self.rng, self.dist
+        disease = rng.choices(self.diseases, weights=self.disease_weights)[0]
+        session_id = f"syn-{rng_uuid(rng).hex[:16]}"
+        started = self.when(after)
+        at = started
+        for _ in range(poisson(rng, dist.page_views_per_session)):
+            self.event(user_id, session_id, "page_view", at, {"page": disease})
+            at += timedelta(seconds=rng.randint(2, 60))
+
+        self.event(user_id, session_id, "assessment_started", at, {"disease": disease})
+        saves = max(1, poisson(rng, dist.draft_saves_per_submission))
+        for save in range(saves):
+            at += timedelta(seconds=rng.randint(5, 120))
+            self.event(user_id, session_id, "draft_saved", at, {"disease": disease})
+        self.add("assessment_drafts", {
+            "id": rng_uuid(rng),
+            "assessment_type_id": self.type_ids[disease],
+            "user_id": user_id,
+            "session_id": session_id,
+            "data": json.dumps(partial_payload(rng, disease, rng.uniform(0.3, 1.0)), ensure_ascii=False),
+            "last_saved_at": at,
+            "expires_at": draft_expiry(user_id, at),
+            "created_at": started,
+            "updated_at": at
+        })
+        if not submit:
+            return
+
+        data = self.payload(disease)
+        at += timedelta(seconds=rng.randint(5, 120))
+        survey_id = rng_uuid(rng)
+        self.add("survey_submissions", {
+            "id": survey_id,
+            "assessment_type_id": self.type_ids[disease],
+            "user_id": user_id,
+            "session_id": session_id,
+            "data": json.dumps(data, ensure_ascii=False),
+            "started_at": started,
+            "submitted_at": at
+        })
+        self.event(user_id, session_id, "assessment_submitted", at, {"disease": disease})
+
+        result = calculate_rule_based_risk(disease, data)
+        risk_id = rng_uuid(rng)
+        self.add("risk_assessments", {
+            "id": risk_id,
+            "survey_id": survey_id,
+            "disease": disease,
+            "model_version": result["model_version"],
+            "risk_score": result["risk_score"],
+            "risk_bucket": RiskBucket(result["risk_bucket"]),
+            "auc_at_train": result.get("auc_at_train"),
+            "predicted_at": at,
+            "created_at": at,
+            "updated_at": at
+        })
+        detail = DISEASE_ASSESSMENT_BUILDERS[disease](risk_id, result.get("clinical_data") or {})
+        self.add(detail.__tablename__, {column.name: getattr(detail, column.name) for column in detail.__table__.columns})
+        for rec in result.get("recommendations", []):
+            self.add(f"{disease}_recommendations", {
+                "id": rng_uuid(rng),
+                "user_id": user_id,
+                "risk_id": risk_id,
+                "title": rec["title"],
+                "details": rec.get("details"),
+                "priority": Priority(rec.get("priority", "med")),
+                "created_at": at,
+                "status": "open"
+            })
+
+        if rng.random() < dist.risk_view_rate:
+            at += timedelta(seconds=rng.randint(1, 30))
+            self.event(user_id, session_id, "risk_viewed", at, {"risk_id": str(risk_id)})
+            if rng.random() < dist.recommendation_view_rate:
+                self.event(user_id, session_id, "recommendation_viewed", at + timedelta(seconds=rng.randint(5, 90)))
+
+    def build(self, first_user: int, users: int) -> Dict[str, List[Dict[str, Any]]]:
+        dist = self.dist
+        for index in range(first_user, first_user + users):
+            user_id, created_at = self.user(index)
+            for _ in range(poisson(self.rng, dist.submissions_per_user)):
+                self.session(user_id, created_at, submit=True)
+            for _ in range(poisson(self.rng, dist.abandoned_drafts_per_user)):
+                self.session(user_id, created_at, submit=False)
+            for _ in range(poisson(self.rng, dist.anonymous_submissions_per_user)):
+                self.session(None, created_at, submit=True)
+        return self.rows
+
+
+# Parents before children, so foreign keys hold at every commit
+TABLE_ORDER = [
+    "users", "patient_profiles", "assessment_drafts", "survey_submissions", "risk_assessments",
+    "diabetes_assessments", "hypertension_assessments", "heart_assessments",
+    "diabetes_recommendations", "hypertension_recommendations", "heart_recommendations",
+    "analytics_events"
+]
+
+_worker_engine = None
+
+
+def make_engine(url: str):
+    engine = create_engine(url)
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _bulk_load_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.execute("PRAGMA busy_timeout=600000")
+            cursor.execute("PRAGMA cache_size=-262144")
+            cursor.close()
+    return engine
+
+
+def _init_worker(url: str):
+    global _worker_engine
+    _worker_engine = make_engine(url)
+
+
+def write_shard(engine, rows: Dict[str, List[Dict[str, Any]]], batch_size: int) -> Dict[str, int]:
+    """Insert one shard's rows in a single transaction, batch_size rows per statement"""
+    tables = SQLModel.metadata.tables
+    counts = {}
+    with engine.begin() as conn:
+        for name in TABLE_ORDER:
+            table_rows = rows.get(name)
+            if not table_rows:
+                continue
+            for start in range(0, len(table_rows), batch_size):
+                conn.execute(insert(tables[name]), table_rows[start:start + batch_size])
+            counts[name] = len(table_rows)
+    return counts
+
+
+def run_shard(task: Dict[str, Any]) -> Dict[str, int]:
+    """Generate and write one shard; runs in a worker process"""
+    builder = ShardBuilder(
+        task["first_user"], task["seed"], Distribution(**task["dist"]),
+        task["type_ids"], task["password_hash"], task["end"]
+    )
+    rows = builder.build(task["first_user"], task["users"])
+    return write_shard(_worker_engine, rows, task["batch_size"])
+
+
+def prepare(engine, password: str) -> Tuple[Dict[str, UUID], str]:
+    """Create the schema and assessment types; return type ids and the shared password hash"""
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        create_assessment_types(session)
+        type_ids = {row.slug: row.id for row in session.exec(select(AssessmentType.slug, AssessmentType.id))}
+    return type_ids, get_password_hash(password)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000, help="Registered users to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Generator processes (1 runs in this process)")
+    parser.add_argument("--shard-size", type=int, default=2000, help="Users per shard")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT statement")
+    parser.add_argument("--config", help="JSON file overriding Distribution fields")
+    parser.add_argument("--db", help="Database URL (default: the app's database)")
+    parser.add_argument("--end", type=datetime.fromisoformat,
+                        help="Latest timestamp to generate (default: now; set it for identical reruns)")
+    parser.add_argument("--first-user", type=int, default=0,
+                        help="Index of the first user, to add more users to an existing dataset")
+    parser.add_argument("--password", default="Synthetic1!", help="Password of every generated user")
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            overrides = json.load(f)
+    dist = Distribution(**overrides)
+    if args.db:
+        url = args.db
+    else:
+        from app.database import get_engine
+        url = get_engine().url.render_as_string(hide_password=False)
+    end = args.end or datetime.utcnow().replace(microsecond=0)
+
+    engine = make_engine(url)
+    type_ids, password_hash = prepare(engine, args.password)
+    tasks = []
+    for first in range(args.first_user, args.first_user + args.users, args.shard_size):
+        tasks.append({
+            "first_user": first,
+            "users": min(args.shard_size, args.first_user + args.users - first),
+            "seed": args.seed,
+            "dist": asdict(dist),
+            "type_ids": type_ids,
+            "password_hash": password_hash,
+            "end": end,
+            "batch_size": args.batch_size
+        })
+
+    totals: Dict[str, int] = {}
+    started = time.perf_counter()
+
+    def record(counts: Dict[str, int], done: int):
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
+        rows = sum(totals.values())
+        elapsed = time.perf_counter() - started
+        print(f"shard {done}/{len(tasks)}: {rows:,} rows, {rows / elapsed:,.0f} rows/s", file=sys.stderr)
+
+    if args.workers <= 1:
+        _init_worker(url)
+        for done, task in enumerate(tasks, 1):
+            record(run_shard(task), done)
+    else:
+        engine.dispose()
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(url,)) as executor:
+            futures = [executor.submit(run_shard, task) for task in tasks]
+            for done, future in enumerate(as_completed(futures), 1):
+                record(future.result(), done)
+
+    totals["latest_risks"] = rebuild_latest_risks(engine)
+    totals["patient_dimension"] = rebuild_patient_dimension(engine)
+    totals["user_search_documents"] = rebuild_user_search(engine)
+    totals["risk_score_sketches"] = rebuild_risk_sketches(engine)
+    totals["event_sketches"] = rebuild_event_sketches(engine)
+    totals["funnel_sessions"] = rebuild_funnel(engine)
+    elapsed = time.perf_counter() - started
+    rows = sum(totals.values())
+    print(json.dumps({
+        "users": args.users,
+        "seed": args.seed,
+        "end": end.isoformat(),
+        "rows": rows,
+        "seconds": round(elapsed, 1),
+        "rows_per_second": round(rows / elapsed) if elapsed else None,
+        "tables": {name: totals.get(name, 0) for name in TABLE_ORDER + ["latest_risks", "patient_dimension", "user_search_documents", "risk_score_sketches", "event_sketches", "funnel_sessions"]}
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
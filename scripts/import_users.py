@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Bulk-create patient/provider accounts from a CSV or NDJSON file.
+
+    python scripts/import_users.py clinic.csv
+    python scripts/import_users.py clinic.ndjson --format ndjson --workers 8 -o report.json
+
+CSV needs a header row with email and password columns, and optionally
+role (patient/provider), full_name, sex (M/F) and birth_date. The file is
+read line by line and written in batches; passwords are hashed on
+--workers processes. Duplicate emails and invalid lines are reported by
+line number and skipped. Use - to read from stdin.
+"""
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.database import get_engine
+from app.services.user_import import UserImporter, import_lines, get_hash_executor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or NDJSON file, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "ndjson"],
+                        help="Input format (default: from the file extension, else csv)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Password hashing processes (0 hashes in this process)")
+    parser.add_argument("--batch-size", type=int, default=settings.USER_IMPORT_BATCH_SIZE)
+    parser.add_argument("-o", "--output", help="Write the report as JSON here instead of stdout")
+    args = parser.parse_args()
+
+    import_format = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    settings.USER_IMPORT_HASH_WORKERS = args.workers
+    settings.USER_IMPORT_MAX_REPORTED_LINES = sys.maxsize
+
+    executor = get_hash_executor()
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8-sig", newline="")
+    try:
+        with Session(get_engine()) as session:
+            importer = UserImporter(session, import_format, executor=executor, batch_size=args.batch_size)
+            report = import_lines(importer, source)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if executor is not None:
+            executor.shutdown()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    else:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    print(f"created {report['created']}, duplicates {report['duplicates']}, errors {report['errors']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
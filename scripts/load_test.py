@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Load test and latency benchmark for the HealthBeat API.
+
+Drives weighted user scenarios either in-process through an ASGI
+transport or over HTTP against a running uvicorn, and writes throughput
+and p50/p95/p99 latency per route as JSON. A second mode compares two
+result files and exits non-zero when the candidate regressed.
+
+    # in-process against a local SQLite database
+    ENVIRONMENT=test python scripts/load_test.py run --target asgi -o before.json
+
+    # against a running server (seeded with scripts/seed_data.py)
+    python scripts/load_test.py run --target http://127.0.0.1:8000 -o after.json
+
+    python scripts/load_test.py compare before.json after.json --tolerance 0.10
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from synthetic import DISEASES, survey_payload, partial_payload
+
+DEFAULT_WEIGHTS = {
+    "register_login": 1,
+    "draft_autosave": 6,
+    "submit": 3,
+    "risk_detail": 3,
+    "recommendations": 2,
+    "admin_metrics": 1
+}
+
+USER_PASSWORD = "LoadTest123!"
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    """Collects per-route latencies and status codes"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.latencies[route].append(time.perf_counter() - started)
+            self.errors[route] += 1
+            return None
+        self.latencies[route].append(time.perf_counter() - started)
+        self.statuses[route][response.status_code] += 1
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        routes = {}
+        total = 0
+        total_errors = 0
+        for route in sorted(self.latencies):
+            values = sorted(self.latencies[route])
+            count = len(values)
+            total += count
+            total_errors += self.errors[route]
+            routes[route] = {
+                "count": count,
+                "errors": self.errors[route],
+                "throughput_rps": round(count / elapsed, 3) if elapsed else 0.0,
+                "mean_ms": round(sum(values) / count * 1000, 3),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+                "status": {str(code): n for code, n in sorted(self.statuses[route].items())}
+            }
+        return {
+            "totals": {
+                "requests": total,
+                "errors": total_errors,
+                "elapsed_s": round(elapsed, 3),
+                "throughput_rps": round(total / elapsed, 3) if elapsed else 0.0
+            },
+            "routes": routes
+        }
+
+
+class SharedState:
+    """Ids produced by one virtual user and consumed by others"""
+
+    def __init__(self, admin_token: Optional[str]):
+        self.admin_token = admin_token
+        self.risk_ids: List[str] = []
+
+
+class VirtualUser:
+    """One simulated client running weighted scenarios in a loop"""
+
+    def __init__(self, index: int, seed: int, client: httpx.AsyncClient, recorder: Recorder,
+                 shared: SharedState, weights: Dict[str, int]):
+        self.rng = random.Random(seed * 1000003 + index)
+        self.client = client
+        self.recorder = recorder
+        self.shared = shared
+        self.scenarios = [name for name, weight in weights.items() if weight > 0]
+        self.weights = [weights[name] for name in self.scenarios]
+        self.email = f"load-{seed}-{index}-{uuid.uuid4().hex[:8]}@example.com"
+        self.token: Optional[str] = None
+        self.session_id = f"load-{index}-{uuid.uuid4().hex[:12]}"
+
+    def _auth(self, token: Optional[str]) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {token}"} if token else {}
+
+    async def setup(self):
+        """Register and log in the user backing the authenticated scenarios"""
+        await self.client.post("/auth/register", json={"email": self.email, "password": USER_PASSWORD})
+        response = await self.client.post("/auth/login", json={"email": self.email, "password": USER_PASSWORD})
+        if response.status_code == 200:
+            self.token = response.json()["access_token"]
+
+    async def run_once(self):
+        scenario = self.rng.choices(self.scenarios, weights=self.weights)[0]
+        await getattr(self, f"scenario_{scenario}")()
+
+    async def scenario_register_login(self):
+        email = f"load-{uuid.uuid4().hex}@example.com"
+        await self.recorder.request(self.client, "POST /auth/register", "POST", "/auth/register",
+                                    json={"email": email, "password": USER_PASSWORD, "full_name": "مستخدم تجريبي"})
+        await self.recorder.request(self.client, "POST /auth/login", "POST", "/auth/login",
+                                    json={"email": email, "password": USER_PASSWORD})
+
+    async def scenario_draft_autosave(self):
+        disease = self.rng.choice(DISEASES)
+        session_id = f"{self.session_id}-{disease}"
+        for fraction in (0.3, 0.6, 0.9):
+            await self.recorder.request(self.client, "POST /drafts/", "POST", "/drafts/", json={
+                "assessment_type_id": disease,
+                "session_id": session_id,
+                "data": partial_payload(self.rng, disease, fraction)
+            })
+        await self.recorder.request(self.client, "GET /drafts/", "GET", "/drafts/",
+                                    params={"assessment_type_id": disease, "session_id": session_id})
+
+    async def scenario_submit(self):
+        disease = self.rng.choice(DISEASES)
+        token = self.token if self.rng.random() < 0.5 else None
+        response = await self.recorder.request(
+            self.client, f"POST /submissions/ [{disease}]", "POST", "/submissions/",
+            json={
+                "assessment_type_id": disease,
+                "session_id": self.session_id,
+                "data": survey_payload(self.rng, disease)
+            },
+            headers=self._auth(token)
+        )
+        if response is not None and response.status_code == 201 and token is None:
+            # Anonymous risks are readable by anyone, which keeps risk_detail simple
+            self.shared.risk_ids.append(response.json()["risk_id"])
+
+    async def scenario_risk_detail(self):
+        if not self.shared.risk_ids:
+            await self.scenario_submit()
+            return
+        risk_id = self.rng.choice(self.shared.risk_ids)
+        await self.recorder.request(self.client, "GET /risks/{risk_id}", "GET", f"/risks/{risk_id}")
+
+    async def scenario_recommendations(self):
+        if not self.token:
+            return
+        await self.recorder.request(self.client, "GET /recommendations/", "GET", "/recommendations/",
+                                    headers=self._auth(self.token))
+
+    async def scenario_admin_metrics(self):
+        if not self.shared.admin_token:
+            return
+        await self.recorder.request(self.client, "GET /admin/assessments", "GET", "/admin/assessments",
+                                    headers=self._auth(self.shared.admin_token))
+
+
+def prepare_in_process_database(admin_email: str, admin_password: str):
+    """Create tables, assessment types and the admin account for ASGI runs"""
+    from sqlmodel import Session
+    from app.database import engine, create_db_and_tables
+    from app.crud import create_user, create_assessment_types, get_user_by_email
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        create_assessment_types(session)
+        if not get_user_by_email(session, admin_email):
+            create_user(session, admin_email, admin_password, "admin")
+
+
+def build_client(target: str, timeout: float) -> httpx.AsyncClient:
+    if target == "asgi":
+        from app.core.config import settings
+        from app.main import app
+        # Every virtual user shares one client address; measure capacity, not the limiter
+        settings.RATE_LIMIT_ENABLED = False
+        transport = httpx.ASGITransport(app=app)
+        return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    return httpx.AsyncClient(base_url=target.rstrip("/"), timeout=timeout, limits=limits)
+
+
+async def run_load_test(args) -> Dict[str, Any]:
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in args.weight or []:
+        name, _, value = item.partition("=")
+        if name not in weights:
+            raise SystemExit(f"Unknown scenario: {name}")
+        weights[name] = int(value)
+
+    if args.target == "asgi":
+        prepare_in_process_database(args.admin_email, args.admin_password)
+
+    recorder = Recorder()
+    async with build_client(args.target, args.timeout) as client:
+        admin_token = None
+        response = await client.post("/auth/login", json={"email": args.admin_email, "password": args.admin_password})
+        if response.status_code == 200:
+            admin_token = response.json()["access_token"]
+
+        shared = SharedState(admin_token)
+        users = [VirtualUser(i, args.seed, client, recorder, shared, weights) for i in range(args.concurrency)]
+        await asyncio.gather(*(user.setup() for user in users))
+
+        deadline = time.perf_counter() + args.duration if args.duration else None
+
+        async def drive(user: VirtualUser):
+            iterations = 0
+            while True:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                if deadline is None and iterations >= args.iterations:
+                    break
+                await user.run_once()
+                iterations += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(drive(user) for user in users))
+        elapsed = time.perf_counter() - started
+
+    result = recorder.report(elapsed)
+    result["meta"] = {
+        "target": args.target,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "iterations_per_user": None if args.duration else args.iterations,
+        "seed": args.seed,
+        "weights": weights,
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform()
+    }
+    return result
+
+
+def compare_results(baseline: Dict[str, Any], candidate: Dict[str, Any], tolerance: float,
+                    min_delta_ms: float) -> List[Dict[str, Any]]:
+    """Per-route comparison; a row is a regression when latency or throughput moved past tolerance"""
+    rows = []
+    for route in sorted(set(baseline["routes"]) | set(candidate["routes"])):
+        before = baseline["routes"].get(route)
+        after = candidate["routes"].get(route)
+        if before is None or after is None:
+            rows.append({"route": route, "status": "missing" if after is None else "new", "regressions": []})
+            continue
+
+        regressions = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            delta = after[metric] - before[metric]
+            if before[metric] and delta > min_delta_ms and delta / before[metric] > tolerance:
+                regressions.append(f"{metric} {before[metric]:.2f} -> {after[metric]:.2f}")
+        if before["throughput_rps"] and (before["throughput_rps"] - after["throughput_rps"]) / before["throughput_rps"] > tolerance:
+            regressions.append(f"throughput_rps {before['throughput_rps']:.1f} -> {after['throughput_rps']:.1f}")
+        before_error_rate = before["errors"] / before["count"] if before["count"] else 0.0
+        after_error_rate = after["errors"] / after["count"] if after["count"] else 0.0
+        if after_error_rate > before_error_rate + tolerance / 10:
+            regressions.append(f"error_rate {before_error_rate:.3f} -> {after_error_rate:.3f}")
+
+        rows.append({
+            "route": route,
+            "status": "regressed" if regressions else "ok",
+            "p95_ms": [before["p95_ms"], after["p95_ms"]],
+            "p99_ms": [before["p99_ms"], after["p99_ms"]],
+            "throughput_rps": [before["throughput_rps"], after["throughput_rps"]],
+            "regressions": regressions
+        })
+    return rows
+
+
+def cmd_run(args) -> int:
+    result = asyncio.run(run_load_test(args))
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    totals = result["totals"]
+    print(f"{totals['requests']} requests, {totals['errors']} errors, "
+          f"{totals['throughput_rps']} req/s over {totals['elapsed_s']}s", file=sys.stderr)
+    return 0
+
+
+def cmd_compare(args) -> int:
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    rows = compare_results(baseline, candidate, args.tolerance, args.min_delta_ms)
+    regressed = [row for row in rows if row["status"] == "regressed"]
+
+    if args.json:
+        print(json.dumps({"regressed": bool(regressed), "routes": rows}, indent=2))
+    else:
+        for row in rows:
+            detail = "; ".join(row["regressions"]) if row["regressions"] else ""
+            print(f"{row['status']:<10} {row['route']:<40} {detail}")
+        print(f"\n{len(regressed)} of {len(rows)} routes regressed (tolerance {args.tolerance:.0%})")
+    return 1 if regressed else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="HealthBeat API load test")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Run the load test")
+    run.add_argument("--target", default="asgi", help='"asgi" for in-process, or a base URL such as http://127.0.0.1:8000')
+    run.add_argument("--concurrency", type=int, default=10, help="Number of virtual users")
+    run.add_argument("--duration", type=float, default=0, help="Seconds to run; 0 means use --iterations")
+    run.add_argument("--iterations", type=int, default=50, help="Scenarios per virtual user when --duration is 0")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--weight", action="append", metavar="SCENARIO=N", help="Override a scenario weight")
+    run.add_argument("--admin-email", default="admin@example.com")
+    run.add_argument("--admin-password", default="Passw0rd!")
+    run.add_argument("--timeout", type=float, default=30.0)
+    run.add_argument("-o", "--output", help="Write the JSON report here instead of stdout")
+    run.set_defaults(func=cmd_run)
+
+    compare = subparsers.add_parser("compare", help="Compare two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+    compare.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative change, e.g. 0.10 for 10%%")
+    compare.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore latency changes smaller than this")
+    compare.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
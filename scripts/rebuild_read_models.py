@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Recompute the derived read tables: latest_risks (latest assessment per
+patient and disease, from risk_assessments), patient_dimension (users +
+patient_profiles, for cohort queries), user_search_documents (for the
+admin user search), risk_score_sketches (daily risk score
+distributions), and event_sketches and the funnel tables (unique visitors
+and funnel conversion, from the analytics events still retained).
+
+    python scripts/rebuild_read_models.py
+    python scripts/rebuild_read_models.py --user 3f2c...
+
+Submissions and user and profile changes keep these tables current; run
+this after bulk loads or rescoring (when rescored results should show as
+the latest), or to repair them.
+"""
+import argparse
+import os
+import sys
+from uuid import UUID
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlmodel import Session
+
+from app.database import get_engine
+from app.services.cohorts import rebuild_patient_dimension, sync_patient_dimension
+from app.services.event_sketches import rebuild_event_sketches, rebuild_funnel
+from app.services.risk_sketches import rebuild_risk_sketches
+from app.services.timeline import rebuild_latest_risks
+from app.services.user_search import rebuild_user_search, sync_user_search
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", type=UUID, help="Only this user (default: everyone)")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    written = rebuild_latest_risks(engine, args.user)
+    print(f"latest_risks: {written} rows", file=sys.stderr)
+    if args.user is None:
+        print(f"patient_dimension: {rebuild_patient_dimension(engine)} rows", file=sys.stderr)
+        print(f"user_search_documents: {rebuild_user_search(engine)} rows", file=sys.stderr)
+        print(f"risk_score_sketches: {rebuild_risk_sketches(engine)} rows", file=sys.stderr)
+        print(f"event_sketches: {rebuild_event_sketches(engine)} rows", file=sys.stderr)
+        print(f"funnel_sessions: {rebuild_funnel(engine)} rows", file=sys.stderr)
+    else:
+        with Session(engine) as session:
+            sync_patient_dimension(session, [args.user])
+            sync_user_search(session, [args.user])
+            session.commit()
+
+
+if __name__ == "__main__":
+    main()
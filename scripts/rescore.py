@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Rescore historical submissions with the current rules/models.
+
+Writes a new RiskAssessment per survey tagged with the serving model
+version; existing assessments are kept. Progress is checkpointed after each
+chunk, so rerunning the same command resumes an interrupted job.
+
+    python scripts/rescore.py --workers 4 --checkpoint rescore.json
+    python scripts/rescore.py --disease diabetes --model-dir ./models
+"""
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import structlog
+
+from app.core.config import settings
+from app.database import engine
+from app.services.model_registry import model_registry
+from app.services.rescoring import rescore
+
+logger = structlog.get_logger()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkpoint", default="rescore-checkpoint.json",
+                        help="Progress file; rerun with the same path to resume")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Scoring processes (0 scores in this process)")
+    parser.add_argument("--model-dir", default=settings.MODEL_DIR,
+                        help="Model artifacts to score with (default: MODEL_DIR; unset uses the rules)")
+    parser.add_argument("--disease", choices=["diabetes", "hypertension", "heart"])
+    parser.add_argument("--max-chunks", type=int, help="Stop after this many chunks")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    if args.model_dir:
+        # Also loaded here so workers=0 scores with the same models
+        model_registry.load_all(args.model_dir)
+
+    checkpoint = rescore(
+        engine,
+        checkpoint_path=args.checkpoint,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        model_dir=args.model_dir,
+        disease=args.disease,
+        max_chunks=args.max_chunks
+    )
+    print(json.dumps(checkpoint.__dict__, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Archive and delete analytics events and audit logs past their retention
+period, once, for cron or a manual catch-up.
+
+    python scripts/retention.py
+    python scripts/retention.py --table analytics_events --max-seconds 3600
+
+Uses the same settings (RETENTION_*_DAYS, RETENTION_ARCHIVE_DIR, ...) and
+the same job lease as the in-process job, so it never runs alongside it.
+"""
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.config import settings
+from app.database import get_engine
+from app.services.background import acquire_lease, release_lease
+from app.services.retention import RETAINED_TABLES, run_retention
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--table", action="append", choices=sorted(RETAINED_TABLES),
+                        help="Only this table (repeatable; default: all)")
+    parser.add_argument("--max-seconds", type=float, default=settings.RETENTION_MAX_RUN_SECONDS,
+                        help="Stop each table after this long")
+    parser.add_argument("--pause", type=float, default=settings.RETENTION_BATCH_PAUSE_SECONDS,
+                        help="Sleep between batches")
+    args = parser.parse_args()
+
+    settings.RETENTION_MAX_RUN_SECONDS = args.max_seconds
+    settings.RETENTION_BATCH_PAUSE_SECONDS = args.pause
+    engine = get_engine()
+    owner = f"script:{os.getpid()}"
+    lease_seconds = args.max_seconds * len(args.table or RETAINED_TABLES) + 60
+    if not acquire_lease(engine, "retention", owner, lease_seconds):
+        print("retention is already running elsewhere", file=sys.stderr)
+        sys.exit(1)
+    try:
+        results = run_retention(engine, tables=args.table)
+    finally:
+        release_lease(engine, "retention", owner)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
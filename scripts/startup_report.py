@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Import-time and startup-time report for the API.
+
+Imports app.main in a fresh interpreter under `-X importtime`, then runs
+the startup handlers once, and prints (or writes) a JSON report with the
+slowest top-level imports and the startup phase timings. Keep the output
+of each release to track cold start over time.
+
+    ENVIRONMENT=test python scripts/startup_report.py -o startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, Any, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import app.main as main
+imported = time.perf_counter()
+asyncio.run(main.app.router.startup())
+report = main.startup_report.as_dict()
+report["wall_import_ms"] = round((imported - started) * 1000, 1)
+print("STARTUP_REPORT " + json.dumps(report))
+"""
+
+
+def parse_importtime(stderr: str, top: int) -> List[Dict[str, Any]]:
+    """Cumulative import cost per top-level package, slowest first"""
+    cumulative: Dict[str, int] = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Names are indented two spaces per nesting level; only outermost
+        # imports are counted so nested ones are not added twice.
+        name = name[1:]
+        if name.startswith("  ") and not name.startswith("   "):
+            cumulative[name.strip().split(".")[0]] += int(cumulative_us)
+    ranked = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": package, "cumulative_ms": round(us / 1000, 1)} for package, us in ranked]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Report import and startup timings")
+    parser.add_argument("--top", type=int, default=15, help="How many top-level packages to list")
+    parser.add_argument("-o", "--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, env=os.environ.copy()
+    )
+    startup = None
+    for line in process.stdout.splitlines():
+        if line.startswith("STARTUP_REPORT "):
+            startup = json.loads(line[len("STARTUP_REPORT "):])
+    if process.returncode != 0 or startup is None:
+        sys.stderr.write(process.stderr[-4000:])
+        return 1
+
+    report = {
+        "startup": startup,
+        "slowest_imports": parse_importtime(process.stderr, args.top)
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Synthetic survey payloads for load tests and benchmarks.
+
+Payloads mirror what the React RiskCheck forms post to /drafts/ and
+/submissions/ (camelCase keys, Arabic answer strings, lab values as
+strings that may be "unknown"). Every generator takes a random.Random so
+runs are reproducible from a seed.
+"""
+import random
+from typing import Dict, Any, List
+
+DISEASES = ["diabetes", "hypertension", "heart"]
+
+YES_NO = ["نعم", "لا"]
+EXERCISE = ["لا أمارس", "نادراً", "أحياناً", "منتظم"]
+SALT = ["قليل", "معتدل", "كثير"]
+GENDER = ["ذكر", "أنثى"]
+DIABETES_STATUS = ["لا", "نوع 1", "نوع 2", "لا أعرف"]
+
+
+def _lab_value(rng: random.Random, mean: float, sd: float, unknown_rate: float, decimals: int = 0) -> str:
+    """Lab value as the form sends it: a numeric string or "unknown" """
+    if rng.random() < unknown_rate:
+        return "unknown"
+    value = max(0.0, rng.gauss(mean, sd))
+    return str(round(value, decimals)) if decimals else str(int(value))
+
+
+def _bp_readings(rng: random.Random, max_readings: int = 3) -> List[Dict[str, str]]:
+    """One to max_readings blood pressure readings around a per-patient baseline"""
+    base_systolic = rng.gauss(128, 18)
+    base_diastolic = rng.gauss(82, 11)
+    readings = []
+    for _ in range(rng.randint(1, max_readings)):
+        readings.append({
+            "systolic": str(int(base_systolic + rng.gauss(0, 6))),
+            "diastolic": str(int(base_diastolic + rng.gauss(0, 4)))
+        })
+    return readings
+
+
+def _drop_missing(rng: random.Random, data: Dict[str, Any], missing_rate: float) -> Dict[str, Any]:
+    """Randomly omit optional answers, as partially filled forms do"""
+    if missing_rate <= 0:
+        return data
+    return {key: value for key, value in data.items() if key == "age" or rng.random() >= missing_rate}
+
+
+def diabetes_payload(rng: random.Random, missing_rate: float = 0.1, unknown_rate: float = 0.2) -> Dict[str, Any]:
+    """Diabetes survey answers"""
+    data = {
+        "age": rng.randint(18, 85),
+        "weight": rng.randint(50, 130),
+        "height": rng.randint(150, 195),
+        "fastingGlucose": _lab_value(rng, 105, 22, unknown_rate),
+        "hba1c": _lab_value(rng, 5.8, 0.8, unknown_rate, decimals=1),
+        "familyHistory": rng.choice(YES_NO),
+        "exercise": rng.choice(EXERCISE),
+        "smoking": rng.choice(YES_NO)
+    }
+    return _drop_missing(rng, data, missing_rate)
+
+
+def hypertension_payload(rng: random.Random, missing_rate: float = 0.1, max_readings: int = 3) -> Dict[str, Any]:
+    """Hypertension survey answers with one or more BP readings"""
+    data = {
+        "age": rng.randint(18, 85),
+        "gender": rng.choice(GENDER),
+        "weight": rng.randint(50, 130),
+        "height": rng.randint(150, 195),
+        "bpReadings": _bp_readings(rng, max_readings),
+        "salt": rng.choice(SALT),
+        "exercise": rng.choice(EXERCISE),
+        "smoking": rng.choice(YES_NO),
+        "familyHistory": rng.choice(YES_NO)
+    }
+    return _drop_missing(rng, data, missing_rate)
+
+
+def heart_payload(rng: random.Random, missing_rate: float = 0.1, unknown_rate: float = 0.2) -> Dict[str, Any]:
+    """Heart disease survey answers"""
+    data = {
+        "age": rng.randint(18, 85),
+        "gender": rng.choice(GENDER),
+        "weight": rng.randint(50, 130),
+        "height": rng.randint(150, 195),
+        "cholesterol": _lab_value(rng, 200, 35, unknown_rate),
+        "ldl": _lab_value(rng, 125, 30, unknown_rate),
+        "hdl": _lab_value(rng, 50, 12, unknown_rate),
+        "smoking": rng.choice(YES_NO),
+        "familyHistory": rng.choice(YES_NO),
+        "exercise": rng.choice(EXERCISE),
+        "diabetesStatus": rng.choice(DIABETES_STATUS)
+    }
+    return _drop_missing(rng, data, missing_rate)
+
+
+GENERATORS = {
+    "diabetes": diabetes_payload,
+    "hypertension": hypertension_payload,
+    "heart": heart_payload
+}
+
+
+def survey_payload(rng: random.Random, disease: str, **kwargs) -> Dict[str, Any]:
+    """Survey answers for the given disease slug"""
+    return GENERATORS[disease](rng, **kwargs)
+
+
+def partial_payload(rng: random.Random, disease: str, fraction: float) -> Dict[str, Any]:
+    """A draft in progress: the first `fraction` of the form's answers"""
+    data = survey_payload(rng, disease, missing_rate=0.0)
+    keys = list(data.keys())
+    keep = max(1, int(len(keys) * fraction))
+    return {key: data[key] for key in keys[:keep]}
@@ -1,22 +1,36 @@
+import os
+os.environ.setdefault("ENVIRONMENT", "test")
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import SQLModel, create_engine, Session
 from sqlmodel.pool import StaticPool
+from typing import Optional
 
 from app.main import app
-from app.database import get_session
+from app.database import get_session, get_read_session
+from app.core.rate_limit import rate_limiter
+from app.services.event_sketches import event_sketches
+from app.services.reference_data import reference_data
+from app.services.risk_sketches import risk_sketches
 from app.models import *
+from app.crud import create_assessment_types, create_user
 
 # Create test database
 @pytest.fixture(name="session")
 def session_fixture():
     engine = create_engine(
-        "sqlite:///./test.db", 
+        "sqlite://", 
         connect_args={"check_same_thread": False},
         poolclass=StaticPool
     )
     SQLModel.metadata.create_all(engine)
+    # Each test has a new database, so cached assessment type ids are stale
+    reference_data.invalidate()
+    risk_sketches.reset()
+    event_sketches.reset()
     with Session(engine) as session:
+        create_assessment_types(session)
         yield session
 
 @pytest.fixture(name="client")
@@ -25,6 +39,8 @@ def client_fixture(session: Session):
         return session
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    rate_limiter.reset()
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
@@ -43,4 +59,35 @@ def admin_user_data():
         "email": "admin@example.com", 
         "password": "AdminPass123!",
         "role": "admin"
-    }
\ No newline at end of file
+    }
+
+@pytest.fixture
+def admin_headers(client: TestClient, session: Session, admin_user_data):
+    create_user(session, admin_user_data["email"], admin_user_data["password"], admin_user_data["role"])
+    response = client.post("/auth/login", json={
+        "email": admin_user_data["email"],
+        "password": admin_user_data["password"]
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def login(client: TestClient, session: Session):
+    """Create a user and sign in as them; returns (user id, auth headers)"""
+    def login(email: str, role: str = "patient"):
+        user = create_user(session, email, "Password123!", role)
+        token = client.post("/auth/login", json={"email": email, "password": "Password123!"}).json()["access_token"]
+        return user.id, {"Authorization": f"Bearer {token}"}
+    return login
+
+@pytest.fixture
+def submit(client: TestClient):
+    """Submit an assessment, anonymously unless headers are given; returns the response body"""
+    def submit(disease: str, data: dict, headers: Optional[dict] = None, session_id: Optional[str] = None):
+        response = client.post("/submissions/", json={
+            "assessment_type_id": disease,
+            "session_id": session_id,
+            "data": data
+        }, headers=headers)
+        assert response.status_code == 201
+        return response.json()
+    return submit
@@ -0,0 +1,65 @@
+import asyncio
+
+from app.services import batcher
+from app.services.batcher import ScoringBatcher
+from app.services.risk_calculator import SCORING_DURATION, calculate_risk
+
+def payload(age):
+    return {"age": age, "weight": 80, "height": 175, "fastingGlucose": "105", "familyHistory": "نعم"}
+
+def test_concurrent_requests_share_a_batch(monkeypatch):
+    """Test concurrent requests for one disease are scored in a single batch"""
+    batches = []
+    original = batcher.calculate_risk_batch
+
+    def recording_batch(disease, rows):
+        batches.append(len(rows))
+        return original(disease, rows)
+
+    monkeypatch.setattr(batcher, "calculate_risk_batch", recording_batch)
+    scoring = ScoringBatcher(max_size=32, max_wait_ms=20)
+    scored_before = SCORING_DURATION.samples().get(("diabetes",), [0])[-1]
+
+    async def run():
+        return await asyncio.gather(*(scoring.score("diabetes", payload(age)) for age in (30, 50, 70)))
+
+    results = asyncio.run(run())
+    scoring.close()
+
+    assert batches == [3]
+    assert SCORING_DURATION.samples()[("diabetes",)][-1] == scored_before + 3
+    assert [r["risk_score"] for r in results] == [
+        calculate_risk("diabetes", payload(age))["risk_score"] for age in (30, 50, 70)
+    ]
+
+def test_full_batch_is_flushed_without_waiting():
+    """Test reaching max size scores the batch before the wait expires"""
+    scoring = ScoringBatcher(max_size=2, max_wait_ms=10000)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(scoring.score("heart", payload(40)), scoring.score("heart", payload(60))),
+            timeout=5
+        )
+
+    results = asyncio.run(run())
+    scoring.close()
+
+    assert len(results) == 2
+
+def test_bad_submission_only_fails_its_caller():
+    """Test a submission that cannot be scored does not fail the rest of its batch"""
+    scoring = ScoringBatcher(max_size=32, max_wait_ms=5)
+
+    async def run():
+        return await asyncio.gather(
+            scoring.score("diabetes", payload(50)),
+            scoring.score("diabetes", {**payload(50), "fastingGlucose": "not-a-number"}),
+            return_exceptions=True
+        )
+
+    good, bad = asyncio.run(run())
+    scoring.close()
+
+    assert 0.0 <= good["risk_score"] <= 1.0
+    assert isinstance(bad, ValueError)
@@ -0,0 +1,77 @@
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.crud import update_patient_profile
+from app.models import PatientDimension
+from app.services.cohorts import rebuild_patient_dimension
+
+def add_patients(session: Session, login, submit, count: int):
+    """Patients alternating F/M, born 1950, 1960, ...; each submits one diabetes assessment"""
+    ids = []
+    for i in range(count):
+        user_id, headers = login(f"patient{i}@example.com")
+        update_patient_profile(session, user_id, {
+            "full_name": f"Patient {i}", "sex": "FM"[i % 2], "birth_date": datetime(1950 + 10 * i, 6, 1)
+        })
+        submit("diabetes", {"age": 55, "weight": 95, "height": 170, "fastingGlucose": "140"}, headers)
+        ids.append(str(user_id))
+    return ids
+
+def test_cohort_filters_and_keyset_pages(client: TestClient, session: Session, admin_headers, login, submit):
+    """Test cohort filters, cursor paging over every member once, and suspended patients dropping out"""
+    ids = add_patients(session, login, submit, 5)
+    _, provider_headers = login("provider@example.com", "provider")
+    bucket = client.get("/cohorts?disease=diabetes", headers=provider_headers).json()["items"][0]["risk_bucket"]
+
+    seen, cursor = [], None
+    while True:
+        url = f"/cohorts?disease=diabetes&bucket={bucket}&limit=2" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url, headers=provider_headers)
+        assert response.status_code == 200
+        page = response.json()
+        if cursor is None:
+            assert page["total"] == 5 and page["total_exact"] is True
+        else:
+            assert page["total"] is None
+        seen += [item["user_id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(ids)
+
+    women = client.get("/cohorts?disease=diabetes&sex=F", headers=provider_headers).json()
+    assert sorted(item["user_id"] for item in women["items"]) == sorted(ids[0::2])
+    assert {item["full_name"] for item in women["items"]} == {"Patient 0", "Patient 2", "Patient 4"}
+
+    today = datetime.utcnow().date()
+    age_1970 = today.year - 1970 - ((today.month, today.day) < (6, 1))
+    band = client.get(f"/cohorts?disease=diabetes&age_min={age_1970}&age_max={age_1970}", headers=provider_headers).json()
+    assert [item["user_id"] for item in band["items"]] == [ids[2]]
+    assert band["items"][0]["age"] == age_1970
+
+    assert client.get("/cohorts?disease=heart", headers=provider_headers).json()["total"] == 0
+    assert client.put(f"/admin/users/{ids[0]}/status?new_status=suspended", headers=admin_headers).status_code == 200
+    assert client.get("/cohorts?disease=diabetes", headers=provider_headers).json()["total"] == 4
+
+def test_cohort_access_count_cap_and_rebuild(client: TestClient, session: Session, login, submit, monkeypatch):
+    """Test patients are refused, totals past the cap are lower bounds, and a rebuild matches the synced rows"""
+    add_patients(session, login, submit, 3)
+    _, patient_headers = login("someone@example.com")
+    _, provider_headers = login("provider@example.com", "provider")
+
+    assert client.get("/cohorts?disease=diabetes", headers=patient_headers).status_code == 403
+    assert client.get("/cohorts?disease=unknown", headers=provider_headers).status_code == 404
+    assert client.get("/cohorts?disease=diabetes&cursor=not-a-cursor", headers=provider_headers).status_code == 400
+
+    monkeypatch.setattr(settings, "COHORT_COUNT_LIMIT", 2)
+    capped = client.get("/cohorts?disease=diabetes", headers=provider_headers).json()
+    assert capped["total"] == 2 and capped["total_exact"] is False
+    assert len(capped["items"]) == 3
+
+    synced = {row.user_id: (row.email, row.full_name, row.sex) for row in session.exec(select(PatientDimension)).all()}
+    assert rebuild_patient_dimension(session.get_bind()) == 4
+    session.expire_all()
+    assert {row.user_id: (row.email, row.full_name, row.sex) for row in session.exec(select(PatientDimension)).all()} == synced
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from app import database
+from app.core.config import settings
+from app.database import get_engine, pool_settings
+
+def test_pool_settings_split_connection_budget(monkeypatch):
+    """Test the connection budget is divided between workers"""
+    monkeypatch.setattr(settings, "DB_MAX_CONNECTIONS", 40)
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 4)
+
+    pool = pool_settings()
+
+    assert pool["pool_size"] + pool["max_overflow"] == 10
+    assert pool["pool_size"] >= 1
+
+def test_pool_settings_default_without_budget(monkeypatch):
+    """Test the configured pool size is used when no budget is set"""
+    monkeypatch.setattr(settings, "DB_MAX_CONNECTIONS", None)
+
+    assert pool_settings() == {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW}
+
+def test_module_engine_attribute_is_lazy_engine():
+    """Test `database.engine` still resolves, to the per-process engine"""
+    assert database.engine is get_engine()
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_forked_child_gets_its_own_engine():
+    """Test a forked worker builds a new engine instead of reusing the parent's pool"""
+    parent_engine = get_engine()
+    read_fd, write_fd = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            child_engine = get_engine()
+            os.write(write_fd, b"1" if child_engine is not parent_engine else b"0")
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    result = os.read(read_fd, 1)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+
+    assert result == b"1"
+    assert get_engine() is parent_engine
@@ -1,5 +1,11 @@
 import pytest
+from datetime import datetime, timedelta
+from uuid import UUID
 from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.models import AssessmentDraft
+from app.services.draft_expiry import sweep_expired_drafts
 
 def test_save_draft_anonymous(client: TestClient):
     """Test saving draft for anonymous user"""
@@ -77,4 +83,39 @@ def test_upsert_draft(client: TestClient):
     # Should be same draft ID (upserted)
     assert draft_id_1 == draft_id_2
     assert response2.json()["data"]["weight"] == 75
-    assert response2.json()["data"]["age"] == 40
\ No newline at end of file
+    assert response2.json()["data"]["age"] == 40
+
+def test_expired_draft_is_absent_until_saved_again(client: TestClient, session: Session):
+    """Test an expired anonymous draft is not returned, and saving again starts a fresh draft"""
+    draft_data = {"assessment_type_id": "diabetes", "session_id": "stale-session", "data": {"age": 60}}
+    saved = client.post("/drafts/", json=draft_data).json()
+    expires_at = datetime.fromisoformat(saved["expires_at"])
+    assert timedelta(hours=71) < expires_at - datetime.fromisoformat(saved["last_saved_at"]) <= timedelta(hours=72)
+
+    draft = session.get(AssessmentDraft, UUID(saved["id"]))
+    draft.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    session.add(draft)
+    session.commit()
+
+    response = client.get("/drafts/?assessment_type_id=diabetes&session_id=stale-session")
+    assert response.status_code == 200
+    assert response.json() is None
+
+    resaved = client.post("/drafts/", json={**draft_data, "data": {"weight": 70}}).json()
+    assert resaved["data"] == {"weight": 70}
+    assert datetime.fromisoformat(resaved["expires_at"]) > datetime.utcnow()
+
+def test_sweep_deletes_only_expired_drafts(client: TestClient, session: Session):
+    """Test the sweeper deletes expired drafts in batches and keeps live ones"""
+    for index in range(5):
+        client.post("/drafts/", json={"assessment_type_id": "diabetes", "session_id": f"sweep-{index}", "data": {}})
+    later = datetime.utcnow() + timedelta(hours=73)
+    live = client.post("/drafts/", json={"assessment_type_id": "heart", "session_id": "sweep-live", "data": {}}).json()
+    draft = session.get(AssessmentDraft, UUID(live["id"]))
+    draft.expires_at = later + timedelta(hours=1)
+    session.add(draft)
+    session.commit()
+
+    assert sweep_expired_drafts(session.get_bind(), now=later, batch_size=2) == 5
+    remaining = session.exec(select(AssessmentDraft)).all()
+    assert [str(draft.id) for draft in remaining] == [live["id"]]
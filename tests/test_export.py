@@ -0,0 +1,83 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.services.outbox import run_outbox
+
+@pytest.fixture
+def submissions(client: TestClient, session: Session):
+    for age in (35, 55, 70):
+        response = client.post("/submissions/", json={
+            "assessment_type_id": "diabetes",
+            "session_id": "export-session",
+            "data": {"age": age, "weight": 95, "height": 170, "fastingGlucose": "130", "familyHistory": "نعم"}
+        })
+        assert response.status_code == 201
+    response = client.post("/submissions/", json={
+        "assessment_type_id": "heart",
+        "session_id": "export-session",
+        "data": {"age": 62, "gender": "ذكر", "smoking": "نعم", "cholesterol": "260"}
+    })
+    assert response.status_code == 201
+    run_outbox(session.get_bind())
+
+def test_export_requires_admin(client: TestClient):
+    """Test the export is not available anonymously"""
+    response = client.get("/admin/export/assessments")
+    assert response.status_code in (401, 403)
+
+def test_export_ndjson_includes_recommendations(client: TestClient, admin_headers, submissions):
+    """Test NDJSON export has one line per assessment with parsed data and recommendations"""
+    response = client.get("/admin/export/assessments?format=ndjson&disease=diabetes", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == 3
+    assert all(record["disease"] == "diabetes" for record in records)
+    assert records[0]["data"]["familyHistory"] == "نعم"
+    assert all(record["recommendations"] for record in records)
+
+def test_export_csv_gzip(client: TestClient, admin_headers, submissions):
+    """Test gzipped CSV export decompresses to a header and one row per assessment"""
+    response = client.get("/admin/export/assessments?format=csv&gzip=true", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode("utf-8"))))
+    assert len(rows) == 4
+    assert {row["disease"] for row in rows} == {"diabetes", "heart"}
+    assert json.loads(rows[0]["recommendations"])
+
+def test_export_date_range(client: TestClient, admin_headers, submissions):
+    """Test rows outside the requested range are excluded"""
+    response = client.get("/admin/export/assessments?format=csv&to=2000-01-01T00:00:00", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.text.strip().splitlines() == [",".join([
+        "risk_id", "survey_id", "disease", "model_version", "risk_score", "risk_bucket",
+        "auc_at_train", "predicted_at", "user_id", "session_id", "submitted_at",
+        "data", "recommendations"
+    ])]
+
+def test_export_leaves_out_pending_details(client: TestClient, session: Session, admin_headers, submissions):
+    """Test an assessment whose recommendations are still queued is only exported once they are written"""
+    response = client.post("/submissions/", json={
+        "assessment_type_id": "heart",
+        "session_id": "export-session",
+        "data": {"age": 48, "cholesterol": "210"}
+    })
+    assert response.status_code == 201
+
+    def exported():
+        response = client.get("/admin/export/assessments?format=ndjson&disease=heart", headers=admin_headers)
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    assert len(exported()) == 1
+    run_outbox(session.get_bind())
+    records = exported()
+    assert len(records) == 2 and all(record["recommendations"] for record in records)
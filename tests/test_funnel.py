@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.crud import create_user
+from app.models import FunnelCount, FunnelSession
+from app.services.event_sketches import event_sketches, rebuild_event_sketches, rebuild_funnel
+from app.services.hyperloglog import HyperLogLog
+
+def track(client: TestClient, session_id: str, *event_types: str, user_id=None):
+    for event_type in event_types:
+        response = client.post("/analytics/events", json={
+            "session_id": session_id, "event_type": event_type, "user_id": str(user_id) if user_id else None
+        })
+        assert response.status_code == 201
+
+def test_hyperloglog_estimates_merge_and_encode():
+    """Test estimates stay within a few standard errors across merging, encoding and precisions"""
+    parts = [HyperLogLog() for _ in range(10)]
+    for i in range(100000):
+        parts[i % 10].add(f"session-{i}")
+    merged = HyperLogLog()
+    for part in parts:
+        merged.merge(HyperLogLog.from_bytes(part.to_bytes()))
+    assert abs(merged.count() - 100000) < 100000 * 0.03
+
+    overlap = HyperLogLog(12)
+    overlap.update(f"session-{i}" for i in range(50000, 150000))
+    merged.merge(overlap)
+    assert merged.precision == 12
+    assert abs(merged.count() - 150000) < 150000 * 0.05
+
+    small = HyperLogLog()
+    small.update(["a", "b", "c", "a"])
+    assert small.count() == 3
+    assert len(small.to_bytes()) < 20
+    assert HyperLogLog.from_bytes(small.to_bytes()).count() == 3
+    assert HyperLogLog().count() == 0
+
+def test_funnel_endpoint_reads_incremental_aggregates(client: TestClient, session: Session, admin_headers):
+    """Test client events and the stages the API records drive the funnel and visitor estimates across flushes"""
+    patient = create_user(session, "funnel@example.com", "Password123!")
+
+    def save_draft(session_id: str, user_id=None):
+        response = client.post("/drafts/", json={
+            "assessment_type_id": "diabetes", "session_id": session_id,
+            "user_id": str(user_id) if user_id else None, "data": {"age": 50}
+        })
+        assert response.status_code == 201
+
+    def submit(session_id: str, user_id=None):
+        response = client.post("/submissions/", json={
+            "assessment_type_id": "diabetes", "session_id": session_id,
+            "user_id": str(user_id) if user_id else None, "data": {"age": 50, "weight": 80, "height": 175}
+        })
+        assert response.status_code == 201
+        return response.json()["risk_id"]
+
+    track(client, "s1", "page_view", "assessment_started", user_id=patient.id)
+    save_draft("s1", patient.id)
+    save_draft("s1", patient.id)
+    track(client, "s2", "assessment_started")
+    track(client, "s3", "page_view", "assessment_started")
+    submit("s3")
+    # The API alone sees s4: a saved draft means an assessment was started
+    save_draft("s4")
+    assert event_sketches.flush(session.get_bind()) > 0
+
+    # s1 finishes in a later flush
+    assert client.get(f"/risks/{submit('s1', patient.id)}").status_code == 200
+    event_sketches.flush(session.get_bind())
+
+    response = client.get("/admin/funnel", headers=admin_headers)
+    assert response.status_code == 200
+    report = response.json()
+    stages = {stage["stage"]: stage for stage in report["funnel"]}
+    assert [stages[name]["sessions"] for name in ("draft_started", "draft_saved", "submitted", "risk_viewed")] == [4, 2, 1, 1]
+    assert stages["submitted"]["reached"] == 2 and stages["risk_viewed"]["reached"] == 1
+    assert stages["draft_saved"]["conversion"] == 0.5 and stages["draft_started"]["conversion"] is None
+    assert report["count"] == 11 and report["sessions"] == 4 and report["users"] == 1
+    events = {event["event_type"]: event for event in report["events"]}
+    assert events["assessment_started"]["sessions"] == 3 and events["draft_saved"]["count"] == 3
+    assert events["assessment_submitted"]["sessions"] == 2 and events["risk_viewed"]["count"] == 1
+    assert [day["sessions"] for day in report["daily"]] == [4]
+    assert sum(row.sessions for row in session.exec(select(FunnelCount))) == 4
+
+    stored = {row.session_id: row.stages for row in session.exec(select(FunnelSession))}
+    assert stored == {"s1": 15, "s2": 1, "s3": 5, "s4": 3}
+    # Rebuilds recompute client events and keep what the API recorded
+    assert rebuild_funnel(session.get_bind()) == 4
+    assert rebuild_event_sketches(session.get_bind()) == 2
+    session.expire_all()
+    assert {row.session_id: row.stages for row in session.exec(select(FunnelSession))} == stored
+    rebuilt = client.get("/admin/funnel", headers=admin_headers).json()
+    assert rebuilt["funnel"] == report["funnel"] and rebuilt["events"] == report["events"]
+
+    past = (datetime.utcnow() - timedelta(days=400)).date()
+    assert client.get(f"/admin/funnel?to={past}", headers=admin_headers).json()["sessions"] == 0
+    assert client.get(f"/admin/funnel?from={past}&to={past}", headers=admin_headers).status_code == 400
@@ -0,0 +1,54 @@
+import logging
+import queue
+import random
+import threading
+
+import pytest
+import structlog
+
+from app.core.logging import EventSampler, NonBlockingQueueHandler
+
+def test_sampler_drops_and_counts_sampled_events():
+    """Test sampled info events are dropped at the configured rate and counted"""
+    sampler = EventSampler({"Draft saved": 0.0}, rng=random.Random(1))
+
+    with pytest.raises(structlog.DropEvent):
+        sampler(None, "info", {"event": "Draft saved"})
+
+    assert sampler.dropped["Draft saved"] == 1
+
+def test_sampler_keeps_warnings_and_unlisted_events():
+    """Test warnings and events without a rate are never sampled"""
+    sampler = EventSampler({"Draft saved": 0.0})
+
+    assert sampler(None, "warning", {"event": "Draft saved"})["event"] == "Draft saved"
+    assert sampler(None, "info", {"event": "User created"})["event"] == "User created"
+    assert not sampler.dropped
+
+def test_sampler_marks_kept_events_with_rate():
+    """Test kept sampled events carry their sample rate"""
+    sampler = EventSampler({"Analytics event tracked": 1.0})
+    event_dict = sampler(None, "info", {"event": "Analytics event tracked"})
+    assert event_dict["sample_rate"] == 1.0
+
+def test_queue_handler_never_blocks_when_full():
+    """Test a full queue drops records instead of blocking the caller"""
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, {"event": "x"}, None, None)
+
+    handler.handle(record)
+    handler.handle(record)
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+
+    def flood():
+        for _ in range(2000):
+            handler.handle(record)
+
+    threads = [threading.Thread(target=flood) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert handler.dropped == 1 + 8 * 2000
@@ -0,0 +1,88 @@
+import gc
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.core.metrics import (
+    MetricsRegistry, MultiprocessStore, merge_snapshots, render_prometheus
+)
+
+def test_counter_sums_thread_shards():
+    """Test counter increments from several threads are all collected"""
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs_total", "Jobs", ["kind"])
+
+    def work():
+        for _ in range(1000):
+            counter.inc(kind="a")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.samples()[("a",)] == 4000
+
+def test_exited_thread_shards_are_folded():
+    """Test shards of exited threads fold into one retired total without losing counts"""
+    registry = MetricsRegistry()
+    counter = registry.counter("tasks_total", "Tasks")
+    histogram = registry.histogram("task_seconds", "Task time", buckets=(1.0,))
+
+    for _ in range(50):
+        thread = threading.Thread(target=lambda: (counter.inc(), histogram.observe(0.5)))
+        thread.start()
+        thread.join()
+    gc.collect()
+
+    assert len(counter._shards) == len(histogram._shards) == 0
+    assert counter.samples()[()] == 50
+    assert histogram.samples()[()] == [50, 0, 25.0, 50]
+
+def test_histogram_prometheus_format():
+    """Test histogram buckets are rendered cumulatively with sum and count"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("op_seconds", "Op time", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5.0)
+
+    text = render_prometheus(merge_snapshots([registry.snapshot()]))
+
+    assert "# TYPE op_seconds histogram" in text
+    assert 'op_seconds_bucket{le="0.1"} 1' in text
+    assert 'op_seconds_bucket{le="1"} 2' in text
+    assert 'op_seconds_bucket{le="+Inf"} 3' in text
+    assert "op_seconds_count 3" in text
+
+def test_multiprocess_snapshots_are_merged(tmp_path):
+    """Test counters from several worker snapshots add up"""
+    store = MultiprocessStore(str(tmp_path))
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests").inc(3)
+    snapshot = registry.snapshot()
+
+    store.write(snapshot)
+    store.write({**snapshot, "pid": snapshot["pid"] + 1000000})
+
+    merged = merge_snapshots(store.read_all())
+    assert merged["requests_total"]["samples"][()] == 6
+
+    # The exited worker's file is folded into the totals, once
+    assert not (tmp_path / f"metrics-{snapshot['pid'] + 1000000}.json").exists()
+    assert merge_snapshots(store.read_all())["requests_total"]["samples"][()] == 6
+    store.write({**snapshot, "pid": snapshot["pid"] + 2000000})
+    store.retire(snapshot["pid"] + 2000000)
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["exited.json", f"metrics-{snapshot['pid']}.json"]
+    assert merge_snapshots(store.read_all())["requests_total"]["samples"][()] == 9
+
+def test_metrics_endpoint_reports_route_templates(client: TestClient):
+    """Test requests are recorded under their route template"""
+    client.get("/risks/00000000-0000-0000-0000-000000000000")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/risks/{risk_id}"' in response.text
+    assert "risk_scoring_duration_seconds" in response.text
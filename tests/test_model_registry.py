@@ -0,0 +1,155 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+np = pytest.importorskip("numpy")
+
+from app.models import RiskAssessment
+from app.services.model_registry import (
+    ModelRegistry, model_registry, save_artifact, load_artifact, ModelArtifactError
+)
+from app.services.risk_calculator import calculate_risk
+
+DIABETES_DATA = {
+    "age": 55,
+    "weight": 85,
+    "height": 170,
+    "fastingGlucose": "110",
+    "hba1c": "6.0",
+    "familyHistory": "نعم",
+    "smoking": "لا"
+}
+
+def write_logistic(directory, version, intercept, auc=0.81):
+    return save_artifact(
+        str(directory),
+        {
+            "disease": "diabetes",
+            "version": version,
+            "kind": "logistic_regression",
+            "features": ["age", "bmi", "fasting_glucose"],
+            "auc_at_train": auc,
+            "decision_threshold": 0.4,
+            "calibration_method": "platt"
+        },
+        {
+            "coef": [0.02, 0.05, 0.01],
+            "intercept": [intercept],
+            "fill": [45.0, 26.0, 95.0],
+            "mean": [45.0, 26.0, 95.0],
+            "scale": [1.0, 1.0, 1.0]
+        }
+    )
+
+@pytest.fixture
+def model_dir(tmp_path):
+    yield tmp_path
+    for disease in list(model_registry.active()):
+        model_registry.unload(disease)
+
+def test_model_scores_and_fills_metadata(model_dir):
+    """Test a loaded model replaces the rule-based score and stamps its metadata"""
+    write_logistic(model_dir, "2024-01-01", intercept=0.0)
+    model_registry.load("diabetes", model_dir=str(model_dir))
+
+    result = calculate_risk("diabetes", DIABETES_DATA)
+
+    assert result["model_version"] == "2024-01-01"
+    assert result["auc_at_train"] == 0.81
+    assert result["clinical_data"]["decision_threshold"] == 0.4
+    assert 0.0 <= result["risk_score"] <= 1.0
+    assert result["risk_bucket"] in ["low", "medium", "high"]
+
+def test_hot_swap_to_current_version(model_dir):
+    """Test reloading activates the version named in CURRENT"""
+    write_logistic(model_dir, "2024-01-01", intercept=-3.0)
+    write_logistic(model_dir, "2024-02-01", intercept=3.0, auc=0.85)
+    (model_dir / "diabetes" / "CURRENT").write_text("2024-01-01")
+    model_registry.load_all(str(model_dir))
+    low = calculate_risk("diabetes", DIABETES_DATA)
+
+    (model_dir / "diabetes" / "CURRENT").write_text("2024-02-01")
+    model_registry.load_all(str(model_dir))
+    high = calculate_risk("diabetes", DIABETES_DATA)
+
+    assert low["model_version"] == "2024-01-01"
+    assert high["model_version"] == "2024-02-01"
+    assert high["risk_score"] > low["risk_score"]
+
+def test_activated_version_reaches_other_workers(model_dir):
+    """Test activating a version names it in CURRENT, and another worker's registry loads it on its next sync"""
+    write_logistic(model_dir, "2024-01-01", intercept=-3.0)
+    write_logistic(model_dir, "2024-02-01", intercept=3.0)
+    worker = ModelRegistry()
+    assert worker.sync(str(model_dir)) == {"diabetes": "2024-02-01"}
+
+    model_registry.activate("diabetes", "2024-01-01", str(model_dir))
+
+    assert (model_dir / "diabetes" / "CURRENT").read_text() == "2024-01-01"
+    assert worker.sync(str(model_dir)) == {"diabetes": "2024-01-01"}
+    assert worker.sync(str(model_dir)) == {}
+    assert worker.get("diabetes").version == model_registry.get("diabetes").version
+
+def test_latest_version_sorts_numbers_and_rejects_paths(model_dir):
+    """Test v10 is newer than v9 without CURRENT, and only known diseases and plain version names are loaded"""
+    write_logistic(model_dir, "v9", intercept=0.0)
+    write_logistic(model_dir, "v10", intercept=0.0)
+
+    assert model_registry.load_all(str(model_dir)) == {"diabetes": "v10"}
+    for disease, version in (("../diabetes", None), ("diabetes", ".."), ("diabetes", "../diabetes/v9")):
+        with pytest.raises(ModelArtifactError):
+            model_registry.load(disease, version, str(model_dir))
+    assert model_registry.get("diabetes").version == "v10"
+
+def test_invalid_artifact_keeps_current_model(model_dir):
+    """Test an artifact that fails validation is never swapped in"""
+    write_logistic(model_dir, "2024-01-01", intercept=0.0)
+    model_registry.load("diabetes", model_dir=str(model_dir))
+    broken = save_artifact(
+        str(model_dir),
+        {"disease": "diabetes", "version": "2024-03-01", "kind": "logistic_regression", "features": ["age", "bmi"]},
+        {"coef": [0.1, 0.2, 0.3], "intercept": [0.0]}
+    )
+
+    with pytest.raises(ModelArtifactError):
+        load_artifact(broken)
+    model_registry.load_all(str(model_dir))
+
+    assert model_registry.get("diabetes").version == "2024-01-01"
+
+def test_gradient_boosting_artifact(model_dir):
+    """Test flattened tree artifacts route rows to the expected leaves"""
+    path = save_artifact(
+        str(model_dir),
+        {"disease": "heart", "version": "gb-1", "kind": "gradient_boosting", "features": ["age"]},
+        {
+            "feature": [0, -1, -1],
+            "threshold": [50.0, 0.0, 0.0],
+            "left": [1, -1, -1],
+            "right": [2, -1, -1],
+            "value": [0.0, -2.0, 2.0],
+            "roots": [0],
+            "fill": [40.0]
+        }
+    )
+    model = load_artifact(path)
+
+    young, old = model.score([{"age": 30}, {"age": 70}])
+
+    assert young < 0.5 < old
+
+def test_submission_records_model_metadata(client: TestClient, session: Session, model_dir):
+    """Test submitted assessments store the serving model version and AUC"""
+    write_logistic(model_dir, "2024-01-01", intercept=0.0)
+    model_registry.load("diabetes", model_dir=str(model_dir))
+
+    response = client.post("/submissions/", json={
+        "assessment_type_id": "diabetes",
+        "session_id": "model-session",
+        "data": DIABETES_DATA
+    })
+    assert response.status_code == 201
+
+    risk = session.get(RiskAssessment, response.json()["risk_id"])
+    assert risk.model_version == "2024-01-01"
+    assert risk.auc_at_train == 0.81
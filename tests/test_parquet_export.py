@@ -0,0 +1,59 @@
+import pytest
+from sqlmodel import Session
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from app.services.outbox import run_outbox
+from app.services.parquet_export import export_parquet, load_watermark
+
+def test_export_partitions_and_flattens(session: Session, submit, tmp_path):
+    """Test rows land in disease/month partitions with typed survey columns"""
+    submit("diabetes", {"age": 50, "weight": 90, "height": 170, "fastingGlucose": "120", "hba1c": "unknown"})
+    submit("hypertension", {"age": 60, "bpReadings": [{"systolic": "150", "diastolic": "95"}, {"systolic": "140", "diastolic": "85"}]})
+    run_outbox(session.get_bind())
+
+    summary = export_parquet(session.get_bind(), str(tmp_path), row_group_size=1)
+
+    assert summary["rows"] == 2
+    assert sorted(path.split("/")[0] for path in summary["files"]) == ["disease=diabetes", "disease=hypertension"]
+    files = {path.split("/")[0]: tmp_path / path for path in summary["files"]}
+
+    diabetes = pq.read_table(files["disease=diabetes"]).to_pylist()[0]
+    assert diabetes["fasting_glucose"] == 120.0
+    assert diabetes["hba1c"] is None
+    assert diabetes["bmi"] == pytest.approx(90 / 1.7 ** 2)
+
+    hypertension = pq.read_table(files["disease=hypertension"]).to_pylist()[0]
+    assert hypertension["systolic_mean"] == 145.0
+    assert hypertension["bp_readings"] == 2
+
+def test_export_is_incremental(session: Session, submit, tmp_path):
+    """Test a second run only exports assessments newer than the watermark"""
+    submit("heart", {"age": 55, "cholesterol": "240"})
+    run_outbox(session.get_bind())
+    first = export_parquet(session.get_bind(), str(tmp_path))
+    assert first["rows"] == 1
+    assert load_watermark(str(tmp_path)) is not None
+
+    assert export_parquet(session.get_bind(), str(tmp_path))["rows"] == 0
+
+    submit("heart", {"age": 65, "cholesterol": "280"})
+    run_outbox(session.get_bind())
+    second = export_parquet(session.get_bind(), str(tmp_path))
+    assert second["rows"] == 1
+    assert len(list(tmp_path.rglob("*.parquet"))) == 2
+
+def test_export_waits_for_pending_details(session: Session, submit, tmp_path):
+    """Test a run stops before an assessment whose details are still queued, and a later run exports it complete"""
+    submit("heart", {"age": 55, "cholesterol": "240"})
+    run_outbox(session.get_bind())
+    submit("heart", {"age": 65, "cholesterol": "280"})
+
+    first = export_parquet(session.get_bind(), str(tmp_path))
+    assert first["rows"] == 1 and first["pending"]
+
+    assert run_outbox(session.get_bind()) == 1
+    second = export_parquet(session.get_bind(), str(tmp_path))
+    assert second["rows"] == 1 and not second["pending"]
+    row = pq.read_table(tmp_path / second["files"][0]).to_pylist()[0]
+    assert row["age"] == 65 and row["cholesterol_mgdl"] is not None
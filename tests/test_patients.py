@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.models import LatestRisk, User
+from app.services.timeline import lttb, rebuild_latest_risks
+
+def test_timeline_returns_latest_and_history(client: TestClient, session: Session, admin_headers, login, submit):
+    """Test a patient's timeline has the latest risk per disease and one point per submission"""
+    user_id, headers = login("patient@example.com")
+    for glucose in ("95", "110", "130", "150"):
+        last_diabetes = submit("diabetes", {"age": 50, "weight": 90, "height": 170, "fastingGlucose": glucose}, headers)
+    heart = submit("heart", {"age": 60, "smoking": "نعم"}, headers)
+
+    response = client.get(f"/patients/{user_id}/timeline", headers=headers)
+    assert response.status_code == 200
+    timeline = response.json()
+    assert timeline["latest"]["diabetes"]["risk_id"] == last_diabetes["risk_id"]
+    assert timeline["latest"]["heart"]["risk_id"] == heart["risk_id"]
+    assert timeline["series"]["diabetes"]["total"] == 4
+    scores = [point["score"] for point in timeline["series"]["diabetes"]["points"]]
+    assert scores == sorted(scores)
+
+    downsampled = client.get(f"/patients/{user_id}/timeline?disease=diabetes&max_points=3", headers=headers).json()
+    assert list(downsampled["series"]) == ["diabetes"]
+    assert downsampled["series"]["diabetes"]["downsampled"] is True
+    assert len(downsampled["series"]["diabetes"]["points"]) == 3
+    assert list(downsampled["latest"]) == ["diabetes"]
+
+    latest_before = {row.disease: row.risk_id for row in session.exec(select(LatestRisk)).all()}
+    assert rebuild_latest_risks(session.get_bind()) == 2
+    session.expire_all()
+    assert {row.disease: row.risk_id for row in session.exec(select(LatestRisk)).all()} == latest_before
+
+    assert client.get(f"/patients/{user_id}/timeline", headers=admin_headers).status_code == 200
+
+def test_timeline_is_private_to_patient_and_staff(client: TestClient, login):
+    """Test other patients can't read a timeline and unknown patients are 404 for providers"""
+    user_id, _ = login("owner@example.com")
+    _, other_headers = login("other@example.com")
+    _, provider_headers = login("provider@example.com", "provider")
+
+    assert client.get(f"/patients/{user_id}/timeline", headers=other_headers).status_code == 403
+    assert client.get(f"/patients/{user_id}/timeline").status_code in (401, 403)
+    provider_view = client.get(f"/patients/{user_id}/timeline", headers=provider_headers)
+    assert provider_view.status_code == 200
+    assert provider_view.json()["series"] == {}
+    unknown = "00000000-0000-0000-0000-000000000000"
+    assert client.get(f"/patients/{unknown}/timeline", headers=provider_headers).status_code == 404
+
+def test_lttb_keeps_endpoints_and_spikes():
+    """Test LTTB downsampling keeps the first and last points and an isolated spike"""
+    start = datetime(2024, 1, 1)
+    points = [{"t": start + timedelta(days=i), "score": 0.2} for i in range(1000)]
+    points[537]["score"] = 0.95
+
+    sampled = lttb(points, 50)
+    assert len(sampled) == 50
+    assert sampled[0] is points[0] and sampled[-1] is points[-1]
+    assert points[537] in sampled
+    assert lttb(points[:10], 50) == points[:10]
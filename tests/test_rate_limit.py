@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.rate_limit import AdmissionMiddleware, TokenBucketLimiter, ConcurrencyLimiter, caller_keys, rate_limiter
+
+def test_token_bucket_burst_and_refill():
+    """Test a bucket allows its burst, then refuses with a retry delay until it refills"""
+    limiter = TokenBucketLimiter()
+
+    assert all(limiter.take("k", rate=1.0, burst=3, now=0.0)[0] for _ in range(3))
+    allowed, retry_after = limiter.take("k", rate=1.0, burst=3, now=0.0)
+    assert not allowed
+    assert retry_after == 1.0
+
+    assert limiter.take("k", rate=1.0, burst=3, now=1.0)[0]
+    assert limiter.take("other", rate=1.0, burst=3, now=0.0)[0]
+
+    # All or nothing: a request refused by one bucket takes no token from the others
+    assert limiter.take_all(["a", "b"], rate=1.0, burst=1, now=0.0)[0]
+    assert limiter.take_all(["c", "b"], rate=1.0, burst=1, now=0.5) == (False, 0.5)
+    assert limiter.take("c", rate=1.0, burst=1, now=0.5)[0]
+
+def test_concurrency_limiter_queues_then_sheds():
+    """Test requests over the limit wait in a bounded queue and are refused when it is full or times out"""
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, max_queued=1)
+        assert await limiter.acquire(timeout=1.0) is None
+
+        waiting = asyncio.ensure_future(limiter.acquire(timeout=1.0))
+        await asyncio.sleep(0)
+        assert await limiter.acquire(timeout=1.0) == "overloaded"
+
+        limiter.release()
+        assert await waiting is None
+        assert limiter.in_flight == 1
+
+        assert await limiter.acquire(timeout=0.01) == "queue_timeout"
+        limiter.release()
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+def test_rate_limit_per_client_address(client: TestClient, monkeypatch):
+    """Test fresh session ids don't escape a client's bucket, while a chatty session is also limited on its own"""
+    monkeypatch.setitem(settings.RATE_LIMITS, "POST /analytics/events", {"rate": 0.01, "burst": 2})
+
+    def track(session_id):
+        return client.post("/analytics/events", json={"session_id": session_id, "event_type": "page_view"})
+
+    assert track("first").status_code == 201
+    assert track("second").status_code == 201
+    response = track("third")
+    assert response.status_code == 429
+    assert response.json()["code"] == "rate_limited"
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # Session buckets come on top of the address's
+    monkeypatch.setitem(settings.RATE_LIMITS, "POST /analytics/events", {"rate": 0.01, "burst": 1})
+    rate_limiter.reset()
+    assert track("noisy").status_code == 201
+    assert track("noisy").status_code == 429
+
+def test_login_keys_on_forwarded_address_and_account(client: TestClient, monkeypatch):
+    """Test logins are keyed on the address trusted proxies forwarded for and the session, and failures per account there"""
+    monkeypatch.setitem(settings.RATE_LIMITS, "POST /auth/login", {"rate": 0.01, "burst": 2})
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", ["10.0.0.0/8"])
+
+    async def keys(client_ip, body, forwarded=None):
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        if forwarded:
+            headers.append((b"x-forwarded-for", forwarded.encode()))
+        scope = {"type": "http", "headers": headers, "query_string": b"", "client": (client_ip, 1234)}
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        found, failure_key, _ = await caller_keys(scope, receive, "POST /auth/login")
+        return found, failure_key
+
+    body = b'{"email": " Victim@Example.com", "password": "x", "session_id": "s1"}'
+    assert asyncio.run(keys("10.0.0.5", body, "1.2.3.4, 10.0.0.9")) == (
+        ["client:1.2.3.4", "session:s1"], "account:victim@example.com|1.2.3.4"
+    )
+    # Forwarded addresses count only from trusted proxies, and spoofed hops left of the real caller are ignored
+    assert asyncio.run(keys("5.6.7.8", body, "1.2.3.4"))[0][0] == "client:5.6.7.8"
+    assert asyncio.run(keys("10.0.0.5", body, "9.9.9.9, 1.2.3.4"))[0][0] == "client:1.2.3.4"
+
+    for expected in (401, 401, 429):
+        response = client.post("/auth/login", json={"email": "victim@example.com", "password": "wrong"})
+        assert response.status_code == expected
+
+def test_failed_logins_elsewhere_do_not_lock_out_the_account(monkeypatch):
+    """Test failed logins are limited per account and address, while the owner logs in from their own address"""
+    monkeypatch.setitem(settings.RATE_LIMITS, "POST /auth/login", {"rate": 0.01, "burst": 100})
+    monkeypatch.setattr(settings, "ACCOUNT_FAILURE_LIMIT", {"rate": 0.01, "burst": 2})
+    monkeypatch.setattr(settings, "MAX_CONCURRENT_REQUESTS", 0)
+    rate_limiter.reset()
+
+    async def login_app(scope, receive, send):
+        password = json.loads((await receive())["body"])["password"]
+        await send({"type": "http.response.start", "status": 200 if password == "right" else 401, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = AdmissionMiddleware(login_app)
+
+    async def login(client_ip, password):
+        body = json.dumps({"email": "victim@example.com", "password": password}).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        scope = {"type": "http", "method": "POST", "path": "/auth/login", "headers": headers,
+                 "query_string": b"", "client": (client_ip, 1234)}
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, receive, send)
+        return sent[0]["status"]
+
+    async def scenario():
+        guesses = [await login("6.6.6.6", "wrong") for _ in range(3)]
+        owner = [await login("1.2.3.4", password) for password in ("wrong", "right", "right", "right")]
+        return guesses, owner, await login("6.6.6.6", "right")
+
+    assert asyncio.run(scenario()) == ([401, 401, 429], [401, 200, 200, 200], 429)
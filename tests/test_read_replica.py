@@ -0,0 +1,79 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, Session, create_engine
+
+from app import database
+from app.core.config import settings
+from app.database import ReadRouter, get_read_session, marker_is_fresh, write_marker
+from app.main import app
+
+@pytest.fixture
+def replica_engine(tmp_path):
+    """A second SQLite file standing in for the replica"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+def test_recent_writer_reads_from_primary(replica_engine):
+    """Test a principal that just wrote is routed to the primary until the window passes"""
+    router = ReadRouter(read_your_writes_seconds=60, failure_cooldown_seconds=30)
+    primary = object()
+
+    router.mark_write(["session:abc"])
+    bind, reason = router.read_bind(primary, replica_engine, ["session:abc"])
+    assert (bind, reason) == (primary, "read_your_writes")
+
+    bind, reason = router.read_bind(primary, replica_engine, ["session:other"])
+    assert reason == "replica"
+    bind.close()
+
+def test_unavailable_replica_falls_back_to_primary(tmp_path):
+    """Test a replica that cannot be reached trips the breaker and reads use the primary"""
+    router = ReadRouter(read_your_writes_seconds=5, failure_cooldown_seconds=30)
+    broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    primary = object()
+
+    assert router.read_bind(primary, broken, []) == (primary, "replica_failed")
+    assert router.read_bind(primary, broken, []) == (primary, "replica_down")
+
+def test_write_marker_is_signed_and_short_lived():
+    """Test a write marker is honoured only within its window and only as issued"""
+    marker = write_marker(now=1000.0)
+    assert marker_is_fresh(marker, now=1000.0 + settings.READ_YOUR_WRITES_SECONDS - 1)
+    assert not marker_is_fresh(marker, now=1000.0 + settings.READ_YOUR_WRITES_SECONDS + 1)
+
+    expires, signature = marker.split(".")
+    assert not marker_is_fresh(f"{int(expires) + 3600000}.{signature}", now=1000.0)
+    # Even a genuine marker can't pin reads to the primary for longer than one window from now
+    assert not marker_is_fresh(write_marker(now=5000.0), now=1000.0)
+    assert not marker_is_fresh("garbage", now=1000.0) and not marker_is_fresh(None)
+
+def test_get_risk_routes_between_primary_and_replica(client: TestClient, session: Session,
+                                                      replica_engine, monkeypatch):
+    """Test a submitter reads their own risk from the primary on any worker, other reads go to the replica"""
+    app.dependency_overrides.pop(get_read_session)
+    monkeypatch.setattr(settings, "DB_READ_REPLICA_URL", "sqlite:///replica.db")
+    monkeypatch.setattr(database, "get_engine", lambda: session.get_bind())
+    monkeypatch.setattr(database, "get_read_engine", lambda: replica_engine)
+    monkeypatch.setattr(database, "read_router", ReadRouter(60, 30))
+
+    response = client.post("/submissions/", json={
+        "assessment_type_id": "diabetes",
+        "session_id": "replica-session",
+        "data": {"age": 50, "weight": 80, "height": 175}
+    })
+    assert response.status_code == 201
+    risk_id = response.json()["risk_id"]
+    marker = response.headers["x-read-your-writes"]
+
+    # Just wrote: the marker cookie sends the read to the primary, even on a
+    # worker that didn't see the write
+    monkeypatch.setattr(database, "read_router", ReadRouter(60, 30))
+    assert client.get(f"/risks/{risk_id}").status_code == 200
+
+    # Without it (or once the window has passed), reads hit the (empty, never
+    # replicated) replica; clients without cookies can echo the header
+    client.cookies.clear()
+    assert client.get(f"/risks/{risk_id}").status_code == 404
+    assert client.get(f"/risks/{risk_id}", headers={"X-Read-Your-Writes": marker}).status_code == 200
@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.crud import get_assessment_type_by_slug
+from app.models import AssessmentType
+from app.services.reference_data import reference_data
+
+def test_assessments_served_from_table_with_etag(client: TestClient, session: Session):
+    """Test /assessments lists the stored assessment types and honours If-None-Match"""
+    response = client.get("/assessments")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    stored = {row.slug: row.title for row in session.exec(select(AssessmentType)).all()}
+    assert {item["slug"]: item["title"] for item in response.json()} == stored
+    assert all(item["id"] == item["slug"] for item in response.json())
+
+    cached = client.get("/assessments", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+
+def test_cache_reloads_after_version_bump(session: Session):
+    """Test lookups come from the snapshot until it is invalidated"""
+    heart = get_assessment_type_by_slug(session, "heart")
+    assert reference_data.get(session).assessment_types_by_id[heart.id] is heart
+
+    row = session.exec(select(AssessmentType).where(AssessmentType.slug == "heart")).one()
+    row.title = "Heart risk"
+    session.add(row)
+    session.commit()
+    assert get_assessment_type_by_slug(session, "heart").title != "Heart risk"
+
+    reference_data.invalidate()
+    assert get_assessment_type_by_slug(session, "heart").title == "Heart risk"
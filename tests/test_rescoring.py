@@ -0,0 +1,120 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.models import LatestRisk, RiskAssessment, DiabetesAssessment
+from app.services.outbox import run_outbox
+from app.services.rescoring import rescore, Checkpoint
+
+@pytest.fixture
+def submissions(session: Session, submit):
+    for age in (30, 50, 70):
+        submit("diabetes", {"age": age, "weight": 80, "height": 175, "fastingGlucose": "110"})
+    submit("heart", {"age": 60, "gender": "ذكر", "smoking": "نعم", "cholesterol": "250"})
+    run_outbox(session.get_bind())
+
+def test_rescore_skips_surveys_already_scored_by_version(session: Session, submissions):
+    """Test rescoring with an unchanged model version writes nothing new"""
+    checkpoint = rescore(session.get_bind(), chunk_size=2)
+
+    assert checkpoint.scanned == 4
+    assert checkpoint.skipped == 4
+    assert checkpoint.written == 0
+    assert len(session.exec(select(RiskAssessment)).all()) == 4
+
+def test_rescore_keeps_versions_side_by_side(session: Session, submissions, monkeypatch):
+    """Test a new model version adds assessments next to the existing ones"""
+    from app.services import risk_calculator
+
+    original = risk_calculator.calculate_rule_based_risk
+    monkeypatch.setattr(
+        risk_calculator, "calculate_rule_based_risk",
+        lambda disease, data: {**original(disease, data), "model_version": "rule_based_v2.0"}
+    )
+
+    checkpoint = rescore(session.get_bind(), chunk_size=3)
+
+    assert checkpoint.written == 4
+    assert checkpoint.model_versions == {"rule_based_v2.0": 4}
+    versions = session.exec(select(RiskAssessment.model_version)).all()
+    assert sorted(versions).count("rule_based_v2.0") == 4
+    assert sorted(versions).count("rule_based_v1.0") == 4
+    assert len(session.exec(select(DiabetesAssessment)).all()) == 6
+
+def test_rescore_resumes_from_checkpoint(session: Session, submissions, tmp_path):
+    """Test an interrupted run continues after the last written chunk"""
+    path = str(tmp_path / "checkpoint.json")
+
+    first = rescore(session.get_bind(), checkpoint_path=path, chunk_size=1, max_chunks=2)
+    assert first.scanned == 2
+    assert Checkpoint.load(path).last_id == first.last_id
+
+    resumed = rescore(session.get_bind(), checkpoint_path=path, chunk_size=1)
+    assert resumed.scanned == 4
+
+def test_admin_metrics_count_each_survey_once_after_rescoring(client: TestClient, session: Session, submissions,
+                                                             admin_headers, monkeypatch):
+    """Test rescoring leaves totals unchanged and the metrics reflect only the newest scores"""
+    from app.services import risk_calculator
+
+    before = client.get("/admin/assessments", headers=admin_headers).json()
+    assert before["total_assessments"] == {"diabetes": 3, "hypertension": 0, "heart": 1}
+    assert sum(before["risk_distribution"].values()) == 4
+
+    original = risk_calculator.calculate_rule_based_risk
+    monkeypatch.setattr(
+        risk_calculator, "calculate_rule_based_risk",
+        lambda disease, data: {**original(disease, data), "model_version": "rule_based_v2.0",
+                               "risk_score": 0.95, "risk_bucket": "high"}
+    )
+    assert rescore(session.get_bind(), chunk_size=3).written == 4
+
+    after = client.get("/admin/assessments", headers=admin_headers).json()
+    assert after["total_assessments"] == before["total_assessments"]
+    assert after["average_risk_scores"] == {"diabetes": 0.95, "hypertension": 0, "heart": 0.95}
+    assert after["risk_distribution"]["diabetes_high"] == 3 and after["risk_distribution"]["heart_high"] == 1
+    assert sum(after["risk_distribution"].values()) == 4
+
+def test_distribution_defaults_to_the_serving_version_after_rescoring(client: TestClient, session: Session, submissions,
+                                                                     admin_headers, monkeypatch):
+    """Test rescored surveys are counted once by default, and per version or all together on request"""
+    from app.services import risk_calculator
+
+    original = risk_calculator.calculate_rule_based_risk
+    monkeypatch.setattr(
+        risk_calculator, "calculate_rule_based_risk",
+        lambda disease, data: {**original(disease, data), "model_version": "rule_based_v2.0"}
+    )
+    assert rescore(session.get_bind(), chunk_size=3).written == 4
+
+    def count(query=""):
+        response = client.get(f"/admin/distributions/risk-scores?disease=diabetes{query}", headers=admin_headers)
+        return response.json()["count"]
+
+    assert count() == 3
+    assert count("&model_version=rule_based_v2.0") == 3
+    assert count("&model_version=all") == 6
+
+def test_rescore_updates_latest_risks(session: Session, login, submit, monkeypatch):
+    """Test rescoring moves a patient's latest risk to the new version only for their latest survey"""
+    from app.services import risk_calculator
+
+    _, headers = login("rescored@example.com")
+    for age in (40, 60):
+        submit("diabetes", {"age": age, "weight": 80, "height": 175, "fastingGlucose": "110"}, headers)
+    latest_survey = session.exec(select(LatestRisk.survey_id)).one()
+
+    original = risk_calculator.calculate_rule_based_risk
+    monkeypatch.setattr(
+        risk_calculator, "calculate_rule_based_risk",
+        lambda disease, data: {**original(disease, data), "model_version": "rule_based_v2.0", "risk_score": 0.95}
+    )
+    assert rescore(session.get_bind(), chunk_size=1).written == 2
+
+    session.expire_all()
+    latest = session.exec(select(LatestRisk)).one()
+    assert latest.survey_id == latest_survey
+    assert (latest.model_version, latest.risk_score) == ("rule_based_v2.0", 0.95)
+    rescored = session.exec(select(RiskAssessment).where(RiskAssessment.survey_id == latest_survey,
+                                                         RiskAssessment.model_version == "rule_based_v2.0")).one()
+    assert latest.risk_id == rescored.id
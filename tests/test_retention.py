@@ -0,0 +1,51 @@
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import AnalyticsEvent, AuditLog
+from app.services.background import acquire_lease, release_lease
+from app.services.retention import purge_table, run_retention
+
+def test_retention_archives_then_deletes_old_rows(session: Session, tmp_path, monkeypatch):
+    """Test rows past retention are archived by day and deleted in batches, newer rows are kept"""
+    monkeypatch.setattr(settings, "RETENTION_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "RETENTION_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "RETENTION_BATCH_PAUSE_SECONDS", 0)
+    now = datetime(2024, 6, 1, 12, 0)
+    old_days = [datetime(2023, 1, 1, 8, 0), datetime(2023, 1, 1, 9, 0), datetime(2023, 1, 2, 8, 0)]
+    for created_at in old_days + [now - timedelta(days=1)]:
+        session.add(AnalyticsEvent(event_type="page_view", payload='{"page": "ايام"}', created_at=created_at))
+    session.add(AuditLog(action="login", resource_type="user", created_at=datetime(2023, 1, 1)))
+    session.commit()
+
+    results = run_retention(session.get_bind(), tables=["analytics_events"], now=now)
+    assert results == {"analytics_events": {"archived": 3, "deleted": 3, "batches": 2}}
+
+    remaining = session.exec(select(AnalyticsEvent)).all()
+    assert [event.created_at for event in remaining] == [now - timedelta(days=1)]
+    assert len(session.exec(select(AuditLog)).all()) == 1
+
+    partitions = sorted(p.name for p in (tmp_path / "analytics_events").iterdir())
+    assert partitions == ["date=2023-01-01", "date=2023-01-02"]
+    with gzip.open(next((tmp_path / "analytics_events" / "date=2023-01-01").glob("*.ndjson.gz")), "rt") as f:
+        rows = [json.loads(line) for line in f]
+    assert [row["created_at"] for row in rows] == ["2023-01-01T08:00:00", "2023-01-01T09:00:00"]
+    assert rows[0]["payload"] == '{"page": "ايام"}'
+
+    # Nothing left to purge
+    assert purge_table(session.get_bind(), "analytics_events", 180, now=now)["deleted"] == 0
+
+def test_job_lease_is_exclusive(session: Session):
+    """Test only one owner holds a job lease until it is released or expires"""
+    engine = session.get_bind()
+    assert acquire_lease(engine, "retention", "worker-a", 60)
+    assert not acquire_lease(engine, "retention", "worker-b", 60)
+    assert acquire_lease(engine, "retention", "worker-a", 60)
+    release_lease(engine, "retention", "worker-a")
+    assert acquire_lease(engine, "retention", "worker-b", 60)
+    assert not acquire_lease(engine, "retention", "worker-a", 60)
+    assert acquire_lease(engine, "expired", "worker-a", -1)
+    assert acquire_lease(engine, "expired", "worker-b", 60)
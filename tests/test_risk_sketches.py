@@ -0,0 +1,71 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.models import RiskAssessment, RiskScoreSketch
+from app.services.risk_sketches import rebuild_risk_sketches, risk_sketches
+from app.services.tdigest import TDigest
+
+def test_tdigest_quantiles_survive_merging_and_encoding():
+    """Test merged, serialized digests stay close to exact quantiles and stay small"""
+    rng = random.Random(7)
+    values = [rng.betavariate(2, 5) for _ in range(50000)]
+    parts = [TDigest() for _ in range(20)]
+    for i, value in enumerate(values):
+        parts[i % 20].add(value)
+    merged = TDigest()
+    for part in parts:
+        merged.merge(TDigest.from_bytes(part.to_bytes()))
+
+    assert merged.count == len(values)
+    assert merged.min == min(values) and merged.max == max(values)
+    for q in (0.01, 0.5, 0.9, 0.99):
+        assert abs(merged.quantile(q) - np.quantile(values, q)) < 0.005
+    assert abs(merged.cdf(0.3) - np.mean(np.array(values) <= 0.3)) < 0.005
+    assert len(merged.to_bytes()) < 2000
+
+    single = TDigest()
+    single.add(0.42)
+    assert single.quantile(0.5) == single.quantile(0.99) == 0.42
+    assert TDigest().quantile(0.5) is None
+
+def test_distribution_endpoint_merges_daily_sketches(client: TestClient, session: Session, admin_headers, submit):
+    """Test submissions reach the sketches on flush and the endpoint reports counts, quantiles and histograms"""
+    for glucose in ("90", "100", "110", "120"):
+        submit("diabetes", {"age": 40, "weight": 80, "height": 175, "fastingGlucose": glucose})
+    assert risk_sketches.flush(session.get_bind()) >= 1
+    for glucose in ("130", "140"):
+        submit("diabetes", {"age": 60, "weight": 100, "height": 170, "fastingGlucose": glucose})
+    submit("heart", {"age": 60, "smoking": "نعم"})
+    risk_sketches.flush(session.get_bind())
+
+    scores = sorted(row.risk_score for row in session.exec(select(RiskAssessment).where(RiskAssessment.disease == "diabetes")))
+    response = client.get("/admin/distributions/risk-scores?disease=diabetes&quantiles=0,0.5,1&bins=4&interval=day",
+                          headers=admin_headers)
+    assert response.status_code == 200
+    distribution = response.json()
+    assert distribution["count"] == 6
+    assert abs(distribution["mean"] - sum(scores) / 6) < 1e-9
+    assert distribution["quantiles"]["p0"] == distribution["min"] == scores[0]
+    assert distribution["quantiles"]["p100"] == distribution["max"] == scores[-1]
+    assert scores[0] <= distribution["quantiles"]["p50"] <= scores[-1]
+    assert sum(bin["count"] for bin in distribution["histogram"]) == 6
+    assert [period["count"] for period in distribution["series"]] == [6]
+
+    bucket = session.exec(select(RiskAssessment.risk_bucket).where(RiskAssessment.disease == "diabetes")).first()
+    by_bucket = client.get(f"/admin/distributions/risk-scores?disease=diabetes&bucket={bucket.value}", headers=admin_headers)
+    assert 1 <= by_bucket.json()["count"] <= 6
+
+    stored = {(row.disease, row.day, row.risk_bucket, row.model_version): row.count for row in session.exec(select(RiskScoreSketch))}
+    assert rebuild_risk_sketches(session.get_bind()) == len(stored)
+    session.expire_all()
+    assert {(row.disease, row.day, row.risk_bucket, row.model_version): row.count for row in session.exec(select(RiskScoreSketch))} == stored
+
+    past = (datetime.utcnow() - timedelta(days=400)).date()
+    assert client.get(f"/admin/distributions/risk-scores?disease=diabetes&to={past}", headers=admin_headers).json()["count"] == 0
+    assert client.get("/admin/distributions/risk-scores?disease=diabetes&quantiles=2", headers=admin_headers).status_code == 400
+    assert client.get("/admin/distributions/risk-scores?disease=diabetes&interval=year", headers=admin_headers).status_code == 400
+    assert client.get("/admin/distributions/risk-scores?disease=unknown", headers=admin_headers).status_code == 404
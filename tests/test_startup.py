@@ -0,0 +1,46 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+from sqlmodel import create_engine
+from sqlmodel.pool import StaticPool
+
+from app.database import create_db_and_tables, get_head_revision, schema_is_current, warm_pool
+
+@pytest.fixture(name="empty_engine")
+def empty_engine_fixture():
+    return create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+
+def test_create_tables_on_unmigrated_database(empty_engine):
+    """Test tables are created when the database has no Alembic revision"""
+    assert not schema_is_current(empty_engine)
+    assert create_db_and_tables(empty_engine) == "created"
+    assert "risk_assessments" in inspect(empty_engine).get_table_names()
+
+def test_skip_create_all_at_migration_head(empty_engine):
+    """Test schema creation is skipped when the database is stamped at head"""
+    head = get_head_revision()
+    assert head is not None
+
+    with empty_engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)")
+        connection.exec_driver_sql(f"INSERT INTO alembic_version VALUES ('{head}')")
+
+    assert schema_is_current(empty_engine)
+    assert create_db_and_tables(empty_engine) == "skipped"
+    assert "users" not in inspect(empty_engine).get_table_names()
+
+def test_warm_pool(empty_engine):
+    """Test pool warm-up opens and returns connections"""
+    assert warm_pool(3, empty_engine) >= 1
+
+def test_startup_report_endpoint(client: TestClient):
+    """Test the startup timing report is exposed"""
+    response = client.get("/health/startup")
+    assert response.status_code == 200
+    data = response.json()
+    assert "import_ms" in data
+    assert "startup_ms" in data
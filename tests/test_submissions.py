@@ -1,5 +1,13 @@
+import asyncio
+
 import pytest
 from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.core.config import settings
+from app.models import OutboxTask, SurveySubmission
+from app.services import idempotency, outbox
+from app.services.outbox import run_outbox
 
 def test_submit_diabetes_assessment(client: TestClient):
     """Test diabetes assessment submission"""
@@ -105,4 +113,82 @@ def test_submit_invalid_assessment_type(client: TestClient):
     
     response = client.post("/submissions/", json=submission_data)
     assert response.status_code == 404
-    assert "not found" in response.json()["detail"]
\ No newline at end of file
+    assert "not found" in response.json()["detail"]
+
+def test_idempotent_submission_replays_response(client: TestClient, session):
+    """Test a retried submission with the same Idempotency-Key returns the stored response without new writes"""
+    submission_data = {
+        "assessment_type_id": "diabetes",
+        "session_id": "retry-session",
+        "data": {"age": 50, "weight": 80, "height": 175}
+    }
+    headers = {"Idempotency-Key": "submit-1"}
+
+    first = client.post("/submissions/", json=submission_data, headers=headers)
+    retry = client.post("/submissions/", json=submission_data, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(session.exec(select(SurveySubmission)).all()) == 1
+
+    changed = client.post("/submissions/", json={**submission_data, "data": {"age": 51}}, headers=headers)
+    assert changed.status_code == 422
+
+def test_concurrent_duplicate_waits_for_original(session):
+    """Test a duplicate arriving while the original is in flight gets the original's response"""
+    async def scenario():
+        assert await idempotency.begin(session, "k" * 64, "hash") is None
+        duplicate = asyncio.ensure_future(idempotency.begin(session, "k" * 64, "hash"))
+        await asyncio.sleep(0.01)
+        assert not duplicate.done()
+
+        idempotency.complete(session, "k" * 64, 201, {"submission_id": "abc"})
+        assert await duplicate == (201, {"submission_id": "abc"})
+
+    asyncio.run(scenario())
+
+def test_details_are_written_by_the_outbox(client: TestClient, session):
+    """Test the response comes back pending and the outbox later stores the announced recommendations"""
+    response = client.post("/submissions/", json={
+        "assessment_type_id": "diabetes",
+        "session_id": "outbox-session",
+        "data": {"age": 60, "weight": 100, "height": 165, "fastingGlucose": "140"}
+    })
+    assert response.status_code == 201
+    submitted = response.json()
+    assert submitted["details_status"] == "pending"
+    assert submitted["recommendations"]
+
+    pending = client.get(f"/risks/{submitted['risk_id']}").json()
+    assert pending["details_status"] == "pending"
+    assert pending["recommendations"] == []
+
+    assert run_outbox(session.get_bind()) == 1
+    ready = client.get(f"/risks/{submitted['risk_id']}").json()
+    assert ready["details_status"] == "ready"
+    assert ready["disease_specific"]
+    assert sorted(rec["id"] for rec in ready["recommendations"]) == sorted(rec["id"] for rec in submitted["recommendations"])
+
+def test_outbox_retries_then_marks_details_failed(client: TestClient, session, monkeypatch):
+    """Test a failing outbox task is retried with backoff and finally marks the assessment failed"""
+    monkeypatch.setattr(settings, "OUTBOX_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(settings, "OUTBOX_RETRY_BASE_SECONDS", 0)
+
+    def broken(session, payload):
+        raise RuntimeError("database hiccup")
+
+    monkeypatch.setitem(outbox._handlers, outbox.RISK_DETAILS, (broken, outbox._risk_details_failed))
+    risk_id = client.post("/submissions/", json={
+        "assessment_type_id": "heart",
+        "session_id": "outbox-session",
+        "data": {"age": 62, "smoking": "نعم"}
+    }).json()["risk_id"]
+
+    assert outbox.run_outbox(session.get_bind()) == 0
+    task = session.exec(select(OutboxTask)).one()
+    assert (task.status, task.attempts) == ("pending", 1)
+    assert outbox.run_outbox(session.get_bind()) == 0
+    session.refresh(task)
+    assert (task.status, task.attempts) == ("failed", 2)
+    assert "database hiccup" in task.last_error
+    assert client.get(f"/risks/{risk_id}").json()["details_status"] == "failed"
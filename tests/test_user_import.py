@@ -0,0 +1,52 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.security import verify_password
+from app.models import User, PatientProfile
+from app.services.user_import import UserImporter, import_lines
+
+def test_import_users_csv_reports_problem_lines(client: TestClient, session: Session, admin_headers, monkeypatch):
+    """Test a CSV import creates valid users and reports duplicates and bad lines by line number"""
+    monkeypatch.setattr(settings, "USER_IMPORT_HASH_WORKERS", 0)
+    body = "\n".join([
+        "email,password,role,full_name,sex",
+        "a@example.com,Password1!,patient,أحمد علي,M",
+        "b@example.com,Password2!,provider,,",
+        "a@example.com,Password3!,patient,,",
+        "not-an-email,Password4!,patient,,",
+        "admin@example.com,Password5!,patient,,",
+        "c@example.com,short,patient,,"
+    ]) + "\n"
+
+    response = client.post("/admin/users/import?format=csv", content=body.encode(), headers=admin_headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["created"], report["duplicates"], report["errors"]) == (2, 2, 2)
+    assert {line["line"]: line["status"] for line in report["lines"]} == {
+        4: "duplicate", 5: "error", 6: "duplicate", 7: "error"
+    }
+
+    user = session.exec(select(User).where(User.email == "a@example.com")).one()
+    assert verify_password("Password1!", user.password_hash)
+    assert session.get(PatientProfile, user.id).full_name == "أحمد علي"
+    provider = session.exec(select(User).where(User.email == "b@example.com")).one()
+    assert provider.role == "provider"
+    assert session.get(PatientProfile, provider.id) is None
+
+def test_import_users_requires_admin(client: TestClient):
+    """Test the import endpoint is admin only"""
+    response = client.post("/admin/users/import", content=b"email,password\n")
+    assert response.status_code in (401, 403)
+
+def test_import_ndjson_in_batches(session: Session):
+    """Test NDJSON input is written in several batches"""
+    lines = [f'{{"email": "user{i}@example.com", "password": "Password{i}!"}}\n' for i in range(5)]
+    lines.insert(2, "{not json\n")
+
+    importer = UserImporter(session, "ndjson", batch_size=2)
+    report = import_lines(importer, lines)
+
+    assert report["created"] == 5
+    assert report["errors"] == 1 and report["lines"][0]["line"] == 3
+    assert len(session.exec(select(PatientProfile)).all()) == 5
@@ -0,0 +1,82 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.crud import create_user, update_patient_profile
+from app.models import UserSearchDocument
+from app.services.user_search import SEARCH_BACKENDS, normalize, rebuild_user_search, tokenize
+
+def add_user(session: Session, email: str, full_name: str = None, role: str = "patient"):
+    user = create_user(session, email, "Password123!", role)
+    if full_name:
+        update_patient_profile(session, user.id, {"full_name": full_name})
+    return user.id
+
+def search(client: TestClient, headers, query: str, **params):
+    response = client.get("/admin/users/search", params={"q": query, **params}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_arabic_normalization():
+    """Test diacritics, tatweel and letter variants fold to one spelling"""
+    assert normalize("مُحَمَّد") == "محمد"
+    assert normalize("أحمـــد") == normalize("احمد") == normalize("إحمد")
+    assert normalize("مصطفى") == "مصطفي"
+    assert normalize("فاطمة") == "فاطمه"
+    assert tokenize("Ahmed.Ali_99@Example.COM") == ["ahmed", "ali", "99", "example", "com"]
+    assert tokenize("٢٠٢٤") == ["2024"]
+
+def test_search_by_name_and_email_prefix(client: TestClient, session: Session, admin_headers):
+    """Test prefix search over Arabic names and emails, with filters, ranking and paging"""
+    ahmed = add_user(session, "a.hassan@example.com", "أَحْمَد حسن")
+    fatima = add_user(session, "fatima.z@example.com", "فاطمة الزهراء")
+    add_user(session, "nurse.ahmad@example.com", role="provider")
+
+    result = search(client, admin_headers, "احمد")
+    assert [item["id"] for item in result["items"]] == [str(ahmed)]
+    assert result["items"][0]["full_name"] == "أَحْمَد حسن"
+    assert search(client, admin_headers, "أحمـد حس")["total"] == 1
+    assert [item["id"] for item in search(client, admin_headers, "فاطمه")["items"]] == [str(fatima)]
+    assert search(client, admin_headers, "fatima.z@exa")["items"][0]["id"] == str(fatima)
+    assert search(client, admin_headers, "hassan nobody")["total"] == 0
+    assert search(client, admin_headers, "!!!")["total"] == 0
+
+    # Includes admin@example.com
+    everyone = search(client, admin_headers, "example", per_page=3)
+    assert everyone["total"] == 4 and everyone["pages"] == 2 and len(everyone["items"]) == 3
+    assert len(search(client, admin_headers, "example", per_page=3, page=2)["items"]) == 1
+    providers = search(client, admin_headers, "example", role="provider")
+    assert [item["email"] for item in providers["items"]] == ["nurse.ahmad@example.com"]
+
+    update_patient_profile(session, fatima, {"full_name": "Fatima Zahra"})
+    assert search(client, admin_headers, "فاطمه")["total"] == 0
+    assert search(client, admin_headers, "zah")["items"][0]["id"] == str(fatima)
+
+def test_search_cap_access_and_rebuild(client: TestClient, session: Session, admin_headers, monkeypatch):
+    """Test totals stop at the cap, non-admins are refused, rebuilds match synced documents, and the LIKE fallback"""
+    for i in range(4):
+        add_user(session, f"user{i}@example.com", f"مريم {i}")
+    patient = client.post("/auth/login", json={"email": "user0@example.com", "password": "Password123!"}).json()
+
+    response = client.get("/admin/users/search?q=user", headers={"Authorization": f"Bearer {patient['access_token']}"})
+    assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "USER_SEARCH_MAX_RESULTS", 3)
+    capped = search(client, admin_headers, "مريم", per_page=2, page=2)
+    assert capped["total"] == 3 and len(capped["items"]) == 1
+
+    # The cap keeps the best matches, not the first rows the index returns
+    best = add_user(session, "maryam@example.com", "مريم")
+    monkeypatch.setattr(settings, "USER_SEARCH_MAX_RESULTS", 1)
+    assert [item["id"] for item in search(client, admin_headers, "مريم")["items"]] == [str(best)]
+    monkeypatch.setattr(settings, "USER_SEARCH_MAX_RESULTS", 3)
+
+    synced = {row.user_id: row.document for row in session.exec(select(UserSearchDocument)).all()}
+    assert rebuild_user_search(session.get_bind()) == 6
+    session.expire_all()
+    assert {row.user_id: row.document for row in session.exec(select(UserSearchDocument)).all()} == synced
+    assert search(client, admin_headers, "مريم")["total"] == 3
+
+    # Databases without a text index fall back to LIKE
+    monkeypatch.delitem(SEARCH_BACKENDS, "sqlite")
+    assert search(client, admin_headers, "مري 2")["items"][0]["email"] == "user2@example.com"